@@ -6,14 +6,17 @@ import psutil
 from datetime import datetime
 from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional, List, Union
 
 from fastapi import FastAPI, HTTPException, Depends, Header, status
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
 from services.privcode import rag_query, general_query, auto_query
-from services.indexer import incremental_index, REPO_PATH
+from services.indexer import REPO_PATH, check_repo_access, local_repo_path, repo_namespace
+from services.jobs import job_manager
+from services.retriever import resolve_namespaces
+from services.watcher import RepoWatcher
 from core.logger import setup_logger
 from core.auth import (
     authenticate_user,
@@ -72,19 +75,8 @@ logger = setup_logger()
 # ⏳ BACKGROUND: Git Watcher
 # =========================================================
 
-async def _git_watcher(interval: int = 30):
-    """Periodically check the repo for new commits and re-index."""
-    while True:
-        try:
-            await asyncio.sleep(interval)
-        except asyncio.CancelledError:
-            logger.info("Git watcher stopped")
-            return
-        try:
-            logger.debug("Git watcher: checking for changes...")
-            incremental_index(REPO_PATH)
-        except Exception as exc:  # noqa: BLE001
-            logger.warning("Git watcher error: %s", exc)
+# Created in lifespan(); re-indexes REPO_PATH off the event loop on change
+_repo_watcher: Optional[RepoWatcher] = None
 
 
 # =========================================================
@@ -121,7 +113,7 @@ async def lifespan(app: FastAPI):
     logger.info("🔒 PrivCode — Initializing backend services...")
     logger.info("=" * 60)
 
-    from utils.redis_utils import get_redis_client, get_embedder, get_index
+    from utils.redis_utils import get_redis_client, get_embedder, get_index, get_active_version
 
     # 1️⃣  Redis connection
     try:
@@ -133,8 +125,27 @@ async def lifespan(app: FastAPI):
     # 2️⃣  Embedding model
     get_embedder()
 
-    # 3️⃣  RediSearch index
-    get_index()
+    # 3️⃣  RediSearch index (the default repository's namespace); a fresh
+    #     Redis is restored from the newest snapshot instead of re-embedding
+    from services.snapshot import SNAPSHOT_RESTORE_ON_START, restore_snapshot
+    from utils.redis_utils import list_namespaces
+    if SNAPSHOT_RESTORE_ON_START and not list_namespaces():
+        try:
+            restored = await asyncio.to_thread(restore_snapshot)
+            if restored:
+                logger.info("✅ Restored %d namespaces from snapshot", len(restored))
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("⚠️ Snapshot restore failed (%s) — indexing from scratch", exc)
+    get_index(get_active_version(repo_namespace(local_repo_path(str(REPO_PATH)))))
+
+    # Versions an earlier process retired or abandoned before dropping them
+    from utils.redis_utils import sweep_index_versions
+    try:
+        swept = await asyncio.to_thread(sweep_index_versions)
+        if swept:
+            logger.info("✅ Swept %d leftover index versions", swept)
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("⚠️ Index version sweep failed: %s", exc)
 
     # 4️⃣  Verify repository connection
     try:
@@ -146,12 +157,15 @@ async def lifespan(app: FastAPI):
     except Exception as exc:  # noqa: BLE001
         logger.warning("⚠️ Repository check failed: %s — indexing may be limited", exc)
 
-    # 5️⃣  Initial repository indexing
-    try:
-        incremental_index(REPO_PATH)
-        logger.info("✅ Initial repository indexing complete")
-    except Exception as exc:  # noqa: BLE001
-        logger.warning("⚠️ Initial indexing skipped: %s", exc)
+    # 5️⃣  Initial repository indexing + git watcher (runs off the event loop)
+    global _repo_watcher
+    # Through the job manager, so watcher runs and /index requests for the
+    # same repo never overlap
+    _repo_watcher = RepoWatcher(
+        REPO_PATH,
+        index_fn=lambda path: job_manager.run(path, requested_by="watcher"),
+    )
+    _repo_watcher.start(initial_run=True)
 
     # 6️⃣  Pre-warm local LLM in background (NON-BLOCKING: fast startup)
     async def _warmup_llm_background():
@@ -169,10 +183,12 @@ async def lifespan(app: FastAPI):
 
     llm_warmup_task = asyncio.create_task(_warmup_llm_background())
 
-    # 7️⃣  Background git watcher
-    watcher_task = asyncio.create_task(_git_watcher())
+    # Cross-encoder re-ranker, when enabled, loads on its own worker thread
+    from services.reranker import RERANK, get_reranker
+    if RERANK:
+        get_reranker(wait=False)
 
-    # 8️⃣  Launch Tauri agent (only if not already started by main.py)
+    # 7️⃣  Launch Tauri agent (only if not already started by main.py)
     try:
         import importlib
         main_mod = importlib.import_module("__main__")
@@ -195,15 +211,12 @@ async def lifespan(app: FastAPI):
     # ── Shutdown ──
     logger.info("🛑 PrivCode shutting down...")
     llm_warmup_task.cancel()
-    watcher_task.cancel()
     try:
         await llm_warmup_task
     except asyncio.CancelledError:
         pass
-    try:
-        await watcher_task
-    except asyncio.CancelledError:
-        pass
+    await _repo_watcher.stop()
+    job_manager.shutdown()
 
     # Stop Tauri agent if we started it
     try:
@@ -246,13 +259,17 @@ class LoginResponse(BaseModel):
 
 class QueryRequest(BaseModel):
     question: str
-    repo_path: str
+    repo_path: Optional[str] = None
     mode: str = "auto"  # "repo", "general", or "auto"
+    # Repository path / URL / namespace, or a list of them; None = all repos
+    repo: Optional[Union[str, List[str]]] = None
 
 
 class IndexRequest(BaseModel):
     repo_path: str
     index_path: str
+    # Branch, tag or commit to index from git objects (no checkout)
+    ref: Optional[str] = None
 
 
 # ---------- Authentication Dependency ----------
@@ -325,34 +342,55 @@ def login(req: LoginRequest):
 # =========================================================
 # 📦 INDEX ENDPOINT WITH LOGGING
 # =========================================================
-@app.post("/index")
+def _log_job_result(current_user: dict, action: str, details: dict):
+    """on_finish callback: audit-log the outcome of an indexing job."""
+    def _callback(job):
+        log_action(
+            user_email=current_user["username"],
+            role=current_user["role"],
+            action=action,
+            status="SUCCESS" if job.status == "succeeded" else "ERROR",
+            details={**details, "job_id": job.id, "job_status": job.status,
+                     **({"error": job.error} if job.error else {})},
+        )
+    return _callback
+
+
+@app.post("/index", status_code=status.HTTP_202_ACCEPTED)
 def index_repo(
     req: IndexRequest,
     current_user: dict = Depends(get_current_user),
 ):
+    """Queue (or join) an indexing job; poll GET /index/jobs/{job_id}."""
+    log_result = _log_job_result(current_user, "index", {"repo": req.repo_path, "ref": req.ref})
+
+    def _on_finish(job):
+        log_result(job)
+        if job.status == "succeeded":
+            # Track repo change
+            record_index(current_user["username"], req.repo_path)
+
     try:
-        # Both admin and developer can change / re-index repositories
-        incremental_index(req.repo_path)
+        # Refuse unreadable repositories now, not in the background job
+        check_repo_access(req.repo_path)
 
-        # Track repo change
-        record_index(current_user["username"], req.repo_path)
+        # Both admin and developer can change / re-index repositories
+        job, joined = job_manager.submit(
+            req.repo_path,
+            requested_by=current_user["username"],
+            on_finish=_on_finish,
+            ref=req.ref,
+        )
 
         logger.info(
-            "User %s indexed repository: %s",
+            "User %s %s indexing job %s for repository: %s",
             current_user["username"],
+            "joined" if joined else "started",
+            job.id,
             req.repo_path,
         )
 
-        # ✅ Success Log
-        log_action(
-            user_email=current_user["username"],
-            role=current_user["role"],
-            action="index",
-            status="SUCCESS",
-            details={"repo": req.repo_path},
-        )
-
-        return {"status": "indexed"}
+        return {"status": job.status, "job_id": job.id, "joined": joined, "job": job.to_dict()}
 
     except PermissionError as e:
         # ❌ Permission Failure Log
@@ -380,6 +418,46 @@ def index_repo(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _get_visible_job(job_id: str, current_user: dict):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if current_user["role"] != "admin" and current_user["username"] not in job.requested_by:
+        raise HTTPException(status_code=403, detail="Not allowed to access this job")
+    return job
+
+
+@app.get("/index/jobs")
+def list_index_jobs(current_user: dict = Depends(get_current_user)):
+    """Recent indexing jobs (admins see all, others their own)."""
+    jobs = job_manager.list()
+    if current_user["role"] != "admin":
+        jobs = [j for j in jobs if current_user["username"] in j["requested_by"]]
+    return {"jobs": jobs, "total": len(jobs)}
+
+
+@app.get("/index/jobs/{job_id}")
+def get_index_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Status and progress (files / chunks done, throughput, ETA) of a job."""
+    return _get_visible_job(job_id, current_user).to_dict()
+
+
+@app.delete("/index/jobs/{job_id}")
+def cancel_index_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Cancel a queued or running job."""
+    job = job_manager.cancel(_get_visible_job(job_id, current_user).id)
+
+    log_action(
+        user_email=current_user["username"],
+        role=current_user["role"],
+        action="cancel_index_job",
+        status="SUCCESS",
+        details={"job_id": job.id, "repo": job.repo},
+    )
+
+    return job.to_dict()
+
+
 # =========================================================
 # 🔎 QUERY ENDPOINT WITH LOGGING
 # =========================================================
@@ -388,6 +466,13 @@ async def query(
     req: QueryRequest,
     current_user: dict = Depends(get_current_user),
 ):
+    repos = None
+    if req.repo is not None:
+        try:
+            repos = await asyncio.to_thread(resolve_namespaces, req.repo)
+        except ValueError as exc:
+            raise HTTPException(status_code=404, detail=str(exc))
+
     try:
         # Ensure LLM is ready (wait if still loading)
         ready = await _wait_for_llm_ready()
@@ -399,9 +484,9 @@ async def query(
         if mode == "general":
             response = await asyncio.to_thread(general_query, req.question)
         elif mode == "repo":
-            response = await asyncio.to_thread(rag_query, req.question)
+            response = await asyncio.to_thread(rag_query, req.question, repos=repos)
         else:  # "auto" — try RAG first, fall back to general
-            response = await asyncio.to_thread(auto_query, req.question)
+            response = await asyncio.to_thread(auto_query, req.question, repos=repos)
 
         logger.info(
             "User %s queried (%s): %s",
@@ -817,24 +902,25 @@ class CrawlRequest(BaseModel):
     repo_path: str
 
 
-@app.post("/admin/crawler/trigger")
+@app.post("/admin/crawler/trigger", status_code=status.HTTP_202_ACCEPTED)
 def admin_trigger_crawler(req: CrawlRequest, current_user: dict = Depends(get_current_user)):
-    """Manually trigger Git crawler / re-indexing."""
+    """Manually trigger Git crawler / re-indexing (runs as a background job)."""
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
 
     try:
-        incremental_index(req.repo_path)
-
-        log_action(
-            user_email=current_user["username"],
-            role=current_user["role"],
-            action="trigger_crawler",
-            status="SUCCESS",
-            details={"repo": req.repo_path},
+        job, joined = job_manager.submit(
+            req.repo_path,
+            requested_by=current_user["username"],
+            on_finish=_log_job_result(current_user, "trigger_crawler", {"repo": req.repo_path}),
         )
 
-        return {"status": "success", "message": f"Crawler completed for: {req.repo_path}"}
+        return {
+            "status": job.status,
+            "job_id": job.id,
+            "joined": joined,
+            "message": f"Crawler {'already running' if joined else 'started'} for: {req.repo_path}",
+        }
     except Exception as exc:
         log_action(
             user_email=current_user["username"],
@@ -878,6 +964,17 @@ def admin_crawler_status(current_user: dict = Depends(get_current_user)):
         }
 
 
+@app.get("/admin/watcher/status")
+def admin_watcher_status(current_user: dict = Depends(get_current_user)):
+    """Get the background repo watcher state (mode, pending, last run)."""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    if _repo_watcher is None:
+        return {"repo_path": str(REPO_PATH), "state": "stopped"}
+    return _repo_watcher.status()
+
+
 # =========================================================
 # 📚 ADMIN: Redis Knowledge Base Management
 # =========================================================
@@ -889,17 +986,34 @@ def admin_redis_stats(current_user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=403, detail="Admin access required")
 
     try:
-        from utils.redis_utils import get_redis_client, get_index
+        from utils.redis_utils import (
+            get_redis_client, get_index, get_active_version, list_namespaces,
+        )
         client = get_redis_client()
         info = client.info()
 
-        # Count indexed documents
+        # Count indexed documents across every repository namespace
         try:
-            idx = get_index()
-            idx_info = idx.info()
-            num_docs = idx_info.get("num_docs", 0) if isinstance(idx_info, dict) else 0
+            num_docs = 0
+            namespaces = []
+            for namespace, source in sorted(list_namespaces().items()):
+                version = get_active_version(namespace, create=False)
+                if version is None:
+                    continue
+                idx_info = get_index(version).info()
+                docs = int(idx_info.get("num_docs", 0)) if isinstance(idx_info, dict) else 0
+                num_docs += docs
+                namespaces.append({
+                    "namespace": namespace,
+                    "repo": source,
+                    "indexed_documents": docs,
+                    "vector_index_mb": float(idx_info.get("vector_index_sz_mb", 0) or 0),
+                    **{k: version[k] for k in ("version", "name", "model", "dims", "datatype",
+                                                "projection")},
+                })
         except Exception:
             num_docs = "unknown"
+            namespaces = None
 
         return {
             "status": "connected",
@@ -907,6 +1021,7 @@ def admin_redis_stats(current_user: dict = Depends(get_current_user)):
             "used_memory_bytes": info.get("used_memory", 0),
             "total_keys": client.dbsize(),
             "indexed_documents": num_docs,
+            "namespaces": namespaces,
             "connected_clients": info.get("connected_clients", 0),
             "uptime_seconds": info.get("uptime_in_seconds", 0),
             "redis_version": info.get("redis_version", "unknown"),
@@ -915,50 +1030,234 @@ def admin_redis_stats(current_user: dict = Depends(get_current_user)):
         return {"status": "error", "error": str(exc)}
 
 
-@app.post("/admin/redis/flush")
-def admin_redis_flush(current_user: dict = Depends(get_current_user)):
-    """Flush the Redis knowledge base (danger!)."""
+def _namespace_repo(namespace: str, source: str):
+    """(repository, git ref) a registered *namespace* was indexed from, or
+    None when its source is unknown (e.g. the pre-namespace default)."""
+    if not source:
+        return None
+    # Refs are registered as "<source>@<ref>"
+    repo, _, ref = source.rpartition("@")
+    if repo and ref and repo_namespace(local_repo_path(repo), ref) == namespace:
+        return repo, ref
+    if repo_namespace(local_repo_path(source)) == namespace:
+        return source, None
+    return None
+
+
+@app.post("/admin/redis/rebuild", status_code=status.HTTP_202_ACCEPTED)
+def admin_redis_rebuild(current_user: dict = Depends(get_current_user)):
+    """
+    Rebuild the whole knowledge base: every registered repository
+    gets a full blue-green rebuild (background jobs), so queries keep
+    working on the current versions until each new one is swapped in and
+    the old one is dropped.  Other Redis data (the repository registry,
+    the embedding cache) is left alone.
+    """
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
 
     try:
-        from utils.redis_utils import get_redis_client
-        client = get_redis_client()
-        client.flushdb()
+        from utils.redis_utils import list_namespaces
+
+        jobs, skipped = [], []
+        for namespace, source in sorted(list_namespaces().items()):
+            repo = _namespace_repo(namespace, source)
+            if repo is None:
+                skipped.append(namespace)
+                continue
+            job, _ = job_manager.submit(
+                repo[0],
+                kind="full",
+                requested_by=current_user["username"],
+                on_finish=_log_job_result(current_user, "redis_rebuild",
+                                          {"repo": repo[0], "ref": repo[1]}),
+                ref=repo[1],
+            )
+            jobs.append(job.id)
+        if skipped:
+            logger.warning("Not rebuilding namespaces with no known source: %s",
+                           ", ".join(skipped))
 
         log_action(
             user_email=current_user["username"],
             role=current_user["role"],
-            action="redis_flush",
+            action="redis_rebuild",
             status="SUCCESS",
+            details={"rebuild_job_ids": jobs, "skipped": skipped},
         )
 
-        return {"status": "flushed", "message": "Knowledge base cleared. Re-index to rebuild."}
+        return {
+            "status": "rebuilding",
+            "job_ids": jobs,
+            "skipped": skipped,
+            "message": f"Rebuilding {len(jobs)} repositories in the background.",
+        }
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc))
 
 
-@app.post("/admin/redis/reindex")
-def admin_redis_reindex(current_user: dict = Depends(get_current_user)):
-    """Force full re-index into Redis."""
+@app.post("/admin/redis/flush")
+def admin_redis_flush(current_user: dict = Depends(get_current_user)):
+    """
+    Clear the knowledge base (danger!): cancel running indexing jobs and
+    drop every repository's index versions, pointers and chunk keys.
+    Repositories must be indexed again afterwards (see
+    /admin/redis/rebuild to refresh them without clearing).
+    """
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
 
     try:
-        from services.indexer import build_full_index
-        build_full_index(REPO_PATH)
+        from utils.query_cache import invalidate_namespace
+        from utils.redis_utils import drop_all_namespaces
+
+        # A job still running would write into the versions dropped below
+        cancelled = job_manager.cancel_all(timeout=30)
+
+        namespaces = drop_all_namespaces()
+        for namespace in namespaces:
+            invalidate_namespace(namespace)
 
         log_action(
             user_email=current_user["username"],
             role=current_user["role"],
-            action="redis_reindex",
+            action="redis_flush",
             status="SUCCESS",
+            details={"namespaces": namespaces, "cancelled_jobs": cancelled},
+        )
+
+        return {
+            "status": "flushed",
+            "namespaces": namespaces,
+            "cancelled_jobs": cancelled,
+            "message": "Knowledge base cleared. Re-index repositories to search them again.",
+        }
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+
+
+@app.post("/admin/redis/reindex", status_code=status.HTTP_202_ACCEPTED)
+def admin_redis_reindex(current_user: dict = Depends(get_current_user)):
+    """Force full re-index into Redis (runs as a background job)."""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    try:
+        job, joined = job_manager.submit(
+            REPO_PATH,
+            kind="full",
+            requested_by=current_user["username"],
+            on_finish=_log_job_result(current_user, "redis_reindex", {"repo": str(REPO_PATH)}),
         )
 
-        return {"status": "reindexed", "message": "Full re-index completed."}
+        return {
+            "status": job.status,
+            "job_id": job.id,
+            "joined": joined,
+            "message": "Full re-index already in progress." if joined else "Full re-index started.",
+        }
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+
+
+class ProjectionRefitRequest(BaseModel):
+    repo_path: Optional[str] = None   # default: the test repository
+    ref: Optional[str] = None
+
+
+@app.post("/admin/index/projection/refit", status_code=status.HTTP_202_ACCEPTED)
+def admin_refit_projection(
+    req: ProjectionRefitRequest,
+    current_user: dict = Depends(get_current_user),
+):
+    """Refit the embedding projection on a repository's chunks and
+    re-project its index (background job, blue-green)."""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    repo = req.repo_path or str(REPO_PATH)
+    try:
+        job, joined = job_manager.submit(
+            repo,
+            kind="reproject",
+            requested_by=current_user["username"],
+            on_finish=_log_job_result(current_user, "projection_refit",
+                                      {"repo": repo, "ref": req.ref}),
+            ref=req.ref,
+        )
+        return {"status": job.status, "job_id": job.id, "joined": joined}
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+
+
+class SnapshotRestoreRequest(BaseModel):
+    name: Optional[str] = None   # default: newest snapshot
+
+
+@app.get("/admin/snapshots")
+def admin_list_snapshots(current_user: dict = Depends(get_current_user)):
+    """Encrypted knowledge-base snapshots, newest first."""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    from services.snapshot import list_snapshots
+    snapshots = list_snapshots()
+    return {"snapshots": snapshots, "total": len(snapshots)}
+
+
+@app.post("/admin/snapshots")
+def admin_export_snapshot(current_user: dict = Depends(get_current_user)):
+    """Export every namespace's active index to an encrypted snapshot."""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    try:
+        from services.snapshot import export_all
+        exported = export_all()
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc))
 
+    log_action(
+        user_email=current_user["username"],
+        role=current_user["role"],
+        action="snapshot_export",
+        status="SUCCESS",
+        details={"namespaces": [e["namespace"] for e in exported]},
+    )
+    return {"status": "exported", "namespaces": exported}
+
+
+@app.post("/admin/snapshots/restore")
+def admin_restore_snapshot(
+    req: SnapshotRestoreRequest,
+    current_user: dict = Depends(get_current_user),
+):
+    """Load a snapshot into new index versions and swap them in."""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    from services.snapshot import list_snapshots, restore_snapshot
+    snapshots = list_snapshots()
+    if req.name is not None:
+        # Only names from the listing: never a caller-supplied path
+        snapshots = [s for s in snapshots if s["name"] == req.name]
+    if not snapshots:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+
+    try:
+        restored = restore_snapshot(snapshots[0]["path"])
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+
+    log_action(
+        user_email=current_user["username"],
+        role=current_user["role"],
+        action="snapshot_restore",
+        status="SUCCESS",
+        details={"snapshot": snapshots[0]["name"]},
+    )
+    return {"status": "restored", "snapshot": snapshots[0]["name"], "namespaces": restored}
+
 
 # =========================================================
 # 🛡️ ADMIN: Security Policies
@@ -1028,6 +1327,11 @@ def admin_system_performance(current_user: dict = Depends(get_current_user)):
         disk = psutil.disk_usage("/")
         uptime = time.time() - _server_start_time
 
+        from utils.embedding_cache import cache_stats
+        from utils.embedding_service import service_stats
+        from utils.query_cache import query_cache_stats
+        from services.reranker import rerank_stats
+
         # Activity stats
         all_activity = get_all_activity()
         online_count = sum(1 for u in all_activity if u.get("status") == "online")
@@ -1049,6 +1353,13 @@ def admin_system_performance(current_user: dict = Depends(get_current_user)):
             "online_users": online_count,
             "total_users": len(all_activity),
             "total_queries": total_queries,
+            "embedding": {
+                "service": service_stats(),
+                "cache": cache_stats(),
+            },
+            # Level 1: query embeddings, level 2: retrieval results
+            "query_cache": query_cache_stats(),
+            "rerank": rerank_stats(),
         }
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc))
@@ -0,0 +1,117 @@
+# embedders.py - Throughput of the embedding backends (torch vs. ONNX int8)
+"""
+Measures, per EMBEDDING_BACKEND, the cold start (import + model load in a
+fresh interpreter), query-path latency (one sentence per call, as
+hybrid_retrieve does) and indexing throughput (EMBED_SERVICE_MAX_BATCH batches
+of source chunks), plus how closely the ONNX vectors match torch.
+
+    cd backend && python -m benchmarks.embedders [--model NAME] [--chunks 512]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from tabulate import tabulate
+
+from utils.embedders import EMBEDDING_BACKENDS, load_embedder
+from utils.embedding_service import EMBED_SERVICE_MAX_BATCH
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+REPO_PATH = ROOT_DIR / "test_repo"
+
+CHUNK_LINES = 30
+QUERIES = [
+    "Find security vulnerabilities in auth.py",
+    "Explain database connection flow",
+    "Show authentication and authorization logic",
+    "Explain error handling strategy",
+]
+
+
+def load_chunks(limit: int) -> list:
+    """Up to *limit* CHUNK_LINES-line windows of the test repository's code."""
+    chunks = []
+    for path in sorted(REPO_PATH.rglob("*")):
+        if path.suffix not in {".py", ".js", ".ts", ".java", ".go", ".c", ".cpp"}:
+            continue
+        lines = path.read_text(encoding="utf-8", errors="ignore").splitlines()
+        for i in range(0, len(lines), CHUNK_LINES):
+            chunks.append("\n".join(lines[i:i + CHUNK_LINES]))
+            if len(chunks) >= limit:
+                return chunks
+    return chunks or QUERIES * (limit // len(QUERIES))
+
+
+def cold_start(model: str, backend: str) -> float:
+    """Seconds to import and load *backend* in a fresh interpreter."""
+    code = (
+        "import time; t = time.perf_counter()\n"
+        "from utils.embedders import load_embedder\n"
+        f"load_embedder({model!r}, {backend!r}).encode('warm up')\n"
+        "print(time.perf_counter() - t)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            cwd=Path(__file__).resolve().parents[1], check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def run(model: str, n_chunks: int, rounds: int = 50):
+    chunks = load_chunks(n_chunks)
+    print(f"🔒 Embedder benchmark: {model}, {len(chunks)} chunks, "
+          f"batch size {EMBED_SERVICE_MAX_BATCH}\n")
+
+    rows, reference = [], None
+    for backend in EMBEDDING_BACKENDS:
+        try:
+            startup = cold_start(model, backend)
+            embedder = load_embedder(model, backend)
+        except Exception as exc:  # noqa: BLE001
+            print(f"⚠️  {backend}: unavailable ({exc})")
+            continue
+
+        embedder.encode(QUERIES)   # warm up
+        latencies = []
+        for i in range(rounds):
+            start = time.perf_counter()
+            embedder.encode(QUERIES[i % len(QUERIES)])
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        vectors = np.asarray(embedder.encode(chunks, batch_size=EMBED_SERVICE_MAX_BATCH,
+                                             show_progress_bar=False), dtype=np.float32)
+        bulk = time.perf_counter() - start
+
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        reference = vectors if reference is None else reference
+        rows.append([
+            backend,
+            f"{startup:.1f}",
+            f"{1000 * np.percentile(latencies, 50):.1f}",
+            f"{1000 * np.percentile(latencies, 95):.1f}",
+            f"{len(chunks) / bulk:.0f}",
+            f"{(vectors * reference).sum(axis=1).min():.4f}",
+        ])
+
+    print(tabulate(
+        rows,
+        headers=["Backend", "Cold start s", "Query p50 ms", "Query p95 ms",
+                 "Chunks/s", "Min cosine vs torch"],
+        tablefmt="grid",
+    ))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"))
+    parser.add_argument("--chunks", type=int, default=512)
+    args = parser.parse_args(argv)
+    run(args.model, args.chunks)
+
+
+if __name__ == "__main__":
+    main()
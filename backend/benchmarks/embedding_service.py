@@ -0,0 +1,96 @@
+# embedding_service.py - Query embedding under concurrent load
+"""
+Simulates concurrent /query traffic: --clients threads each embed
+--queries queries, once calling the model directly per request (as
+hybrid_retrieve used to) and once through utils.embedding_service, which
+micro-batches them.  Optionally an indexing load (--bulk chunks) runs at
+the same time.  Reports throughput and p50 / p95 query-embedding latency.
+
+    cd backend && python -m benchmarks.embedding_service [--clients 16] [--queries 50]
+                                                        [--bulk 2048]
+"""
+
+import argparse
+import threading
+import time
+
+import numpy as np
+from tabulate import tabulate
+
+from utils.embedding_service import BULK, embed_query, get_embedding_service
+from utils.redis_utils import get_embedder
+
+QUERIES = [
+    "Find security vulnerabilities in auth.py",
+    "Explain database connection flow",
+    "Detect potential memory leaks",
+    "Refactor API class for better design",
+    "Find race conditions in concurrent code",
+    "Show authentication and authorization logic",
+    "Explain error handling strategy",
+    "Locate inefficient loops or performance bottlenecks",
+]
+CHUNK = "def handler(request):\n    user = authenticate(request)\n    return render(user)\n" * 8
+
+
+def _load(encode_query, clients: int, per_client: int, bulk: int, encode_bulk):
+    latencies = []
+    lock = threading.Lock()
+
+    def _client(offset):
+        own = []
+        for i in range(per_client):
+            start = time.perf_counter()
+            encode_query(QUERIES[(offset + i) % len(QUERIES)])
+            own.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=_client, args=(c,)) for c in range(clients)]
+    if bulk:
+        threads.append(threading.Thread(target=encode_bulk, args=([CHUNK] * bulk,)))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {
+        "qps": len(latencies) / elapsed,
+        "p50": 1000 * np.percentile(latencies, 50),
+        "p95": 1000 * np.percentile(latencies, 95),
+    }
+
+
+def run(clients: int, per_client: int, bulk: int):
+    embedder = get_embedder()
+    embedder.encode(QUERIES)   # load + warm up
+    service = get_embedding_service()
+
+    direct = _load(embedder.encode, clients, per_client, bulk,
+                   lambda texts: embedder.encode(texts, batch_size=64))
+    batched = _load(embed_query, clients, per_client, bulk,
+                    lambda texts: service.encode(texts, priority=BULK))
+
+    print(f"🔒 {clients} clients x {per_client} queries"
+          f"{f', {bulk} chunks indexing concurrently' if bulk else ''}\n")
+    print(tabulate(
+        [[name, f"{r['qps']:.0f}", f"{r['p50']:.1f}", f"{r['p95']:.1f}"]
+         for name, r in (("direct", direct), ("embedding service", batched))],
+        headers=["Path", "Queries/s", "p50 ms", "p95 ms"],
+        tablefmt="grid",
+    ))
+    print(f"\nService: {service.stats()}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--bulk", type=int, default=0)
+    args = parser.parse_args(argv)
+    run(args.clients, args.queries, args.bulk)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# reranker.py - Retrieval quality and latency with the cross-encoder re-rank on vs. off
+"""
+Runs labelled questions (query -> files that answer it) through
+hybrid_retrieve with the re-rank stage off and on, and reports per mode
+hit rate and MRR of the expected files in the top_k, and retrieval
+p50 / p95 latency.  With --llm every question also goes through
+rag_query, adding end-to-end latency and how often the answer cites an
+expected file.
+
+The default questions are about PrivCode's own backend: index this
+repository first, or pass --cases FILE with a JSON list of
+{"query": ..., "files": [path suffixes]} for another one.
+
+    cd backend && python -m benchmarks.reranker [--cases FILE] [--top-k 3]
+                                                [--repos NAME ...] [--llm]
+"""
+
+import argparse
+import json
+import os
+import time
+
+# Every query must do the full work in both modes
+os.environ.setdefault("RESULT_CACHE_SIZE", "0")
+os.environ.setdefault("QUERY_EMBEDDING_CACHE_SIZE", "0")
+
+import numpy as np
+from tabulate import tabulate
+
+from services import retriever
+from services.context import merge_adjacent
+from services.reranker import RERANK_BUDGET_MS, RERANK_MODEL, get_reranker, rerank_stats
+
+CASES = [
+    {"query": "How are chunk embeddings cached in Redis?",
+     "files": ["utils/embedding_cache.py"]},
+    {"query": "Where are concurrent queries batched before embedding?",
+     "files": ["utils/embedding_service.py"]},
+    {"query": "How is an encrypted snapshot restored?",
+     "files": ["services/snapshot.py"]},
+    {"query": "How are camelCase identifiers split for keyword search?",
+     "files": ["utils/code_tokens.py"]},
+    {"query": "How does the watcher debounce file system events?",
+     "files": ["services/watcher.py"]},
+    {"query": "How are vectors quantized to int8?",
+     "files": ["utils/vector_codec.py"]},
+    {"query": "How is PCA fitted to shrink the embeddings?",
+     "files": ["utils/projection.py"]},
+    {"query": "How are keyword and vector results fused?",
+     "files": ["services/retriever.py"]},
+    {"query": "How is a login token verified?",
+     "files": ["core/auth.py"]},
+    {"query": "How are overlapping chunks merged before prompting?",
+     "files": ["services/context.py"]},
+]
+
+
+def _first_hit(paths: list, expected: list):
+    """1-based rank of the first path ending with an expected suffix."""
+    for rank, path in enumerate(paths, 1):
+        if any(path.replace("\\", "/").endswith(suffix) for suffix in expected):
+            return rank
+    return None
+
+
+def run_mode(cases: list, rerank: bool, top_k: int, repos, llm: bool) -> dict:
+    retriever.RERANK = rerank   # rag_query goes through the module default
+    latencies, ranks, e2e, cited = [], [], [], []
+    for case in cases:
+        start = time.perf_counter()
+        results = merge_adjacent(retriever.hybrid_retrieve(case["query"], top_k=top_k, repos=repos))
+        latencies.append(time.perf_counter() - start)
+        ranks.append(_first_hit([r["file_path"] for r in results], case["files"]))
+
+        if llm:
+            from services.privcode import rag_query
+
+            start = time.perf_counter()
+            answer = rag_query(case["query"], top_k=top_k, repos=repos)
+            e2e.append(time.perf_counter() - start)
+            cited.append(_first_hit(answer.get("sources") or [], case["files"]) is not None)
+
+    found = [rank for rank in ranks if rank is not None]
+    row = {
+        "hit_rate": len(found) / len(cases),
+        "mrr": sum(1.0 / rank for rank in found) / len(cases),
+        "p50": 1000 * np.percentile(latencies, 50),
+        "p95": 1000 * np.percentile(latencies, 95),
+    }
+    if llm:
+        row["e2e_p50"] = np.percentile(e2e, 50)
+        row["cited"] = sum(cited) / len(cases)
+    return row
+
+
+def run(cases: list, top_k: int, repos, llm: bool):
+    get_reranker(wait=True)   # model load is not part of a query
+    retriever.hybrid_retrieve(cases[0]["query"], top_k=top_k, repos=repos, rerank=True)   # warm up
+
+    print(f"🔒 Re-rank benchmark: {len(cases)} questions, top_k {top_k}, "
+          f"{RERANK_MODEL}, budget {RERANK_BUDGET_MS:.0f} ms\n")
+    rows = []
+    for name, rerank in (("off", False), ("on", True)):
+        r = run_mode(cases, rerank, top_k, repos, llm)
+        row = [name, f"{r['hit_rate']:.0%}", f"{r['mrr']:.3f}", f"{r['p50']:.1f}", f"{r['p95']:.1f}"]
+        if llm:
+            row += [f"{r['e2e_p50']:.2f}", f"{r['cited']:.0%}"]
+        rows.append(row)
+
+    headers = ["Re-rank", f"Hit@{top_k}", "MRR", "Retrieval p50 ms", "Retrieval p95 ms"]
+    if llm:
+        headers += ["End-to-end p50 s", "Answers citing expected file"]
+    print(tabulate(rows, headers=headers, tablefmt="grid"))
+    print(f"\nRe-ranker: {rerank_stats()}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cases", help="JSON list of {query, files}")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--repos", nargs="*")
+    parser.add_argument("--llm", action="store_true", help="also time full rag_query answers")
+    args = parser.parse_args(argv)
+    cases = CASES
+    if args.cases:
+        with open(args.cases, encoding="utf-8") as f:
+            cases = json.load(f)
+    run(cases, args.top_k, args.repos or None, args.llm)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# vector_precision.py - Memory vs. recall of reduced-precision vector storage
+"""
+Copies the active index version of a namespace once per vector datatype
+this Redis supports (convert_index_version, nothing is re-embedded) and
+once per PCA size given with --pca (reproject_index_version, from the
+embedding cache), and reports for each copy the vector index memory, the
+query latency and the recall@k of the HNSW search against an exact numpy
+top-k over the model's full float32 embeddings.
+
+    cd backend && python -m benchmarks.vector_precision [--k 10] [--namespace NS]
+                                                       [--queries FILE] [--pca 64,128]
+
+Queries come from FILE (one per line) or, by default, the query set of the
+last run of benchmarks/benchmark.py (benchmark_results.json).
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+from tabulate import tabulate
+
+from services.indexer import (
+    REPO_PATH,
+    convert_index_version,
+    embed_chunks,
+    local_repo_path,
+    repo_namespace,
+    reproject_index_version,
+)
+from services.retriever import _search
+from utils.projection import fit_pca, save_projection, storage_vectors
+from utils.redis_utils import (
+    get_active_version,
+    get_embedder,
+    get_index,
+    get_redis_client,
+    retire_index_version,
+    wait_for_index_gc,
+    supported_datatypes,
+)
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+RESULTS_FILE = ROOT_DIR / "benchmark_results.json"
+
+
+def load_queries(path: str | None) -> list:
+    if path:
+        lines = Path(path).read_text(encoding="utf-8").splitlines()
+        return [line.strip() for line in lines if line.strip()]
+    with open(RESULTS_FILE, encoding="utf-8") as f:
+        return [r["query"] for r in json.load(f)["results"]]
+
+
+def load_vectors(version: dict):
+    """(chunk ids, full float32 embeddings) of every chunk of *version*."""
+    client = get_redis_client()
+    keys = list(client.scan_iter(match=version["prefix"] + "*", count=1000))
+    pipe = client.pipeline(transaction=False)
+    for key in keys:
+        pipe.hmget(key, "file_path", "start_line", "content")
+    ids, records = [], []
+    for file_path, start_line, content in pipe.execute():
+        if content is None:
+            continue
+        ids.append((file_path.decode(), int(start_line or 0)))
+        records.append({"content": content.decode("utf-8")})
+    return ids, embed_chunks(records, version["model"])
+
+
+def exact_top_k(ids, matrix, query_vectors, k: int) -> list:
+    """Exact cosine top-k chunk ids per query."""
+    matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    scores = query_vectors @ matrix.T
+    top = np.argsort(-scores, axis=1)[:, :k]
+    return [{ids[i] for i in row} for row in top]
+
+
+def measure(version: dict, query_vectors, truth: list, k: int) -> dict:
+    hits, elapsed = 0, 0.0
+    for vector, expected in zip(query_vectors, truth):
+        start = time.perf_counter()
+        results = _search(version, storage_vectors(vector, version).tobytes(), k, None)
+        elapsed += time.perf_counter() - start
+        hits += len(expected & {(r["file_path"], r["start_line"] or 0) for r in results})
+    info = get_index(version).info()
+    return {
+        "memory_mb": float(info.get("vector_index_sz_mb", 0) or 0),
+        "recall": hits / max(1, sum(len(t) for t in truth)),
+        "latency_ms": 1000 * elapsed / max(1, len(truth)),
+    }
+
+
+def run(namespace: str, queries: list, k: int, pca_dims=()):
+    source = get_active_version(namespace, create=False)
+    if source is None:
+        raise SystemExit(f"No index for namespace {namespace!r} - index the repository first")
+
+    print(f"🔒 Vector precision benchmark: {namespace} (v{source['version']}, "
+          f"{source['datatype']}, {source['dims']} dims), {len(queries)} queries, "
+          f"recall@{k}\n")
+    ids, matrix = load_vectors(source)
+    query_vectors = np.asarray(get_embedder(source["model"]).encode(queries), dtype=np.float32)
+    query_vectors /= np.maximum(np.linalg.norm(query_vectors, axis=1, keepdims=True), 1e-12)
+    truth = exact_top_k(ids, matrix, query_vectors, k)
+
+    def _variants():
+        for datatype in supported_datatypes():
+            if datatype == source["datatype"]:
+                yield source
+            else:
+                print(f"📦 Converting to {datatype} ...")
+                yield convert_index_version(source, datatype, activate=False)
+        for dims in pca_dims:
+            print(f"📦 Projecting to {dims} dims (PCA) ...")
+            projection = save_projection(fit_pca(matrix, dims, source["model"]))
+            yield reproject_index_version(source, projection, activate=False)
+
+    rows, baseline = [], None
+    for version in _variants():
+        try:
+            result = measure(version, query_vectors, truth, k)
+        finally:
+            if version is not source:
+                retire_index_version(version, delay=0)
+        baseline = baseline or result
+        saved = 1 - result["memory_mb"] / baseline["memory_mb"] if baseline["memory_mb"] else 0.0
+        rows.append([
+            version["datatype"],
+            version["dims"],
+            f"{result['memory_mb']:.2f}",
+            f"{saved:.0%}",
+            f"{result['recall']:.3f}",
+            f"{result['recall'] - baseline['recall']:+.3f}",
+            f"{result['latency_ms']:.1f}",
+        ])
+
+    print(tabulate(
+        rows,
+        headers=["Datatype", "Dims", "Vector MB", "Saved", f"Recall@{k}", "Δ Recall",
+                 "ms/query"],
+        tablefmt="grid",
+    ))
+    print(f"\n{len(ids)} chunks; recall is against an exact search over the "
+          f"full float32 embeddings.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--namespace", default=None,
+                        help="repository namespace (default: the test repository)")
+    parser.add_argument("--queries", default=None, help="file with one query per line")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--pca", default="",
+                        help="comma-separated PCA sizes to compare (e.g. 64,128,192)")
+    args = parser.parse_args(argv)
+
+    namespace = args.namespace or repo_namespace(local_repo_path(str(REPO_PATH)))
+    pca_dims = [int(d) for d in args.pca.split(",") if d.strip()]
+    run(namespace, load_queries(args.queries), args.k, pca_dims)
+    wait_for_index_gc()   # the compared variants are dropped in the background
+
+
+if __name__ == "__main__":
+    main()
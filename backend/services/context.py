@@ -0,0 +1,244 @@
+# context.py — Post-retrieval diversification and context merging
+"""
+Adjacent chunks of one file overlap by CHUNK_OVERLAP, so the best-ranked
+chunks of a query are often near-copies of each other and a small top_k
+spends a third of the prompt on the same lines twice.  Two stages turn
+the fused ranking into more distinct evidence per prompt token:
+
+  diversify()      maximal marginal relevance over an over-fetched
+                   candidate pool: each pick maximizes
+                   MMR_LAMBDA * relevance - (1 - MMR_LAMBDA) * max cosine
+                   similarity to the chunks already picked.  Similarity
+                   uses the stored chunk vectors (one pipelined HGET),
+                   one matrix product per vector space.
+  merge_adjacent() joins chunks of the same file that overlap or touch
+                   (by byte offset) into one contiguous span, keeping
+                   every byte of the file once; run on the final
+                   contexts, right before build_augmented_prompt.
+"""
+
+import os
+
+import numpy as np
+
+from utils.redis_utils import get_redis_client
+from utils.vector_codec import from_storage
+from core.logger import setup_logger
+
+logger = setup_logger()
+
+# 1.0 ranks by relevance alone (no vectors fetched)
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+# Candidates MMR chooses top_k from
+MMR_FETCH_K = int(os.getenv("MMR_FETCH_K", "20"))
+CONTEXT_MERGE = os.getenv("CONTEXT_MERGE", "true").lower() == "true"
+
+
+# -----------------------------------------------------------------------------
+# Maximal marginal relevance
+# -----------------------------------------------------------------------------
+
+def _chunk_vectors(results: list, versions: list):
+    """
+    Unit-length float32 vectors of *results* and the vector space of each
+    (model, projection, dims); None where a chunk has no vector.
+    """
+    by_namespace = {version["namespace"]: version for version in versions}
+    pipe = get_redis_client().pipeline(transaction=False)
+    for result in results:
+        pipe.hget(result["key"], "vector")
+
+    vectors, spaces = [], []
+    for result, raw in zip(results, pipe.execute()):
+        version = by_namespace.get(result["repo"])
+        if raw is None or version is None:
+            vectors.append(None)
+            spaces.append(None)
+            continue
+        vector = from_storage(raw, version["datatype"])
+        vectors.append(vector / max(float(np.linalg.norm(vector)), 1e-12))
+        spaces.append((version["model"], version["projection"], len(vector)))
+    return vectors, spaces
+
+
+def _similarity_matrix(vectors: list, spaces: list) -> np.ndarray:
+    """Pairwise cosine similarity; 0 across vector spaces."""
+    n = len(vectors)
+    similarity = np.zeros((n, n), dtype=np.float32)
+    groups = {}
+    for i, space in enumerate(spaces):
+        if space is not None:
+            groups.setdefault(space, []).append(i)
+    for rows in groups.values():
+        matrix = np.stack([vectors[i] for i in rows])
+        similarity[np.ix_(rows, rows)] = matrix @ matrix.T
+    return similarity
+
+
+def mmr(relevance: np.ndarray, similarity: np.ndarray, top_k: int,
+        lambda_: float = MMR_LAMBDA) -> list:
+    """Indices of the top_k picks of maximal marginal relevance, in pick order."""
+    n = len(relevance)
+    picked = []
+    available = np.ones(n, dtype=bool)
+    # Highest similarity of each candidate to anything picked so far
+    redundancy = np.full(n, -np.inf, dtype=np.float32)
+    for _ in range(min(top_k, n)):
+        gain = lambda_ * relevance - (1.0 - lambda_) * np.maximum(redundancy, 0.0)
+        gain[~available] = -np.inf
+        best = int(np.argmax(gain))
+        picked.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+    return picked
+
+
+def diversify(results: list, versions: list, top_k: int) -> list:
+    """
+    The top_k of *results* (best first, "score" higher is better) chosen
+    by maximal marginal relevance; each keeps its relevance rank as
+    scores.rank_before_mmr.
+    """
+    if len(results) <= top_k or MMR_LAMBDA >= 1.0:
+        return results[:top_k]
+    try:
+        vectors, spaces = _chunk_vectors(results, versions)
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("MMR skipped, chunk vectors unavailable: %s", exc)
+        return results[:top_k]
+
+    scores = np.array([r["score"] for r in results], dtype=np.float32)
+    relevance = scores / scores.max() if scores.max() > 0 else np.ones_like(scores)
+    picked = mmr(relevance, _similarity_matrix(vectors, spaces), top_k)
+    for index in picked:
+        if "scores" in results[index]:
+            results[index]["scores"]["rank_before_mmr"] = index + 1
+    return [results[index] for index in picked]
+
+
+# -----------------------------------------------------------------------------
+# Overlap-aware merging
+# -----------------------------------------------------------------------------
+
+def _bytes(ctx: dict):
+    """(start, end) byte offsets of a chunk in its file, or None for
+    chunks indexed before offsets were stored."""
+    metadata = ctx.get("metadata") or {}
+    start, end = metadata.get("start_byte"), metadata.get("end_byte")
+    if isinstance(start, int) and isinstance(end, int):
+        return start, end
+    return None
+
+
+def _join(first: dict, second: dict):
+    """
+    Text of *first* followed by *second* (starting no earlier), or None if
+    they are not contiguous.  Chunks never repeat bytes of the file, except
+    the fixed windows' CHUNK_OVERLAP: exactly the overlapping bytes are
+    dropped, so a line split between two chunks is joined back whole.
+    Without byte offsets only chunks on consecutive lines are joined.
+    """
+    head, tail = first["content"], second["content"]
+    a, b = _bytes(first), _bytes(second)
+    if a is None or b is None:
+        if second["start_line"] != first["end_line"] + 1:
+            return None
+        return head + ("" if head.endswith("\n") else "\n") + tail
+    if b[1] <= a[1]:
+        return head   # contained
+    if b[0] <= a[1]:
+        return head + tail.encode("utf-8")[a[1] - b[0]:].decode("utf-8", errors="ignore")
+    # A gap: blank lines or whitespace that was not chunked
+    if second["start_line"] > first["end_line"] + 1:
+        return None
+    if second["start_line"] > first["end_line"] and not head.endswith("\n"):
+        return head + "\n" + tail
+    return head + tail
+
+
+def _merge_metadata(metadata: list) -> dict:
+    merged = dict(metadata[0])
+    for key in ("functions", "classes", "definitions"):
+        values = [v for m in metadata for v in (m.get(key) or [])]
+        if values:
+            merged[key] = values if key == "definitions" else list(dict.fromkeys(values))
+    merged["end_line"] = metadata[-1].get("end_line", merged.get("end_line"))
+    return merged
+
+
+def merge_adjacent(contexts: list) -> list:
+    """
+    Merge the contexts of each file that overlap or touch into one span
+    (content joined by _join, lines and AST metadata combined, best score
+    kept).  Spans keep the rank of
+    their best chunk; "keys" lists the merged chunks.
+    """
+    if not CONTEXT_MERGE or len(contexts) < 2:
+        return contexts
+
+    by_file = {}
+    for rank, ctx in enumerate(contexts):
+        if ctx.get("start_line") is None or ctx.get("end_line") is None:
+            by_file[rank] = [(rank, ctx)]   # no line range: never merged
+        else:
+            by_file.setdefault((ctx["repo"], ctx["file_path"]), []).append((rank, ctx))
+
+    spans = []
+    for chunks in by_file.values():
+        chunks.sort(key=lambda item: (item[1]["start_line"],
+                                      (_bytes(item[1]) or (0, 0))[0],
+                                      item[1]["end_line"]))
+        group, current = [chunks[0]], chunks[0][1]
+        for item in chunks[1:]:
+            content = _join(current, item[1])
+            if content is None:
+                spans.append(_span(group, current))
+                group, current = [item], item[1]
+                continue
+            group.append(item)
+            current = _extend(current, item[1], content)
+        spans.append(_span(group, current))
+
+    spans.sort(key=lambda span: span[0])
+    merged = [span for _, span in spans]
+    if len(merged) < len(contexts):
+        logger.info("Merged %d retrieved chunks into %d spans", len(contexts), len(merged))
+    return merged
+
+
+def _extend(current: dict, ctx: dict, content: str) -> dict:
+    """The span so far, *current*, extended by *ctx* (joined *content*)."""
+    metadata = dict(current["metadata"] or {})
+    a, b = _bytes(current), _bytes(ctx)
+    if a is not None and b is not None:
+        metadata["end_byte"] = max(a[1], b[1])
+    else:
+        metadata.pop("start_byte", None)
+        metadata.pop("end_byte", None)
+    return dict(current, content=content, metadata=metadata,
+                end_line=max(current["end_line"], ctx["end_line"]))
+
+
+def _span(group: list, current: dict):
+    """(best rank, merged context) of chunks sorted by position, joined
+    into *current*."""
+    best_rank, best = min(group, key=lambda item: item[0])
+    if len(group) == 1:
+        return best_rank, best
+    span = dict(best)
+    metadata = _merge_metadata([ctx["metadata"] for _, ctx in group])
+    metadata["end_line"] = current["end_line"]
+    offsets = _bytes(current)
+    if offsets is not None:
+        metadata["start_byte"], metadata["end_byte"] = offsets
+    else:
+        metadata.pop("start_byte", None)
+        metadata.pop("end_byte", None)
+    span.update(
+        content=current["content"],
+        start_line=current["start_line"],
+        end_line=current["end_line"],
+        metadata=metadata,
+        keys=[ctx["key"] for _, ctx in group],
+    )
+    return best_rank, span
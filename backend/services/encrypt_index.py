@@ -1,19 +1,38 @@
-from pathlib import Path
+# encrypt_index.py — Export / restore encrypted knowledge-base snapshots
+"""
+Command-line front end for services.snapshot (the index lives in Redis;
+the FAISS / BM25 files this script used to encrypt are gone).
 
-from cryptography.fernet import Fernet
+    python -m services.encrypt_index export [DIRECTORY]
+    python -m services.encrypt_index restore [DIRECTORY]
+    python -m services.encrypt_index list
+"""
 
-ROOT_DIR = Path(__file__).resolve().parents[2]
-KEY_FILE = ROOT_DIR / "secret.key"
+import argparse
 
-with KEY_FILE.open("rb") as f:
-    key = f.read()
+from services.snapshot import export_all, list_snapshots, restore_snapshot
 
-cipher = Fernet(key)
 
-for file_name in ["faiss.index", "documents.json", "metadatas.json", "bm25.pkl"]:
-    path = ROOT_DIR / "index" / file_name
-    if path.exists():
-        data = path.read_bytes()
-        encrypted = cipher.encrypt(data)
-        (path.with_suffix(path.suffix + ".enc")).write_bytes(encrypted)
-        print(f"Encrypted {file_name}")
\ No newline at end of file
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("command", choices=("export", "restore", "list"))
+    parser.add_argument("directory", nargs="?", default=None,
+                        help="snapshot directory (default: new / newest under SNAPSHOT_DIR)")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for snapshot in list_snapshots():
+            print(f"{snapshot['name']}  {snapshot['size_bytes']:>12,d} B  "
+                  f"{', '.join(snapshot['namespaces'])}")
+        return
+
+    if args.command == "export":
+        results = export_all(args.directory)
+    else:
+        results = restore_snapshot(args.directory)
+    for result in results:
+        print(f"🔒 {result['namespace']}: {result['rows']} chunks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# git_objects.py — Read source straight from the git object database
+"""
+Indexing a branch, tag or commit without a working-tree checkout.
+
+Remote repositories are kept as bare, blobless partial clones
+(``git clone --bare --filter=blob:none``): commits and trees arrive on
+clone / fetch, file contents only when they are about to be indexed.  The
+commit tree says which blob every path points at, so change detection
+compares blob shas with the previous run and unchanged files are never
+fetched or read again.
+
+Blobs that are needed are fetched from the promisor remote in large
+batches up front (the same request git issues internally for missing
+objects) rather than one lazy round-trip per file.
+"""
+
+import subprocess
+import threading
+from pathlib import Path
+
+from git import Repo, GitCommandError
+
+from core.logger import setup_logger
+
+logger = setup_logger()
+
+# Object ids per prefetch request
+PREFETCH_BATCH_SIZE = 2000
+
+_FETCH_REFSPECS = ["+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*"]
+
+
+def open_blobless_clone(url: str, dest: Path) -> Repo:
+    """Bare blobless clone of *url* at *dest*, or fetch if it exists."""
+    if dest.exists() and (dest / "HEAD").is_file():
+        logger.info("Fetching refs from %s ...", url)
+        repo = Repo(str(dest))
+        try:
+            repo.git.fetch("origin", *_FETCH_REFSPECS,
+                           "--prune", "--filter=blob:none")
+        except GitCommandError as exc:
+            logger.warning("Fetch failed (%s). Using existing refs.", exc)
+        return repo
+
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    logger.info("Cloning %s -> %s (bare, blobless) ...", url, dest)
+    repo = Repo.clone_from(url, str(dest), bare=True, filter="blob:none")
+    logger.info("Clone complete: %s", dest.name)
+    return repo
+
+
+def is_partial_clone(repo: Repo) -> bool:
+    # Older git records the promisor remote as extensions.partialclone
+    try:
+        return bool(repo.git.config(
+            "--get-regexp", r"^(extensions\.partialclone|remote\..*\.promisor)$"
+        ))
+    except GitCommandError:
+        return False
+
+
+def tree_blobs(commit, include) -> dict:
+    """
+    {rel_path: blob sha} of every file in *commit*'s tree for which
+    include(rel_path) is true.  Only tree objects are read.
+    """
+    blobs = {}
+    for item in commit.tree.traverse():
+        if item.type == "blob" and include(item.path):
+            blobs[item.path] = item.hexsha
+    return blobs
+
+
+def prefetch_blobs(repo: Repo, shas):
+    """
+    Download the blobs *shas* of a partial clone in batches.  Failures are
+    logged only: reading a missing blob still fetches it on demand.
+    """
+    shas = sorted(set(shas))
+    if not shas or not is_partial_clone(repo):
+        return
+    logger.info("Fetching %d blobs ...", len(shas))
+    for i in range(0, len(shas), PREFETCH_BATCH_SIZE):
+        batch = shas[i:i + PREFETCH_BATCH_SIZE]
+        result = subprocess.run(
+            ["git", "-C", repo.git_dir,
+             "-c", "fetch.negotiationAlgorithm=noop",
+             "fetch", "origin", "--no-tags", "--no-write-fetch-head",
+             "--recurse-submodules=no", "--filter=blob:none", "--stdin"],
+            input="\n".join(batch) + "\n",
+            capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            logger.warning("Blob prefetch failed: %s", result.stderr.strip())
+            return
+
+
+class BlobReader:
+    """
+    The indexable files of one commit, read from the object database.
+
+    Iterating yields the relative paths; read() returns the same record
+    as services.indexer.read_file().  Each thread gets its own Repo (and
+    so its own ``git cat-file`` process), which are not thread-safe.
+    """
+
+    def __init__(self, repo: Repo, blobs: dict):
+        self.git_dir = repo.git_dir
+        self.blobs = blobs
+        self._local = threading.local()
+
+    def __iter__(self):
+        return iter(sorted(self.blobs))
+
+    def __len__(self):
+        return len(self.blobs)
+
+    def __contains__(self, rel_path):
+        return rel_path in self.blobs
+
+    def _repo(self) -> Repo:
+        repo = getattr(self._local, "repo", None)
+        if repo is None:
+            repo = self._local.repo = Repo(self.git_dir)
+        return repo
+
+    def read(self, rel_path: str):
+        try:
+            stream = self._repo().odb.stream(bytes.fromhex(self.blobs[rel_path]))
+            content = stream.read().decode("utf-8", errors="ignore")
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Failed to read %s: %s", rel_path, exc)
+            return None
+        return {
+            "rel_path": rel_path,
+            "language": Path(rel_path).suffix.lstrip("."),
+            "content": content,
+        }
@@ -1,17 +1,69 @@
+import atexit
 import json
+import multiprocessing
 import os
 import re
 import hashlib
 import shutil
-import numpy as np
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from urllib.parse import urlparse
 
+import numpy as np
 from git import Repo, GitCommandError
 from tqdm import tqdm
 
-from utils.redis_utils import get_index, get_embedder
-from utils.ast_parser import extract_ast_metadata
+from utils.redis_utils import (
+    DEFAULT_NAMESPACE,
+    EMBEDDING_MODEL,
+    LEGACY_UID,
+    activate_index_version,
+    create_index_version,
+    drop_namespace,
+    get_active_version,
+    get_embedder,
+    get_index,
+    get_redis_client,
+    register_namespace,
+    retire_index_version,
+    storage_datatype,
+    wait_for_index_gc,
+)
+from utils.code_tokens import identifier_text, symbol_tags
+from utils.embedding_cache import encode_with_cache
+from utils.query_cache import invalidate_files, invalidate_namespace
+from utils.projection import (
+    EMBEDDING_PROJECTION,
+    PROJECTION_DIMS,
+    PROJECTION_FIT_SAMPLES,
+    PROJECTION_MIN_SAMPLES,
+    fit_pca,
+    is_current,
+    load_projection,
+    new_version_projection,
+    save_projection,
+    storage_vectors,
+)
+from utils.vector_codec import DATATYPE_BITS, from_storage, to_storage
+# chunk_code / CHUNK_* stay importable from here for existing callers
+from utils.chunking import (
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    chunk_code,
+    configure_tokenizer,
+    init_worker,
+    parse_file,
+    parse_text,
+    read_source,
+)
+from services.git_objects import (
+    BlobReader,
+    open_blobless_clone,
+    prefetch_blobs,
+    tree_blobs,
+)
+from services.pipeline import PipelineStopped, Stage, run_pipeline
 from core.logger import setup_logger
 
 # -----------------------------------------------------------------------------
@@ -28,99 +80,566 @@ METADATA_FILE = ".privcode_metadata.json"
 CODE_EXTENSIONS = {".py", ".js", ".java", ".ts", ".cpp", ".c", ".go", ".jsx", ".tsx"}
 SKIP_DIRS = {".git", "node_modules", "__pycache__", "venv", ".venv", "build"}
 
-CHUNK_SIZE = 800
-CHUNK_OVERLAP = 100
+# Batched indexing: chunks from many files are buffered and flushed together,
+# so Redis receives one pipelined bulk load per flush instead of one
+# round-trip per chunk.  The embedding service splits each flush into
+# forward passes of EMBED_SERVICE_MAX_BATCH chunks (utils.embedding_service).
+INDEX_BATCH_SIZE = int(os.getenv("INDEX_BATCH_SIZE", "512"))
+
+# Streaming pipeline: worker threads per stage and bound of the file queues
+PIPELINE_READ_WORKERS = int(os.getenv("PIPELINE_READ_WORKERS", "4"))
+PIPELINE_AST_WORKERS = int(os.getenv("PIPELINE_AST_WORKERS", "2"))
+PIPELINE_EMBED_WORKERS = int(os.getenv("PIPELINE_EMBED_WORKERS", "1"))
+PIPELINE_WRITE_WORKERS = int(os.getenv("PIPELINE_WRITE_WORKERS", "2"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "64"))
+
+# Process-pool mode for read/chunk/AST (the CPU hot spot after embedding).
+# Used for full builds and large diffs; 0 or 1 keeps everything in threads.
+INDEX_PROCESSES = int(os.getenv("INDEX_PROCESSES", str(max(1, (os.cpu_count() or 2) - 1))))
+PROCESS_POOL_MIN_FILES = int(os.getenv("PROCESS_POOL_MIN_FILES", "200"))
 
 # -----------------------------------------------------------------------------
 # Metadata helpers (Git incremental indexing)
 # -----------------------------------------------------------------------------
 
-def load_metadata(repo_path: Path):
-    meta_path = repo_path / METADATA_FILE
+def load_metadata(repo_path: Path, name: str = METADATA_FILE):
+    meta_path = repo_path / name
     if meta_path.exists():
         return json.loads(meta_path.read_text(encoding="utf-8"))
     return {"last_commit": None}
 
 
-def save_metadata(repo_path: Path, data: dict):
-    meta_path = repo_path / METADATA_FILE
+def save_metadata(repo_path: Path, data: dict, name: str = METADATA_FILE):
+    meta_path = repo_path / name
     meta_path.write_text(json.dumps(data, indent=2), encoding="utf-8")
 
 
-# -----------------------------------------------------------------------------
-# Chunking helper
-# -----------------------------------------------------------------------------
-
-def chunk_code(text: str):
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = start + CHUNK_SIZE
-        chunks.append(text[start:end])
-        start = end - CHUNK_OVERLAP
-    return chunks
-
-
 # -----------------------------------------------------------------------------
 # Redis indexing logic
 # -----------------------------------------------------------------------------
 
-def index_file(file_path: Path, repo_root: Path):
-    try:
-        content = file_path.read_text(encoding="utf-8", errors="ignore")
-    except Exception as exc:
-        logger.warning("Failed to read %s: %s", file_path, exc)
-        return
+def chunk_key(rel_path, i: int, prefix: str) -> str:
+    """
+    Stable deterministic Redis key for chunk *i* of *rel_path* under the
+    key *prefix* of an index version.
+    """
+    return prefix + hashlib.sha256(
+        f"{rel_path}-{i}".encode()
+    ).hexdigest()[:16]
 
-    rel_path = file_path.relative_to(repo_root)
-    language = file_path.suffix.lstrip(".")
 
-    chunks = chunk_code(content)
+def read_file(file_path: Path, repo_root: Path):
+    """
+    Read one file.
+    Returns {"rel_path", "language", "content"}, or None if unreadable.
+    """
+    content = read_source(file_path)
+    if content is None:
+        return None
 
-    for i, chunk in enumerate(chunks):
-        vector = np.array(
-            get_embedder().encode(chunk),
-            dtype=np.float32
-        ).tobytes()
-        ast_metadata = extract_ast_metadata(chunk, str(rel_path))
+    return {
+        "rel_path": str(file_path.relative_to(repo_root)),
+        "language": file_path.suffix.lstrip("."),
+        "content": content,
+    }
 
-        # Stable deterministic Redis key
-        doc_id = "code:" + hashlib.sha256(
-            f"{rel_path}-{i}".encode()
-        ).hexdigest()[:16]
 
-        payload = {
+def build_records(rel_path: str, language: str, parsed: list, prefix: str) -> list:
+    """Turn parse_source() tuples into chunk records keyed for Redis."""
+    return [
+        {
+            "key": chunk_key(rel_path, i, prefix),
             "content": chunk,
-            "vector": vector,
-            "metadata": ast_metadata,
-            "file_path": str(rel_path),
+            "metadata": metadata,
+            "file_path": rel_path,
             "language": language,
+            "start_line": start_line,
+            "end_line": end_line,
         }
+        for i, (chunk, metadata, start_line, end_line) in enumerate(parsed)
+    ]
+
+
+def parse_item(item: dict):
+    """Chunk and AST-parse a read file; same tuple shape as parse_file()."""
+    return parse_text(item["content"], item["rel_path"], item["language"])
+
+
+def embed_chunks(records: list, model: str):
+    """
+    Embed *records* with *model* as one contiguous float32 matrix, served
+    from the content-addressed embedding cache where possible.
+    """
+    # Only chunks whose text was never embedded before reach the model
+    return encode_with_cache([r["content"] for r in records], model=model)
+
 
-        get_index().load([payload], keys=[doc_id])
+def load_chunks(records: list, vectors, version: dict):
+    """
+    Bulk-load embedded *records* through redisvl's pipelined loader, with
+    the vectors projected and encoded as *version* stores them.
+    """
+    vectors = storage_vectors(vectors, version)
+    keys = []
+    payloads = []
+    for record, vector in zip(records, vectors):
+        keys.append(record["key"])
+        payloads.append({
+            "content": record["content"],
+            "vector": vector.tobytes(),
+            "metadata": record["metadata"],
+            "identifiers": identifier_text(record["content"]),
+            "symbols": symbol_tags(record["metadata"]),
+            "file_path": record["file_path"],
+            "repo": version["namespace"],
+            "language": record["language"],
+            "start_line": record["start_line"],
+            "end_line": record["end_line"],
+        })
 
-    logger.info("Indexed %s (%d chunks)", rel_path, len(chunks))
+    get_index(version).load(payloads, keys=keys, batch_size=INDEX_BATCH_SIZE)
 
 
 # -----------------------------------------------------------------------------
-# Full index build (Redis)
+# Stale chunk cleanup
 # -----------------------------------------------------------------------------
 
-def build_full_index(repo_path: Path):
-    logger.info("Building full Redis index...")
+def delete_chunks(rel_path, start: int, end: int, prefix: str):
+    """Delete chunk keys [start, end) of *rel_path* (no-op if range is empty)."""
+    if end <= start:
+        return
+    keys = [chunk_key(rel_path, i, prefix) for i in range(start, end)]
+    get_redis_client().delete(*keys)
+
+
+def rename_chunks(old_path: str, new_path: str, count: int, prefix: str):
+    """
+    Move the *count* chunks of a renamed (content-identical) file to the keys
+    of its new path, updating the file_path field and AST metadata in place.
+    """
+    if count <= 0:
+        return
+    client = get_redis_client()
+    old_keys = [chunk_key(old_path, i, prefix) for i in range(count)]
+
+    pipe = client.pipeline(transaction=False)
+    for key in old_keys:
+        pipe.hget(key, "metadata")
+    old_metadata = pipe.execute()
 
+    pipe = client.pipeline(transaction=False)
+    for i, (key, raw) in enumerate(zip(old_keys, old_metadata)):
+        if raw is None:
+            continue
+        new_key = chunk_key(new_path, i, prefix)
+        meta = json.loads(raw)
+        meta["file"] = new_path
+        pipe.rename(key, new_key)
+        pipe.hset(new_key, mapping={
+            "file_path": new_path,
+            "metadata": json.dumps(meta),
+        })
+    pipe.execute()
+
+
+# -----------------------------------------------------------------------------
+# Full index build (Redis)
+# -----------------------------------------------------------------------------
+
+def iter_code_files(repo_path: Path):
+    """Yield every indexable source file under *repo_path*."""
     for root, dirs, files in os.walk(repo_path):
         # Skip unwanted directories
         dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
 
         for file in files:
             file_path = Path(root) / file
-            if file_path.suffix.lower() not in CODE_EXTENSIONS:
-                continue
+            if file_path.suffix.lower() in CODE_EXTENSIONS:
+                yield file_path
+
+
+def configure_chunking(model: str | None = None):
+    """Size chunks with the embedder's own tokenizer and sequence limit."""
+    embedder = get_embedder(model)
+    configure_tokenizer(embedder.tokenizer, embedder.max_seq_length)
+    return embedder.tokenizer, embedder.max_seq_length
+
 
-            index_file(file_path, repo_path)
+_process_pool = None
+_process_pool_lock = threading.Lock()
 
-    logger.info("Full indexing completed.")
+
+def _get_process_pool():
+    """Shared process pool for read/chunk/AST work (created on first use)."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            logger.info("Starting indexing process pool (%d workers)", INDEX_PROCESSES)
+            # spawn (not fork): the parent already runs pipeline threads and
+            # holds Redis sockets, neither of which is fork-safe
+            _process_pool = ProcessPoolExecutor(
+                max_workers=INDEX_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+                initargs=configure_chunking(),
+            )
+            atexit.register(_process_pool.shutdown, cancel_futures=True)
+    return _process_pool
+
+
+def _use_process_pool(file_paths) -> bool:
+    if INDEX_PROCESSES <= 1:
+        return False
+    # Small incremental diffs are cheaper in threads than in IPC round-trips
+    return not isinstance(file_paths, (list, tuple, set)) or len(file_paths) >= PROCESS_POOL_MIN_FILES
+
+
+def new_stats() -> dict:
+    """Counters updated live while indexing; files_total is None until known."""
+    return {"files": 0, "files_total": None, "chunks": 0, "legacy_truncated": 0}
+
+
+def index_paths(file_paths, repo_path: Path, known_files: dict | None = None,
+                should_stop=None, stats: dict | None = None, *,
+                version: dict, read_fn=None) -> dict:
+    """
+    Index *file_paths* through the streaming pipeline:
+
+        walk ─▶ read/chunk ─▶ AST metadata ─▶ embed (batched) ─▶ Redis write
+
+    Stages overlap (disk I/O, tree-sitter, torch, network) and are joined by
+    bounded queues, so memory stays flat however many files are fed in.  For
+    large inputs, read/chunk/AST runs in a process pool across all cores.
+
+    Returns {rel_path: chunk_count} for every file indexed.  When
+    *known_files* (the previous chunk counts) is given, trailing chunks of
+    files that got shorter are deleted.  *stats* (see new_stats) is updated
+    with file / chunk totals and how many of the old fixed 800-character
+    windows would have been truncated by the embedder.  Chunks go to the
+    index *version* (meta dict).  *read_fn*
+    turns each item of *file_paths* into a read_file() record; by default
+    the items are paths on disk.
+    """
+    known_files = known_files or {}
+    stats = stats if stats is not None else new_stats()
+    prefix, model = version["prefix"], version["model"]
+    chunk_counts = {}
+    counts_lock = threading.Lock()
+    configure_chunking(model)
+
+    def _collect(parsed):
+        if parsed is None:
+            return None
+        rel_path, language, chunks, legacy_truncated = parsed
+        with counts_lock:
+            chunk_counts[rel_path] = len(chunks)
+            stats["files"] += 1
+            stats["chunks"] += len(chunks)
+            stats["legacy_truncated"] += legacy_truncated
+        return build_records(rel_path, language, chunks, prefix)
+
+    def _read(file_path):
+        item = read_fn(file_path) if read_fn else read_file(file_path, repo_path)
+        return None if item is None else [item]
+
+    def _annotate(item):
+        return _collect(parse_item(item))
+
+    def _parse_in_pool(file_path):
+        return _collect(pool.submit(parse_file, str(file_path), str(repo_path)).result())
+
+    def _annotate_in_pool(item):
+        return _collect(pool.submit(
+            parse_text, item["content"], item["rel_path"], item["language"]
+        ).result())
+
+    def _embed(records):
+        return [(records, embed_chunks(records, model))]
+
+    def _write(batch):
+        load_chunks(*batch, version)
+
+    if _use_process_pool(file_paths) and read_fn is None:
+        pool = _get_process_pool()
+        # Twice as many submitting threads as processes keeps every core busy
+        parse_stages = [
+            Stage("parse", _parse_in_pool, workers=2 * INDEX_PROCESSES,
+                  queue_size=PIPELINE_QUEUE_SIZE),
+        ]
+    elif _use_process_pool(file_paths):
+        # Content does not come from disk: read here, parse in the pool
+        pool = _get_process_pool()
+        parse_stages = [
+            Stage("read", _read, workers=PIPELINE_READ_WORKERS,
+                  queue_size=PIPELINE_QUEUE_SIZE),
+            Stage("ast", _annotate_in_pool, workers=2 * INDEX_PROCESSES,
+                  queue_size=PIPELINE_QUEUE_SIZE),
+        ]
+    else:
+        parse_stages = [
+            Stage("read", _read, workers=PIPELINE_READ_WORKERS,
+                  queue_size=PIPELINE_QUEUE_SIZE),
+            Stage("ast", _annotate, workers=PIPELINE_AST_WORKERS,
+                  queue_size=PIPELINE_QUEUE_SIZE),
+        ]
+
+    run_pipeline(
+        file_paths,
+        parse_stages + [
+            Stage("embed", _embed, workers=PIPELINE_EMBED_WORKERS,
+                  batch_size=INDEX_BATCH_SIZE, queue_size=2 * INDEX_BATCH_SIZE),
+            Stage("write", _write, workers=PIPELINE_WRITE_WORKERS,
+                  queue_size=2 * PIPELINE_WRITE_WORKERS),
+        ],
+        should_stop=should_stop,
+    )
+
+    for rel_path, count in chunk_counts.items():
+        delete_chunks(rel_path, count, known_files.get(rel_path, 0), prefix)
+
+    return chunk_counts
+
+
+def log_stats(stats: dict, label: str):
+    logger.info(
+        "%s: %d files, %d chunks (%d chunks would have been truncated "
+        "under the old fixed-window chunking).",
+        label, stats["files"], stats["chunks"], stats["legacy_truncated"],
+    )
+
+
+def build_full_index(repo_path: Path, known_files: dict | None = None,
+                     stats: dict | None = None, should_stop=None, *,
+                     version: dict,
+                     blob_reader: BlobReader | None = None) -> dict:
+    """
+    Index every source file in *repo_path* into *version* (meta dict).  With *blob_reader* the files of its commit
+    are read from the object database instead of the working tree.
+
+    Returns {rel_path: chunk_count}.  Files listed in *known_files* that no
+    longer exist have all of their chunks deleted.
+    """
+    logger.info("Building full Redis index...")
+    known_files = known_files or {}
+    stats = stats if stats is not None else new_stats()
+
+    # Listing the tree up front is cheap next to embedding and gives
+    # progress reporting a total to work against
+    if blob_reader is not None:
+        file_paths = list(blob_reader)
+    else:
+        file_paths = list(iter_code_files(repo_path))
+    stats["files_total"] = len(file_paths)
+
+    chunk_counts = index_paths(file_paths, repo_path, known_files,
+                               should_stop=should_stop, stats=stats, version=version,
+                               read_fn=blob_reader.read if blob_reader else None)
+
+    for rel_path, count in known_files.items():
+        if rel_path not in chunk_counts:
+            delete_chunks(rel_path, 0, count, version["prefix"])
+
+    log_stats(stats, "Full indexing completed")
+    return chunk_counts
+
+
+def rebuild_index(repo_path: Path, stats: dict | None = None, should_stop=None,
+                  model_name: str | None = None,
+                  namespace: str = DEFAULT_NAMESPACE,
+                  blob_reader: BlobReader | None = None) -> dict:
+    """
+    Blue-green rebuild: index *repo_path* into a fresh version of
+    *namespace* built with *model_name* (default EMBEDDING_MODEL) while
+    queries keep using the active one, then swap it in and drop the old
+    version in the background.  A failed or cancelled build is discarded
+    and the active version stays.
+
+    A fitted PCA projection of the active version is reused when it
+    still matches the configuration.
+
+    Returns {rel_path: chunk_count} of the new version.
+    """
+    model_name = model_name or EMBEDDING_MODEL
+    projection = new_version_projection(
+        model_name, get_active_version(namespace, create=False))
+    version = create_index_version(model_name, namespace, projection=projection)
+    try:
+        chunk_counts = build_full_index(repo_path, stats=stats,
+                                        should_stop=should_stop, version=version,
+                                        blob_reader=blob_reader)
+    except BaseException:
+        retire_index_version(version, delay=0)
+        raise
+    activate_index_version(version)
+    return chunk_counts
+
+
+def _copy_chunks(source: dict, target: dict, vectors_fn, should_stop=None):
+    """
+    Copy every chunk of index version *source* into *target*, replacing
+    the vectors with vectors_fn(list of chunk hashes) (a matrix in the
+    target's storage format).  *target* is dropped if the copy fails.
+    """
+    client = get_redis_client()
+    src_prefix, dst_prefix = source["prefix"].encode(), target["prefix"].encode()
+
+    def _copy(keys):
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(key)
+        rows = [
+            (key, fields) for key, fields in zip(keys, pipe.execute())
+            if fields and b"vector" in fields   # deleted meanwhile
+        ]
+        if not rows:
+            return
+        vectors = vectors_fn([fields for _, fields in rows])
+        pipe = client.pipeline(transaction=False)
+        for (key, fields), vector in zip(rows, vectors):
+            fields[b"vector"] = vector.tobytes()
+            # Chunks indexed before these fields existed
+            if b"identifiers" not in fields:
+                fields[b"identifiers"] = identifier_text(
+                    fields.get(b"content", b"").decode("utf-8", errors="ignore")
+                )
+            if b"symbols" not in fields:
+                fields[b"symbols"] = symbol_tags(fields.get(b"metadata", b"{}"))
+            pipe.hset(dst_prefix + key[len(src_prefix):], mapping=fields)
+        pipe.execute()
+
+    try:
+        batch = []
+        for key in client.scan_iter(match=source["prefix"] + "*", count=1000):
+            batch.append(key)
+            if len(batch) >= INDEX_BATCH_SIZE:
+                if should_stop is not None and should_stop():
+                    raise PipelineStopped()
+                _copy(batch)
+                batch = []
+        if batch:
+            _copy(batch)
+    except BaseException:
+        retire_index_version(target, delay=0)
+        raise
+
+
+def convert_index_version(source: dict, datatype: str, should_stop=None,
+                          activate: bool = True) -> dict:
+    """
+    Copy the chunks of index version *source* into a new version of its
+    namespace that stores *datatype* vectors.  Stored vectors are
+    converted, nothing is re-embedded, and the copy keeps the uid (it
+    holds the same chunks).  With *activate* it is swapped in blue-green.
+    """
+    target = create_index_version(source["model"], source["namespace"],
+                                  uid=source["uid"], datatype=datatype,
+                                  projection=load_projection(source["projection"]))
+    logger.info("Converting index version %d (%s -> %s)...",
+                source["version"], source["datatype"], target["datatype"])
+
+    def _convert(rows):
+        vectors = np.vstack([from_storage(r[b"vector"], source["datatype"]) for r in rows])
+        return to_storage(vectors, target["datatype"])
+
+    _copy_chunks(source, target, _convert, should_stop)
+    if activate:
+        activate_index_version(target)
+    return target
+
+
+def reproject_index_version(source: dict, projection: dict | None, should_stop=None,
+                            activate: bool = True) -> dict:
+    """
+    Copy the chunks of index version *source* into a new version of its
+    namespace whose vectors are projected with *projection* (None: the
+    model's own vectors) and stored in storage_datatype().  Projections
+    cannot be undone, so the full embeddings come from the embedding
+    cache (only evicted chunks are embedded again).  Keeps the uid.
+    """
+    target = create_index_version(source["model"], source["namespace"],
+                                  uid=source["uid"], projection=projection)
+    logger.info("Re-projecting index version %d (%d -> %d dims)...",
+                source["version"], source["dims"], target["dims"])
+
+    def _reproject(rows):
+        texts = [r[b"content"].decode("utf-8") for r in rows]
+        return storage_vectors(embed_chunks([{"content": t} for t in texts],
+                                            source["model"]), target)
+
+    _copy_chunks(source, target, _reproject, should_stop)
+    if activate:
+        activate_index_version(target)
+    return target
+
+
+def _fit_projection(version: dict):
+    """
+    Projection EMBEDDING_PROJECTION asks for, fitted on the chunks of
+    *version* for PCA.  None when no projection is configured or there
+    are fewer than PROJECTION_MIN_SAMPLES chunks to fit PCA on.
+    """
+    if EMBEDDING_PROJECTION != "pca":
+        return new_version_projection(version["model"])
+    client = get_redis_client()
+    keys = []
+    for key in client.scan_iter(match=version["prefix"] + "*", count=1000):
+        keys.append(key)
+        if len(keys) >= PROJECTION_FIT_SAMPLES:
+            break
+    if len(keys) < max(PROJECTION_MIN_SAMPLES, PROJECTION_DIMS):
+        logger.info("%d chunks in %s - too few to fit PCA yet",
+                    len(keys), version["namespace"])
+        return None
+    pipe = client.pipeline(transaction=False)
+    for key in keys:
+        pipe.hget(key, "content")
+    records = [{"content": c.decode("utf-8")} for c in pipe.execute() if c is not None]
+    vectors = embed_chunks(records, version["model"])
+    return save_projection(fit_pca(vectors, PROJECTION_DIMS, version["model"]))
+
+
+def refit_projection(namespace: str, should_stop=None):
+    """
+    Fit the configured projection afresh on the chunks of *namespace*'s
+    active version and re-project it into a new version (blue-green).
+    Returns the new active version, or None if there was nothing to do.
+    """
+    active = get_active_version(namespace, create=False)
+    if active is None:
+        return None
+    projection = _fit_projection(active)
+    if (projection["id"] if projection else "") == active["projection"]:
+        return None
+    return reproject_index_version(active, projection, should_stop)
+
+
+def _reconcile_version(active: dict, full: bool, should_stop=None):
+    """
+    (version to index into, rebuild?) for a namespace's *active* version.
+    A different embedding model needs a blue-green rebuild.  A projection
+    other than the configured one is re-projected from the embedding
+    cache, and a different storage datatype is converted in place of a
+    rebuild, unless it would raise the precision, which only re-embedding
+    can.
+    """
+    if full:
+        return active, True
+    if active["model"] != EMBEDDING_MODEL:
+        logger.info(
+            "Embedding model changed (%s -> %s) - rebuilding into a new index version",
+            active["model"], EMBEDDING_MODEL,
+        )
+        return active, True
+    if not is_current(active):
+        active = refit_projection(active["namespace"], should_stop) or active
+    datatype = storage_datatype()
+    if active["datatype"] == datatype:
+        return active, False
+    if DATATYPE_BITS[datatype] > DATATYPE_BITS[active["datatype"]]:
+        logger.info("Vector datatype raised (%s -> %s) - rebuilding into a new index version",
+                    active["datatype"], datatype)
+        return active, True
+    return convert_index_version(active, datatype, should_stop), False
 
 
 # -----------------------------------------------------------------------------
@@ -146,6 +665,55 @@ def _repo_dir_name(url: str) -> str:
     return path.replace("/", "_").replace("\\", "_")
 
 
+def local_repo_path(path_or_url: str) -> Path:
+    """
+    Where resolve_repo_path() puts *path_or_url*, without cloning or
+    pulling — a cheap identity for the repository.
+    """
+    if not _is_git_url(path_or_url):
+        return Path(path_or_url).expanduser().resolve()
+    return REPOS_DIR / _repo_dir_name(path_or_url.strip())
+
+
+def check_repo_access(path_or_url: str):
+    """
+    Raise PermissionError if *path_or_url* is a local directory this
+    process cannot read, so callers can refuse it before queuing a job.
+    Remote URLs are checked when they are cloned.
+    """
+    if _is_git_url(path_or_url):
+        return
+    path = local_repo_path(path_or_url)
+    if path.exists() and not os.access(path, os.R_OK | os.X_OK):
+        raise PermissionError(f"Permission denied: {path}")
+
+
+def repo_namespace(repo_path, ref: str | None = None) -> str:
+    """
+    Index namespace of the repository at local path *repo_path*: its
+    directory name plus a short hash of the full path, so two checkouts
+    with the same name never share an index.  A git *ref* indexed from
+    the object database gets a namespace of its own.
+    """
+    path, name = str(repo_path), Path(repo_path).name
+    if ref:
+        path, name = f"{path}@{ref}", f"{name}_{ref}"
+    slug = re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")[:48]
+    return f"{slug or 'repo'}_{hashlib.sha1(path.encode()).hexdigest()[:8]}"
+
+
+def resolve_git_repo(path_or_url: str) -> Repo:
+    """
+    Repository whose object database a ref is indexed from: a bare,
+    blobless clone in REPOS_DIR for remote URLs (fetched if it exists),
+    the repository itself for local paths.  Nothing is checked out.
+    """
+    if not _is_git_url(path_or_url):
+        return Repo(str(Path(path_or_url).expanduser().resolve()))
+    url = path_or_url.strip()
+    return open_blobless_clone(url, REPOS_DIR / f"{_repo_dir_name(url)}.git")
+
+
 def resolve_repo_path(path_or_url: str) -> Path:
     """
     If *path_or_url* is a remote Git URL, clone it (or pull if already cloned)
@@ -184,35 +752,373 @@ def resolve_repo_path(path_or_url: str) -> Path:
 # Incremental indexing (Git-aware)
 # -----------------------------------------------------------------------------
 
-def incremental_index(repo_path_or_url):
+def _is_indexable(rel_path: str | None) -> bool:
+    if not rel_path:
+        return False
+    path = Path(rel_path)
+    if path.suffix.lower() not in CODE_EXTENSIONS:
+        return False
+    return not any(part in SKIP_DIRS for part in path.parts[:-1])
+
+
+def _dirty_paths(repo: Repo, worktree=None) -> set:
+    """Indexable paths whose working-tree content differs from HEAD."""
+    if worktree is None:
+        worktree = repo.head.commit.diff(None)
+    dirty = {d.b_path or d.a_path for d in worktree}
+    dirty.update(repo.untracked_files)
+    return {p for p in dirty if _is_indexable(p)}
+
+
+def _diff_changes(repo: Repo, last_commit: str, previously_dirty):
+    """
+    Diff last_commit..HEAD plus HEAD..working tree.
+
+    Returns (upserts, deletes, renames, dirty) where renames are
+    (old_path, new_path) pairs whose content is unchanged and dirty is the
+    set of paths whose indexed content comes from the working tree.
+    """
+    upserts, deletes, renames = set(), set(), []
+    head = repo.head.commit
+
+    committed = list(repo.commit(last_commit).diff(head))
+    worktree = list(head.diff(None))
+    dirty = _dirty_paths(repo, worktree)
+
+    for diff in committed + worktree:
+        old_path, new_path = diff.a_path, diff.b_path
+
+        if diff.change_type == "D":
+            if _is_indexable(old_path):
+                deletes.add(old_path)
+                upserts.discard(old_path)
+        elif diff.change_type == "R":
+            same_blob = (
+                diff.a_blob is not None
+                and diff.b_blob is not None
+                and diff.a_blob.hexsha == diff.b_blob.hexsha
+            )
+            if same_blob and _is_indexable(old_path) and _is_indexable(new_path):
+                renames.append((old_path, new_path))
+                continue
+            if _is_indexable(old_path):
+                deletes.add(old_path)
+                upserts.discard(old_path)
+            if _is_indexable(new_path):
+                upserts.add(new_path)
+                deletes.discard(new_path)
+        elif _is_indexable(new_path):
+            upserts.add(new_path)
+            deletes.discard(new_path)
+
+    for rel_path in repo.untracked_files:
+        if _is_indexable(rel_path):
+            upserts.add(rel_path)
+            deletes.discard(rel_path)
+
+    # Paths indexed from an earlier dirty working tree must be restored to
+    # their committed content even when nothing else touched them.
+    for rel_path in previously_dirty:
+        if rel_path in dirty or not _is_indexable(rel_path):
+            continue
+        if (Path(repo.working_tree_dir) / rel_path).exists():
+            upserts.add(rel_path)
+        else:
+            deletes.add(rel_path)
+
+    return upserts, deletes, renames, sorted(dirty)
+
+
+def _apply_changes(repo_path: Path, files: dict, upserts, deletes, renames,
+                   stats: dict | None = None, should_stop=None, *,
+                   version: dict,
+                   blob_reader: BlobReader | None = None) -> dict:
+    """
+    Apply a diff to the index and return the updated chunk counts.
+    Upserts are read from *blob_reader* when given, else from disk.
+    Cached retrieval results holding the changed files are invalidated.
+    """
+    known = set(files)
+    files = dict(files)
+    upserts = set(upserts)
+    deletes = list(deletes)
+    renames = list(renames)
+    prefix = version["prefix"]
+
+    try:
+        for old_path, new_path in renames:
+            if old_path not in files:
+                # Never indexed under the old name - index the new one from disk
+                upserts.add(new_path)
+                continue
+            count = files.pop(old_path)
+            rename_chunks(old_path, new_path, count, prefix)
+            if new_path in files:
+                # Rename onto a path that was already indexed: drop its tail
+                delete_chunks(new_path, count, files[new_path], prefix)
+            files[new_path] = count
+
+        for rel_path in deletes:
+            delete_chunks(rel_path, 0, files.pop(rel_path, 0), prefix)
+
+        existing = []
+        for rel_path in sorted(upserts):
+            if blob_reader is not None:
+                item, present = rel_path, rel_path in blob_reader
+            else:
+                item = repo_path / rel_path
+                present = item.is_file()
+            if present:
+                existing.append(item)
+            else:
+                delete_chunks(rel_path, 0, files.pop(rel_path, 0), prefix)
+
+        if stats is not None:
+            stats["files_total"] = len(existing)
+        files.update(index_paths(existing, repo_path, files, should_stop=should_stop,
+                                 stats=stats, version=version,
+                                 read_fn=blob_reader.read if blob_reader else None))
+        return files
+    finally:
+        changed = upserts | set(deletes) | {path for pair in renames for path in pair}
+        invalidate_files(version["namespace"], changed,
+                         new_files=bool(upserts - known - {new for _, new in renames}))
+
+
+def _index_full(repo_path: Path, files, stats: dict, should_stop, rebuild: bool,
+                active: dict, blob_reader: BlobReader | None = None):
+    """
+    Index the whole tree (of *blob_reader*'s commit if given) into the
+    namespace of the *active* version.  *rebuild* builds a new index
+    version and swaps it in (blue-green); otherwise the files are written
+    into *active* in place.  Returns (chunk counts, uid of the version
+    written).
+    """
+    namespace = active["namespace"]
+    if rebuild:
+        files = rebuild_index(repo_path, stats, should_stop, namespace=namespace,
+                              blob_reader=blob_reader)
+    else:
+        try:
+            files = build_full_index(repo_path, files, stats, should_stop, version=active,
+                                     blob_reader=blob_reader)
+        finally:
+            invalidate_namespace(namespace)
+    # PCA can only be fitted once the chunks exist (re-projection keeps
+    # the uid, so the chunk counts stay valid)
+    if not is_current(get_active_version(namespace)):
+        refit_projection(namespace, should_stop)
+    return files, get_active_version(namespace)["uid"]
+
+
+def _release_shared_chunks(files: dict, index_uid: str):
+    """
+    Delete a repository's chunks from the default namespace, where every
+    repository was indexed before namespaces existed.  The default
+    namespace is dropped once no repository has chunks left in it.
+    """
+    shared = get_active_version(DEFAULT_NAMESPACE, create=False)
+    if shared is None or shared["uid"] != index_uid:
+        return
+    for rel_path, count in files.items():
+        delete_chunks(rel_path, 0, count, shared["prefix"])
+    logger.info("Moved %d files out of the shared default index", len(files))
+    try:
+        num_docs = int(get_index(shared).info().get("num_docs", 0))
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("Could not count documents in the default index: %s", exc)
+        return
+    if num_docs == 0:
+        drop_namespace(DEFAULT_NAMESPACE)
+
+
+def incremental_index(repo_path_or_url, stats: dict | None = None, should_stop=None,
+                      full: bool = False, ref: str | None = None):
+    """
+    Bring the index for a local path or remote URL up to date with the
+    working tree.  *stats* (see new_stats) is updated live for progress
+    reporting; *should_stop* cancels the run (PipelineStopped is raised and
+    the metadata is left untouched, so the next run redoes the work).
+
+    Every repository is indexed into its own namespace (see
+    repo_namespace).  *full* forces a blue-green rebuild into a new index
+    version; so does an active version built with a different model than
+    EMBEDDING_MODEL.
+
+    With *ref* (branch, tag or commit) the files are read from the git
+    object database at that ref instead of the working tree; see
+    index_git_ref().
+    """
+    if ref:
+        index_git_ref(repo_path_or_url, ref, stats, should_stop, full)
+        return
+
     # Resolve remote URLs to local clones; local paths pass through unchanged
     repo_path = resolve_repo_path(str(repo_path_or_url))
+    metadata = load_metadata(repo_path)
+    files = metadata.get("files")
+    stats = stats if stats is not None else new_stats()
+
+    namespace = repo_namespace(repo_path)
+    register_namespace(namespace, str(repo_path_or_url))
+    active, rebuild = _reconcile_version(get_active_version(namespace), full, should_stop)
+    # Chunk counts only describe the index version they were written to
+    # (indexes that predate versioning are adopted as the legacy version)
+    index_uid = metadata.get("index_uid", LEGACY_UID)
+    if files is not None and index_uid != active["uid"]:
+        logger.info("Index version changed since the last run - re-indexing all files")
+        _release_shared_chunks(files, index_uid)
+        files = None
 
     try:
         repo = Repo(str(repo_path))
         current_commit = repo.head.commit.hexsha
     except Exception as exc:
         logger.warning("Git error (%s). Running full index.", exc)
-        build_full_index(repo_path)
+        files, index_uid = _index_full(repo_path, files, stats, should_stop, rebuild, active)
+        save_metadata(repo_path, {
+            "last_commit": None,
+            "files": files,
+            "dirty": [],
+            "index_uid": index_uid,
+            "stats": stats,
+        })
         return
 
-    metadata = load_metadata(repo_path)
     last_commit = metadata.get("last_commit")
 
-    if last_commit == current_commit:
-        logger.info("Repository already indexed (no changes).")
-        return
+    changes = None
+    if last_commit and files is not None and not rebuild:
+        try:
+            changes = _diff_changes(repo, last_commit, metadata.get("dirty", []))
+        except Exception as exc:  # noqa: BLE001
+            # e.g. last_commit no longer exists after a force-push
+            logger.warning("Git diff from %s failed (%s). Running full index.", last_commit[:8], exc)
 
-    logger.info("Repository changed - re-indexing...")
-    build_full_index(repo_path)
+    if changes is None:
+        if not rebuild:
+            logger.info("No usable index baseline - running full index...")
+        files, index_uid = _index_full(repo_path, files, stats, should_stop, rebuild, active)
+        dirty = sorted(_dirty_paths(repo))
+    else:
+        upserts, deletes, renames, dirty = changes
+        if not (upserts or deletes or renames) and last_commit == current_commit:
+            logger.info("Repository already indexed (no changes).")
+            stats["files_total"] = 0
+            return
+
+        logger.info(
+            "Repository changed - %d added/modified, %d deleted, %d renamed",
+            len(upserts), len(deletes), len(renames),
+        )
+        files = _apply_changes(repo_path, files, upserts, deletes, renames, stats,
+                               should_stop, version=active)
+        index_uid = active["uid"]
+        log_stats(stats, "Incremental indexing completed")
 
-    save_metadata(repo_path, {"last_commit": current_commit})
+    save_metadata(repo_path, {
+        "last_commit": current_commit,
+        "files": files,
+        "dirty": dirty,
+        "index_uid": index_uid,
+        "stats": stats,
+    })
     logger.info("Updated indexing metadata.")
 
 
+# -----------------------------------------------------------------------------
+# Indexing a ref from the object database (no checkout)
+# -----------------------------------------------------------------------------
+
+def _blob_changes(old_blobs: dict, blobs: dict):
+    """
+    (upserts, deletes, renames) between two {rel_path: blob sha} maps.
+    Paths whose blob is unchanged are left alone; a new path carrying the
+    blob of a deleted one is a rename.
+    """
+    deletes = set(old_blobs) - set(blobs)
+    upserts = {path for path, sha in blobs.items() if old_blobs.get(path) != sha}
+
+    deleted_by_sha = {}
+    for path in sorted(deletes):
+        deleted_by_sha.setdefault(old_blobs[path], path)
+    renames = []
+    for path in sorted(upserts - set(old_blobs)):
+        old_path = deleted_by_sha.pop(blobs[path], None)
+        if old_path is not None:
+            renames.append((old_path, path))
+            deletes.discard(old_path)
+            upserts.discard(path)
+    return upserts, deletes, renames
+
+
+def index_git_ref(repo_path_or_url, ref: str, stats: dict | None = None,
+                  should_stop=None, full: bool = False):
+    """
+    Index the tree of *ref* (branch, tag or commit) of a local path or
+    remote URL without checking it out.  Remote repositories are kept as
+    bare blobless clones; only the blobs that actually get indexed are
+    fetched.  Files whose blob sha is unchanged since the last run of the
+    same ref are skipped.  Every ref gets its own namespace, so branches
+    and tags can be indexed and queried side by side.
+    """
+    source = str(repo_path_or_url)
+    stats = stats if stats is not None else new_stats()
+    repo = resolve_git_repo(source)
+    commit = repo.commit(ref)
+    blobs = tree_blobs(commit, _is_indexable)
+    reader = BlobReader(repo, blobs)
+
+    namespace = repo_namespace(local_repo_path(source), ref)
+    register_namespace(namespace, f"{source}@{ref}")
+    # Per-ref metadata lives in the git directory: there is no worktree
+    git_dir = Path(repo.git_dir)
+    metadata_name = f"privcode-{namespace}.json"
+    metadata = load_metadata(git_dir, metadata_name)
+    files, old_blobs = metadata.get("files"), metadata.get("blobs")
+
+    active, rebuild = _reconcile_version(get_active_version(namespace), full, should_stop)
+    if files is not None and metadata.get("index_uid") != active["uid"]:
+        logger.info("Index version changed since the last run - re-indexing all files")
+        files = None
+
+    if files is None or old_blobs is None or rebuild:
+        logger.info("Indexing %s at %s (%s) from git objects...", source, ref, commit.hexsha[:8])
+        prefetch_blobs(repo, blobs.values())
+        files, index_uid = _index_full(git_dir, files, stats, should_stop, rebuild,
+                                       active, reader)
+    else:
+        upserts, deletes, renames = _blob_changes(old_blobs, blobs)
+        if not (upserts or deletes or renames):
+            logger.info("%s at %s already indexed (no changed blobs).", source, ref)
+            stats["files_total"] = 0
+            files, index_uid = dict(files), active["uid"]
+        else:
+            logger.info(
+                "%s at %s changed - %d added/modified, %d deleted, %d renamed",
+                source, ref, len(upserts), len(deletes), len(renames),
+            )
+            prefetch_blobs(repo, (blobs[path] for path in upserts))
+            files = _apply_changes(git_dir, files, upserts, deletes, renames, stats,
+                                   should_stop, version=active, blob_reader=reader)
+            index_uid = active["uid"]
+            log_stats(stats, "Incremental indexing completed")
+
+    save_metadata(git_dir, {
+        "ref": ref,
+        "last_commit": commit.hexsha,
+        "files": files,
+        "blobs": blobs,
+        "index_uid": index_uid,
+        "stats": stats,
+    }, metadata_name)
+
+
 # -----------------------------------------------------------------------------
 # Entry point
 # -----------------------------------------------------------------------------
 
 if __name__ == "__main__":
-    incremental_index(REPO_PATH)
\ No newline at end of file
+    incremental_index(REPO_PATH)
+    # Retired versions are dropped by daemon threads that die with us
+    wait_for_index_gc()
\ No newline at end of file
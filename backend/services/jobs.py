@@ -0,0 +1,293 @@
+# jobs.py — Background indexing jobs with progress, cancellation and single-flight
+"""
+Indexing requests (POST /index, the admin crawler / re-index endpoints and
+the repo watcher) are turned into jobs that run on a small thread pool, so
+no HTTP request waits for a whole repository to be embedded.
+
+Single-flight: while a repository has a queued or running job, further
+requests for the same repository join that job instead of starting a
+duplicate run that would race it on the same Redis keys.  A request that
+the active job cannot satisfy (a full re-index while an incremental run is
+in progress, or a change noticed after the run took its diff) queues one
+follow-up job, which starts when the active one ends and which later
+requests join in turn.  Repositories are identified by their local path
+(remote URLs by their clone directory); jobs for different git refs of one
+repository run one after another but are never joined.
+
+Progress comes from the live stats dict the indexer updates (see
+services.indexer.new_stats); cancellation is cooperative through the
+pipeline's should_stop hook.
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from services.indexer import (
+    incremental_index,
+    local_repo_path,
+    new_stats,
+    refit_projection,
+    repo_namespace,
+)
+from services.pipeline import PipelineStopped
+from core.logger import setup_logger
+
+logger = setup_logger()
+
+INDEX_JOB_WORKERS = int(os.getenv("INDEX_JOB_WORKERS", "2"))
+INDEX_JOB_HISTORY = int(os.getenv("INDEX_JOB_HISTORY", "50"))
+
+# "full" rebuilds into a new index version (blue-green); "incremental"
+# only re-indexes what changed; "reproject" refits the embedding
+# projection and re-projects the index (see utils.projection)
+JOB_KINDS = ("incremental", "full", "reproject")
+ACTIVE_STATES = ("queued", "running")
+
+
+class IndexJob:
+    """One indexing run of one repository."""
+
+    def __init__(self, repo_path_or_url: str, kind: str, requested_by: str | None,
+                 ref: str | None = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.source = repo_path_or_url
+        self.repo = str(local_repo_path(repo_path_or_url))
+        self.ref = ref
+        self.kind = kind
+        self.requested_by = [requested_by] if requested_by else []
+        self.status = "queued"
+        self.error = None
+        self.stats = new_stats()
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+        self._callbacks = []
+        self._future = None   # set once the job is handed to a worker
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until the job has finished; False on timeout."""
+        return self._done.wait(timeout)
+
+    def progress(self) -> dict:
+        stats = dict(self.stats)
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        files_done, total = stats["files"], stats["files_total"]
+
+        files_per_sec = files_done / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.status == "running" and total is not None and files_per_sec > 0:
+            eta = round(max(total - files_done, 0) / files_per_sec, 1)
+        return {
+            "files_done": files_done,
+            "files_total": total,
+            "chunks_done": stats["chunks"],
+            "percent": round(100.0 * files_done / total, 1) if total else None,
+            "elapsed_seconds": round(elapsed, 1),
+            "files_per_second": round(files_per_sec, 2),
+            "chunks_per_second": round(stats["chunks"] / elapsed, 2) if elapsed > 0 else 0.0,
+            "eta_seconds": eta,
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "repo": self.repo,
+            "source": self.source,
+            "ref": self.ref,
+            "kind": self.kind,
+            "status": self.status,
+            "cancel_requested": self.cancel_requested,
+            "requested_by": list(self.requested_by),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "progress": self.progress(),
+        }
+
+
+class JobManager:
+    """Runs IndexJobs on a thread pool, one active job per repository."""
+
+    def __init__(self, workers: int = INDEX_JOB_WORKERS, history: int = INDEX_JOB_HISTORY):
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers),
+                                            thread_name_prefix="index-job")
+        self._history = history
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()   # job id -> IndexJob, oldest first
+        self._active = {}            # repo -> [running job, queued follow-ups]
+
+    def submit(self, repo_path_or_url, kind: str = "incremental",
+               requested_by: str | None = None, on_finish=None,
+               join_running: bool = True, ref: str | None = None):
+        """
+        Start (or join) an indexing job for *repo_path_or_url*, or for its
+        git *ref* read from the object database (see index_git_ref).
+
+        Returns (job, joined).  The newest active job of the repository is
+        joined when it covers the request: same ref and same kind, or a full
+        job for an incremental request.  With *join_running* False a job that is
+        already running is not joined (it may have diffed the repository
+        before the change the caller is reacting to).  Otherwise a follow-up
+        job is queued behind it.  *on_finish(job)* is called once the job
+        reaches a terminal state.
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        source = str(repo_path_or_url)
+        repo = str(local_repo_path(source))
+
+        with self._lock:
+            chain = self._active.setdefault(repo, [])
+            latest = chain[-1] if chain else None
+            if (
+                latest is not None
+                and not latest.cancel_requested
+                and latest.ref == ref
+                and (kind == latest.kind or (kind, latest.kind) == ("incremental", "full"))
+                and (join_running or latest.status == "queued")
+            ):
+                if requested_by and requested_by not in latest.requested_by:
+                    latest.requested_by.append(requested_by)
+                if on_finish is not None:
+                    latest._callbacks.append(on_finish)
+                return latest, True
+
+            job = IndexJob(source, kind, requested_by, ref)
+            if on_finish is not None:
+                job._callbacks.append(on_finish)
+            self._jobs[job.id] = job
+            # A follow-up reaches a worker only once the job ahead of it
+            # ends (see _finish), so waiting never holds a worker
+            start = not chain
+            chain.append(job)
+            self._trim_history()
+
+        if start:
+            self._start(job)
+        logger.info("Indexing job %s queued (%s, %s%s)", job.id, kind, repo,
+                    f"@{ref}" if ref else "")
+        return job, False
+
+    def run(self, repo_path_or_url, kind: str = "incremental", requested_by: str | None = None):
+        """Submit a job for changes made up to now and block until it ends."""
+        job, _ = self.submit(repo_path_or_url, kind, requested_by, join_running=False)
+        job.wait()
+        if job.status == "failed":
+            raise RuntimeError(job.error)
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> list:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in reversed(jobs)]
+
+    def cancel(self, job_id: str):
+        """Request cancellation; returns the job, or None if unknown."""
+        job = self.get(job_id)
+        if job is None or job.status not in ACTIVE_STATES:
+            return job
+        job._cancel.set()
+        if job._future is None or job._future.cancel():
+            # Never started: finish it here
+            self._finish(job, "cancelled")
+        logger.info("Indexing job %s cancellation requested", job.id)
+        return job
+
+    def cancel_all(self, timeout: float | None = None) -> list:
+        """Cancel every queued or running job and wait up to *timeout*
+        seconds for each to stop; returns their ids."""
+        with self._lock:
+            active = [job for chain in self._active.values() for job in chain]
+        for job in active:
+            self.cancel(job.id)
+        for job in active:
+            job.wait(timeout)
+        return [job.id for job in active]
+
+    def shutdown(self):
+        self.cancel_all(timeout=0)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # -------------------------------------------------------------------------
+
+    def _start(self, job: IndexJob):
+        try:
+            job._future = self._executor.submit(self._run, job)
+        except RuntimeError:
+            # Shut down while the job waited for its turn
+            self._finish(job, "cancelled")
+
+    def _run(self, job: IndexJob):
+        if job.cancel_requested:
+            self._finish(job, "cancelled")
+            return
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            if job.kind == "reproject":
+                refit_projection(repo_namespace(job.repo, job.ref), job._cancel.is_set)
+            else:
+                incremental_index(job.source, stats=job.stats, should_stop=job._cancel.is_set,
+                                  full=job.kind == "full", ref=job.ref)
+        except PipelineStopped:
+            self._finish(job, "cancelled")
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("Indexing job %s failed", job.id)
+            self._finish(job, "failed", str(exc))
+        else:
+            self._finish(job, "cancelled" if job.cancel_requested else "succeeded")
+
+    def _finish(self, job: IndexJob, status: str, error: str | None = None):
+        with self._lock:
+            if job.status not in ACTIVE_STATES:
+                return
+            job.status = status
+            job.error = error
+            job.finished_at = time.time()
+            chain = self._active.get(job.repo, [])
+            following = None
+            if job in chain:
+                if chain[0] is job and len(chain) > 1:
+                    following = chain[1]
+                chain.remove(job)
+            if not chain:
+                self._active.pop(job.repo, None)
+            callbacks = list(job._callbacks)
+        job._done.set()
+        logger.info("Indexing job %s %s", job.id, status)
+        if following is not None and following._future is None:
+            self._start(following)
+        for callback in callbacks:
+            try:
+                callback(job)
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("Indexing job %s callback failed: %s", job.id, exc)
+
+    def _trim_history(self):
+        # Caller holds the lock; only finished jobs are forgotten
+        excess = len(self._jobs) - self._history
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].status not in ACTIVE_STATES:
+                del self._jobs[job_id]
+                excess -= 1
+
+
+job_manager = JobManager()
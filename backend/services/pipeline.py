@@ -0,0 +1,185 @@
+# pipeline.py — Streaming multi-stage pipeline with bounded queues
+"""
+A small thread-based streaming pipeline used by the indexer:
+
+    source ─▶ stage 1 ─▶ stage 2 ─▶ ... ─▶ stage N
+
+Every stage has its own worker count and reads from a bounded queue, so a
+slow stage (torch inference, Redis writes) blocks the producers in front of
+it instead of letting work pile up in memory — memory stays flat no matter
+how large the input is.  Stages may emit zero or more items per input, and a
+stage with ``batch_size`` receives lists of up to that many items.
+
+The first exception raised by any worker stops the whole pipeline and is
+re-raised from ``run_pipeline``.
+"""
+
+import queue
+import threading
+
+from core.logger import setup_logger
+
+logger = setup_logger()
+
+_DONE = object()
+_POLL_SECONDS = 0.1
+
+
+class PipelineStopped(Exception):
+    """Raised inside workers when the pipeline is shutting down early."""
+
+
+class Stage:
+    """
+    One pipeline stage.
+
+    *fn* takes an item (or a list of items when *batch_size* is set) and
+    returns an iterable of output items, or None to emit nothing.
+    """
+
+    def __init__(self, name: str, fn, workers: int = 1, batch_size: int | None = None,
+                 queue_size: int = 256):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.queue_size = max(1, queue_size)
+
+
+class _Run:
+    """Shared state of one pipeline execution."""
+
+    def __init__(self, should_stop=None):
+        self.stop = threading.Event()
+        self.error = None
+        self._lock = threading.Lock()
+        self._should_stop = should_stop
+
+    def fail(self, exc: BaseException):
+        with self._lock:
+            if self.error is None:
+                self.error = exc
+        self.stop.set()
+
+    def stopped(self) -> bool:
+        if not self.stop.is_set() and self._should_stop is not None and self._should_stop():
+            self.stop.set()
+        return self.stop.is_set()
+
+    def put(self, q: queue.Queue, item):
+        """Blocking put that gives up when the pipeline stops (backpressure)."""
+        while True:
+            if self.stopped():
+                raise PipelineStopped()
+            try:
+                q.put(item, timeout=_POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def get(self, q: queue.Queue, timeout: float = _POLL_SECONDS):
+        """Blocking get; returns None on timeout so callers can re-check."""
+        if self.stopped():
+            raise PipelineStopped()
+        try:
+            return q.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+def _emit(run: _Run, out_q, outputs):
+    if outputs is None or out_q is None:
+        return
+    for item in outputs:
+        run.put(out_q, item)
+
+
+def _stage_worker(run: _Run, stage: Stage, in_q, out_q):
+    batch = []
+    while True:
+        item = run.get(in_q)
+        if item is None:
+            # Idle: flush a partial batch rather than wait for it to fill
+            if batch:
+                _emit(run, out_q, stage.fn(batch))
+                batch = []
+            continue
+        if item is _DONE:
+            if batch:
+                _emit(run, out_q, stage.fn(batch))
+            return
+        if stage.batch_size:
+            batch.append(item)
+            if len(batch) >= stage.batch_size:
+                _emit(run, out_q, stage.fn(batch))
+                batch = []
+        else:
+            _emit(run, out_q, stage.fn(item))
+
+
+def _run_guarded(run: _Run, target, *args):
+    try:
+        target(run, *args)
+    except PipelineStopped:
+        pass
+    except BaseException as exc:  # noqa: BLE001
+        run.fail(exc)
+
+
+def run_pipeline(source, stages: list, should_stop=None):
+    """
+    Drive *source* (any iterable) through *stages* until it is exhausted.
+
+    *should_stop* is an optional zero-argument callable polled by every
+    worker; returning True cancels the run (used for job cancellation).
+    Outputs of the last stage are discarded.
+    """
+    run = _Run(should_stop)
+    queues = [queue.Queue(maxsize=stage.queue_size) for stage in stages]
+
+    def _produce(run_):
+        for item in source:
+            run_.put(queues[0], item)
+
+    threads_by_stage = []
+    source_thread = threading.Thread(
+        target=_run_guarded, args=(run, _produce), name="pipeline-source", daemon=True
+    )
+    source_thread.start()
+
+    for n, stage in enumerate(stages):
+        out_q = queues[n + 1] if n + 1 < len(stages) else None
+        threads = [
+            threading.Thread(
+                target=_run_guarded,
+                args=(run, _stage_worker, stage, queues[n], out_q),
+                name=f"pipeline-{stage.name}-{w}",
+                daemon=True,
+            )
+            for w in range(stage.workers)
+        ]
+        for t in threads:
+            t.start()
+        threads_by_stage.append(threads)
+
+    # Shut stages down in order: once every producer of a queue is finished,
+    # push one sentinel per consumer so each worker drains and exits.
+    producers = [source_thread]
+    for n, stage in enumerate(stages):
+        for t in producers:
+            t.join()
+        if not run.stop.is_set():
+            for _ in range(stage.workers):
+                try:
+                    run.put(queues[n], _DONE)
+                except PipelineStopped:
+                    break
+        producers = threads_by_stage[n]
+
+    for t in producers:
+        t.join()
+
+    if run.error is not None:
+        raise run.error
+    if run.stop.is_set():
+        raise PipelineStopped()
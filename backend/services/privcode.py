@@ -8,6 +8,7 @@ from typing import List, Dict
 
 from llama_cpp import Llama
 
+from services.context import merge_adjacent
 from services.retriever import hybrid_retrieve
 from core.logger import setup_logger
 
@@ -97,7 +98,8 @@ Code Context:
 """
 
     for i, ctx in enumerate(contexts, 1):
-        code = ctx["content"][:MAX_CHUNK_CHARS]
+        # A merged span (services.context) keeps the budget of its chunks
+        code = ctx["content"][:MAX_CHUNK_CHARS * len(ctx.get("keys") or [ctx])]
         prompt += f"""
 --- Chunk {i} ---
 File: {ctx["file_path"]}
@@ -183,9 +185,9 @@ def _generate_rag_text(model, prompt: str) -> str:
 # Full RAG Pipeline
 # -----------------------------------------------------------------------------
 
-def rag_query(query: str, top_k: int = 3) -> Dict:
+def rag_query(query: str, top_k: int = 3, repos=None) -> Dict:
     logger.info("Retrieving context for query: %s", query)
-    contexts = hybrid_retrieve(query, top_k=top_k)
+    contexts = merge_adjacent(hybrid_retrieve(query, top_k=top_k, repos=repos))
 
     if not contexts:
         return {"error": "No relevant code found"}
@@ -287,10 +289,10 @@ def general_query(query: str) -> Dict:
 # Auto Query (try RAG first, fall back to general)
 # -----------------------------------------------------------------------------
 
-def auto_query(query: str, top_k: int = 3) -> Dict:
+def auto_query(query: str, top_k: int = 3, repos=None) -> Dict:
     """Try RAG first; if no relevant code found, fall back to general LLM."""
     logger.info("Auto query: %s", query)
-    contexts = hybrid_retrieve(query, top_k=top_k)
+    contexts = merge_adjacent(hybrid_retrieve(query, top_k=top_k, repos=repos))
 
     if contexts:
         # RAG path — we have relevant code
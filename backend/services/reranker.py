@@ -0,0 +1,160 @@
+# reranker.py — Optional cross-encoder re-ranking with a latency budget
+"""
+MiniLM vector distance is a noisy relevance signal for code.  With
+RERANK=true, hybrid_retrieve re-scores its RERANK_TOP_N best fused
+candidates with a small cross-encoder (RERANK_MODEL), which reads query
+and chunk together, before MMR picks the top_k.
+
+The cross-encoder runs on one worker thread in RERANK_BATCH_SIZE batches
+on CPU, and every query has a hard RERANK_BUDGET_MS budget: a re-rank
+that has not finished by then is abandoned (the worker stops after its
+current batch) and the fused order is used unchanged.  The model loads
+in the background on first use, so a cold start also falls back instead
+of stalling the query.
+
+    cd backend && python -m benchmarks.reranker   # quality / latency, on vs. off
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import numpy as np
+
+from core.logger import setup_logger
+
+logger = setup_logger()
+
+RERANK = os.getenv("RERANK", "false").lower() == "true"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "20"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "250"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+# Tokens of query + chunk the cross-encoder reads
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", "256"))
+
+_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+_model = None
+_loading = None
+_load_lock = threading.Lock()
+_stats = {"reranked": 0, "timeouts": 0, "cold": 0, "errors": 0}
+_latencies = []
+_stats_lock = threading.Lock()
+_LATENCY_SAMPLES = 1024
+
+
+def _load():
+    global _model
+    from sentence_transformers import CrossEncoder
+
+    started = time.perf_counter()
+    model = CrossEncoder(RERANK_MODEL, max_length=RERANK_MAX_LENGTH, device="cpu")
+    _model = model
+    logger.info("✅ Re-ranker loaded: %s (%.1fs)", RERANK_MODEL, time.perf_counter() - started)
+    return model
+
+
+def get_reranker(wait: bool = True):
+    """
+    The cross-encoder, loading it on first use; None while it is still
+    loading unless *wait*.  Raises if loading failed.
+    """
+    global _loading
+    if _model is None:
+        with _load_lock:
+            if _loading is None:
+                _loading = _worker.submit(_load)
+        if not wait and not _loading.done():
+            return None
+        _loading.result()
+    return _model
+
+
+def _score(model, query: str, texts: list, deadline: float):
+    """
+    Relevance in (0, 1) (sigmoid of the cross-encoder logit) of each of
+    *texts*, or None if *deadline* passed first.
+    """
+    from torch.nn import Identity
+
+    logits = []
+    for start in range(0, len(texts), RERANK_BATCH_SIZE):
+        if time.perf_counter() > deadline:
+            return None
+        batch = [(query, text) for text in texts[start:start + RERANK_BATCH_SIZE]]
+        logits.extend(model.predict(batch, batch_size=len(batch), show_progress_bar=False,
+                                    activation_fn=Identity()))
+    return 1.0 / (1.0 + np.exp(-np.asarray(logits, dtype=np.float32)))
+
+
+def _count(name: str, latency: float | None = None):
+    with _stats_lock:
+        _stats[name] += 1
+        if latency is not None:
+            _latencies.append(latency)
+            del _latencies[:-_LATENCY_SAMPLES]
+
+
+def rerank(query: str, results: list, top_k: int,
+           budget_ms: float = RERANK_BUDGET_MS) -> tuple:
+    """
+    (results, ran): the first max(RERANK_TOP_N, top_k) of *results* (best
+    first) ordered by cross-encoder score and True, or *results* unchanged
+    and False if the model is not loaded yet, fails, or misses the budget.
+    Re-ranked results get the cross-encoder score as "score" (the fused
+    one stays in scores.fused) and scores.rerank.  Fewer than two results
+    need no re-rank and count as ran.
+    """
+    head = results[:max(RERANK_TOP_N, top_k)]
+    if len(head) < 2:
+        return results, True
+    try:
+        model = get_reranker(wait=False)
+    except Exception as exc:  # noqa: BLE001
+        if not _stats["errors"]:
+            logger.warning("Re-ranker unavailable, keeping fused order: %s", exc)
+        _count("errors")
+        return results, False
+    if model is None:
+        _count("cold")
+        return results, False
+
+    started = time.perf_counter()
+    deadline = started + budget_ms / 1000.0
+    future = _worker.submit(_score, model, query, [r["content"] for r in head], deadline)
+    try:
+        scores = future.result(timeout=max(deadline - time.perf_counter(), 0.0))
+    except FutureTimeout:
+        scores = None
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("Re-ranking failed, keeping fused order: %s", exc)
+        _count("errors")
+        return results, False
+    if scores is None:
+        _count("timeouts")
+        return results, False
+    _count("reranked", time.perf_counter() - started)
+
+    order = np.argsort(-scores, kind="stable")
+    reranked = []
+    for index in order:
+        result = head[index]
+        if "scores" in result:
+            result["scores"]["fused"] = result["score"]
+            result["scores"]["rerank"] = float(scores[index])
+        result["score"] = float(scores[index])
+        reranked.append(result)
+    return reranked, True
+
+
+def rerank_stats() -> dict:
+    """Re-rank outcomes and latency since process start."""
+    with _stats_lock:
+        stats = dict(_stats)
+        latencies = np.array(_latencies)
+    stats["enabled"] = RERANK
+    stats["model_loaded"] = _model is not None
+    for q in (50, 95):
+        stats[f"p{q}_ms"] = round(1000 * float(np.percentile(latencies, q)), 2) if len(latencies) else None
+    return stats
@@ -1,9 +1,21 @@
+import heapq
 import json
-import numpy as np
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 
+from redis.commands.search.query import Query
 from redisvl.query import VectorQuery
 
-from utils.redis_utils import get_index, get_embedder
+from services.context import MMR_FETCH_K, diversify
+from services.indexer import local_repo_path, repo_namespace
+from services.reranker import RERANK, rerank as rerank_results
+from utils.code_tokens import definitions, query_identifiers, query_tokens, symbol_query
+from utils.query_cache import cached_query_embedding, get_results, put_results, result_key
+from utils.redis_utils import get_active_version, get_index, get_redis_client, list_namespaces
+from utils.projection import storage_vectors
 from core.logger import setup_logger
 
 # -----------------------------------------------------------------------------
@@ -14,39 +26,117 @@ logger = setup_logger()
 
 TOP_K = 5
 
+# Federated queries search each repository's index on this pool
+RETRIEVER_WORKERS = int(os.getenv("RETRIEVER_WORKERS", "8"))
+
+_search_pool = ThreadPoolExecutor(max_workers=RETRIEVER_WORKERS,
+                                  thread_name_prefix="retriever")
+
+# How the full-text (BM25) and vector legs are combined: "rrf" (reciprocal
+# rank fusion), "weighted" (normalized scores) or "vector" (KNN only)
+FUSION_MODES = ("rrf", "weighted", "vector")
+
+
+def check_fusion(fusion: str) -> str:
+    fusion = fusion.lower()
+    if fusion not in FUSION_MODES:
+        raise ValueError(f"Unsupported fusion {fusion!r} (use one of {FUSION_MODES})")
+    return fusion
+
+
+HYBRID_FUSION = check_fusion(os.getenv("HYBRID_FUSION", "rrf"))
+HYBRID_VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", "1.0"))
+HYBRID_TEXT_WEIGHT = float(os.getenv("HYBRID_TEXT_WEIGHT", "1.0"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Chunks each leg contributes to the fusion
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+HYBRID_TEXT_SCORER = os.getenv("HYBRID_TEXT_SCORER", "BM25")
+# Queries naming code identifiers (getUserById, REDIS_URL) add a third
+# leg to the fusion: chunks containing all of them, with this weight;
+# 0 disables it
+HYBRID_IDENTIFIER_WEIGHT = float(os.getenv("HYBRID_IDENTIFIER_WEIGHT", "2.0"))
+# Definition lookups ("where is X defined") are answered from the symbols
+# TAG field; names shorter than this are never prefix-matched
+SYMBOL_LOOKUP = os.getenv("SYMBOL_LOOKUP", "true").lower() == "true"
+SYMBOL_PREFIX_MIN_LENGTH = int(os.getenv("SYMBOL_PREFIX_MIN_LENGTH", "3"))
+
+_TERM_RE = re.compile(r"\w+")
+_TAG_ESCAPE_RE = re.compile(r"(\W)")
+
+RETURN_FIELDS = [
+    "content",
+    "metadata",
+    "file_path",
+    "repo",
+    "language",
+    "start_line",
+    "end_line",
+]
+
+def _as_int(value):
+    """Numeric hash fields come back as strings; chunks indexed before line
+    ranges were stored have none."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
 # -----------------------------------------------------------------------------
-# Hybrid Retrieval (Redis-native)
+# Repository scoping
 # -----------------------------------------------------------------------------
 
-def hybrid_retrieve(
-    query: str,
-    top_k: int = TOP_K,
-    language_filter: str | None = None,
-):
+def resolve_namespaces(repos=None) -> list:
     """
-    Perform hybrid retrieval using Redis:
-    - Vector similarity (HNSW)
-    - Keyword matching (RediSearch)
-    - Optional tag filters (language, file_path later)
+    Index namespaces to search for *repos*: None for every indexed
+    repository, else one or a list of repository paths, git URLs or
+    namespace names (``<path or URL>@<ref>`` for refs indexed from git
+    objects).  Raises ValueError for a repository never indexed.
     """
+    registered = list_namespaces()
+    if repos is None:
+        return sorted(registered)
+    if isinstance(repos, str):
+        repos = [repos]
+    by_source = {source: namespace for namespace, source in registered.items()}
+
+    namespaces = []
+    for repo in repos:
+        if repo in registered:
+            namespace = repo
+        else:
+            namespace = by_source.get(repo) or repo_namespace(local_repo_path(repo))
+        if namespace not in registered:
+            raise ValueError(f"Repository is not indexed: {repo}")
+        if namespace not in namespaces:
+            namespaces.append(namespace)
+    return namespaces
+
+# -----------------------------------------------------------------------------
+# Hybrid Retrieval (Redis-native)
+# -----------------------------------------------------------------------------
+
+def _format(r, version: dict, score: float) -> dict:
+    return {
+        "key": r["id"],
+        "score": score,
+        "content": r["content"],
+        "metadata": json.loads(r["metadata"]),
+        "file_path": r["file_path"],
+        # Chunks loaded before the repo tag existed
+        "repo": r.get("repo") or version["namespace"],
+        "language": r["language"],
+        "start_line": _as_int(r.get("start_line")),
+        "end_line": _as_int(r.get("end_line")),
+    }
 
-    # Encode query -> float32 bytes (MUST match indexer)
-    query_vector = np.array(
-        get_embedder().encode(query),
-        dtype=np.float32
-    ).tobytes()
 
-    # Base vector query
+def _search(version: dict, query_vector: bytes, top_k: int, language_filter):
+    """Top *top_k* chunks of one index version by vector distance, best first."""
     vq = VectorQuery(
         vector=query_vector,
         vector_field_name="vector",
         num_results=top_k,
-        return_fields=[
-            "content",
-            "metadata",
-            "file_path",
-            "language",
-        ],
+        return_fields=RETURN_FIELDS,
         return_score=True,
     )
 
@@ -54,23 +144,329 @@ def hybrid_retrieve(
     if language_filter:
         vq.set_filter("language", language_filter)
 
-    # Execute Redis query
-    results = get_index().query(vq)
-
-    formatted = []
-    for r in results:
-        formatted.append({
-            "score": float(r["vector_distance"]),
-            "content": r["content"],
-            "metadata": json.loads(r["metadata"]),
-            "file_path": r["file_path"],
-            "language": r["language"],
-        })
+    formatted = [
+        _format(r, version, float(r["vector_distance"]))
+        for r in get_index(version).query(vq)
+    ]
 
     # Lower distance = better similarity
     formatted.sort(key=lambda x: x["score"])
+    return formatted
+
+
+def _with_language(text: str, language_filter) -> str:
+    if language_filter:
+        return f"@language:{{{language_filter}}} ({text})"
+    return text
+
+
+def _text_query(query: str, language_filter) -> str | None:
+    """
+    RediSearch full-text query matching any term of *query* in the chunk
+    text or its AST metadata, or any of its identifier tokens (split the
+    way the indexer splits code, see utils.code_tokens) in the identifiers
+    field; None if it has no searchable term.
+    """
+    terms = [term for term in _TERM_RE.findall(query) if len(term) > 1]
+    tokens = query_tokens(query)
+    clauses = []
+    if terms:
+        clauses.append(f"(@content|metadata:({'|'.join(terms)}))")
+    if tokens:
+        clauses.append(f"(@identifiers:({'|'.join(tokens)}))")
+    if not clauses:
+        return None
+    return _with_language(" | ".join(clauses), language_filter)
+
+
+def _identifier_query(identifiers: list, language_filter) -> str:
+    """Chunks containing every one of *identifiers* (whole, as indexed)."""
+    return _with_language(f"@identifiers:({' '.join(identifiers)})", language_filter)
+
+
+def _text_search(version: dict, text_query: str, top_k: int):
+    """Top *top_k* chunks of one index version by full-text score, best first."""
+    q = (
+        Query(text_query)
+        .scorer(HYBRID_TEXT_SCORER)
+        .with_scores()
+        .return_fields(*RETURN_FIELDS)
+        .paging(0, top_k)
+    )
+    docs = get_redis_client().ft(version["name"]).search(q).docs
+    return [_format(vars(doc), version, float(doc.score)) for doc in docs]
+
+
+def _fuse(vector_ranked: list, text_ranked: list, top_k: int, fusion: str,
+          identifier_ranked: list = ()) -> list:
+    """
+    Combine the ranked lists.  "rrf" adds weight / (RRF_K + rank) per
+    list a chunk appears in; "weighted" adds weight * normalized score:
+    cosine similarity, or full-text score / best full-text score of the
+    same list and index version (BM25 scores of different indexes are not
+    comparable).  *identifier_ranked* are exact identifier hits, a
+    full-text list weighted HYBRID_IDENTIFIER_WEIGHT.  Every result
+    carries its per-leg scores and ranks under "scores".
+    """
+    if fusion not in ("rrf", "weighted"):
+        raise ValueError(f"Cannot fuse ranked lists with {fusion!r} (use rrf or weighted)")
+    weights = {"vector": HYBRID_VECTOR_WEIGHT, "text": HYBRID_TEXT_WEIGHT,
+               "identifier": HYBRID_IDENTIFIER_WEIGHT}
+    best = {}
+    for leg, ranked in (("text", text_ranked), ("identifier", identifier_ranked)):
+        for hit in ranked:
+            best[leg, hit["repo"]] = max(best.get((leg, hit["repo"]), 0.0), hit["score"])
+
+    def normalize(leg, hit):
+        if leg == "vector":
+            return 1.0 - hit["score"] / 2.0   # cosine distance is 0..2
+        top = best[leg, hit["repo"]]
+        return hit["score"] / top if top > 0 else 0.0
+
+    fused = {}
+    for leg, ranked in (("vector", vector_ranked), ("text", text_ranked),
+                        ("identifier", identifier_ranked)):
+        for rank, hit in enumerate(ranked, 1):
+            result = fused.get(hit["key"])
+            if result is None:
+                result = fused[hit["key"]] = dict(hit, score=0.0, scores={
+                    "fusion": fusion, "weights": weights,
+                    "vector": None, "vector_rank": None, "text": None, "text_rank": None,
+                    "identifier": None, "identifier_rank": None,
+                })
+            result["scores"][leg] = hit["score"]
+            result["scores"][f"{leg}_rank"] = rank
+            if fusion == "rrf":
+                result["score"] += weights[leg] / (RRF_K + rank)
+            else:
+                result["score"] += weights[leg] * normalize(leg, hit)
+
+    # Higher fused score = better
+    return heapq.nlargest(top_k, fused.values(), key=lambda r: r["score"])
+
+
+def _per_version(fn, versions: list) -> list:
+    """fn(version) for every version; concurrently when there are several."""
+    if len(versions) == 1:
+        return [fn(versions[0])]
+    return list(_search_pool.map(fn, versions))
+
+
+def _tag(value: str) -> str:
+    return _TAG_ESCAPE_RE.sub(r"\\\1", value.lower())
+
+
+def lookup_symbol(symbol: str, versions: list, top_k: int = TOP_K,
+                  language_filter: str | None = None) -> list:
+    """
+    Chunks of *versions* defining *symbol* (a name or qualified name,
+    case-insensitive) from the symbols TAG field: exact names first, then,
+    only if there are none, names starting with *symbol*.  The bare name
+    of a qualified symbol ("search" of "RedisRetriever.search") is looked
+    up only when the qualified name finds nothing, and scores half as
+    much.  Each result carries the matching definition (kind, qualname,
+    line range) under "symbol" and its match quality as "score"
+    (1.0 = exact).
+    """
+    symbol = symbol.lower()
+    names = [(symbol, 1.0)]
+    tail = symbol.rpartition(".")[2]
+    if tail != symbol:
+        names.append((tail, 0.5))
+
+    for name, weight in names:
+        stages = [("exact", _tag(name))]
+        if len(name) >= SYMBOL_PREFIX_MIN_LENGTH:
+            stages.append(("prefix", f"{_tag(name)}*"))
+        for mode, tags in stages:
+            q = (
+                Query(_with_language(f"@symbols:{{{tags}}}", language_filter))
+                .return_fields(*RETURN_FIELDS)
+                .paging(0, top_k)
+            )
+
+            def _lookup(version):
+                return get_redis_client().ft(version["name"]).search(q).docs, version
+
+            hits = []
+            for docs, version in _per_version(_lookup, versions):
+                for doc in docs:
+                    result = _format(vars(doc), version, 0.0)
+                    for definition in definitions(result["metadata"]):
+                        candidates = (definition["name"].lower(), definition["qualname"].lower())
+                        if mode == "exact" and name in candidates:
+                            result["score"] = weight
+                        elif mode == "prefix" and candidates[0].startswith(name):
+                            result["score"] = weight * len(name) / len(candidates[0])
+                        elif mode == "prefix" and candidates[1].startswith(name):
+                            result["score"] = weight * len(name) / len(candidates[1])
+                        else:
+                            continue
+                        result["symbol"] = definition
+                        break
+                    hits.append(result)
+            if hits:
+                return heapq.nlargest(top_k, hits, key=lambda x: x["score"])
+    return []
+
+
+def _shortcut(hits: list, top_k: int, fusion: str, source: str) -> list:
+    """Full-text-only results, labelled with the *source* that found them."""
+    results = _fuse([], hits, top_k, fusion)
+    for result in results:
+        result["scores"]["fusion"] = source
+    return results
+
+
+def _text_results(futures, n: int) -> list:
+    """Top *n* full-text hits of the per-version searches in *futures*."""
+    hits = []
+    for future in futures:
+        try:
+            hits.extend(future.result())
+        except Exception as exc:  # noqa: BLE001
+            # e.g. a query the full-text parser rejects: vector results still count
+            logger.warning("Full-text search failed: %s", exc)
+    return heapq.nlargest(n, hits, key=lambda x: x["score"])
+
+
+def hybrid_retrieve(
+    query: str,
+    top_k: int = TOP_K,
+    language_filter: str | None = None,
+    repos=None,
+    fusion: str | None = None,
+    rerank: bool | None = None,
+):
+    """
+    Perform hybrid retrieval using Redis:
+    - Vector similarity (HNSW KNN)
+    - Keyword matching (RediSearch full-text on content, metadata and
+      code identifiers)
+    - Optional tag filters (language, file_path later)
+
+    Both legs run concurrently and are combined by *fusion* (default
+    HYBRID_FUSION, see _fuse); results are ordered by their fused
+    "score", higher is better.  With fusion "vector" only the KNN leg runs
+    and "score" is the cosine distance, lower is better.  Any other
+    fusion raises ValueError.
+
+    A definition lookup ("where is X defined", or just a code-shaped
+    symbol name) for a symbol the index defines is answered from the
+    symbol index without embedding the query (lookup_symbol; scores.fusion
+    is "symbol").  A query naming code identifiers adds the chunks
+    containing all of them as a boosted third leg (HYBRID_IDENTIFIER_WEIGHT).
+
+    *repos* scopes the query (see resolve_namespaces); by default every
+    indexed repository is searched.  Each repository has its own index, so
+    a scoped query costs the same however many repositories exist; a
+    federated one queries the indexes concurrently and k-way merges their
+    ranked lists.
+
+    With *rerank* (default RERANK) a cross-encoder re-orders the fused
+    candidates within a time budget (services.reranker).  The candidates
+    are then diversified by maximal marginal relevance
+    (services.context) so near-duplicate chunks do not crowd the top_k.
+    Symbol lookup and fusion "vector" results are never re-ranked: the
+    former are ordered by match quality, the latter keep the raw KNN
+    order.
+    Repeated queries are served from the result cache, and query
+    embeddings from the embedding cache (utils.query_cache).  A query
+    whose re-rank fell back to the fused order is not cached, so the next
+    one gets another chance once the model is warm.
+    """
+    fusion = check_fusion(fusion or HYBRID_FUSION)
+
+    # One snapshot of each active version: a blue-green swap mid-query must
+    # not pair one version's model with another version's vectors
+    versions = [
+        version for version in (
+            get_active_version(namespace, create=False)
+            for namespace in resolve_namespaces(repos)
+        )
+        if version is not None
+    ]
+    if not versions:
+        return []
+
+    started = time.monotonic()
+    rerank = (RERANK if rerank is None else rerank) and fusion != "vector"
+    key = result_key(query, top_k, language_filter, fusion, versions, rerank)
+    results = get_results(key)
+    if results is None:
+        results, reranked = _retrieve(query, top_k, language_filter, versions, fusion, rerank)
+        if reranked is not False:
+            put_results(key, results, started)
+        if rerank and reranked is None:
+            # A symbol lookup answer: the same with re-rank off
+            put_results(result_key(query, top_k, language_filter, fusion, versions),
+                        results, started)
+    return results
+
+
+def _retrieve(query: str, top_k: int, language_filter, versions: list, fusion: str,
+              rerank: bool = False):
+    """
+    (results, reranked) of hybrid_retrieve: reranked is whether the
+    re-rank ran, or None where it was not asked for or does not apply.
+    """
+    candidates = top_k if fusion == "vector" else max(top_k, HYBRID_CANDIDATES)
+
+    # Symbol definitions make the vector search redundant
+    symbol = symbol_query(query) if fusion != "vector" and SYMBOL_LOOKUP else None
+    if symbol:
+        try:
+            hits = lookup_symbol(symbol, versions, top_k, language_filter)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Symbol lookup failed: %s", exc)
+            hits = []
+        if hits:
+            return _shortcut(hits, top_k, fusion, "symbol"), None
+
+    # The full-text legs need no embedding: they run while the query is embedded
+    text_query = None if fusion == "vector" else _text_query(query, language_filter)
+    text_futures = [
+        _search_pool.submit(_text_search, version, text_query, candidates)
+        for version in versions
+    ] if text_query else []
+    identifiers = query_identifiers(query) if fusion != "vector" else []
+    identifier_futures = [
+        _search_pool.submit(_text_search, version,
+                            _identifier_query(identifiers, language_filter), candidates)
+        for version in versions
+    ] if identifiers and HYBRID_IDENTIFIER_WEIGHT > 0 else []
+
+    # Embed the query once per model and store it like each index's
+    # vectors (projection + datatype, same as the indexer)
+    embeddings = {}
+    query_vectors = {}
+    for version in versions:
+        model = version["model"]
+        if model not in embeddings:
+            embeddings[model] = cached_query_embedding(query, model)
+        form = (model, version["projection"], version["datatype"])
+        if form not in query_vectors:
+            query_vectors[form] = storage_vectors(embeddings[model], version).tobytes()
+
+    def _search_version(version):
+        vector = query_vectors[version["model"], version["projection"], version["datatype"]]
+        return _search(version, vector, candidates, language_filter)
+
+    ranked = _per_version(_search_version, versions)
+
+    # Each list is sorted by distance: merge lazily, stop after top_k
+    vector_ranked = list(islice(heapq.merge(*ranked, key=lambda x: x["score"]), candidates))
+    if fusion == "vector":
+        return vector_ranked, None
 
-    return formatted[:top_k]
+    # Over-fetch, then pick the top_k by maximal marginal relevance
+    fused = _fuse(vector_ranked, _text_results(text_futures, candidates),
+                  max(top_k, MMR_FETCH_K), fusion,
+                  _text_results(identifier_futures, candidates))
+    reranked = None
+    if rerank:
+        fused, reranked = rerank_results(query, fused, top_k)
+    return diversify(fused, versions, top_k), reranked
 
 # -----------------------------------------------------------------------------
 # CLI test (dev only)
@@ -95,8 +491,18 @@ if __name__ == "__main__":
         for i, res in enumerate(results, 1):
             print(
                 f"\n{i}. Score: {res['score']:.4f} | "
-                f"{res['file_path']} ({res['language']})"
+                f"{res['repo']}:{res['file_path']} ({res['language']})"
             )
+            if "symbol" in res:
+                sym = res["symbol"]
+                print(f"   {sym['kind']} {sym['qualname']} "
+                      f"(lines {sym['start_line']}-{sym['end_line']})")
+            if "scores" in res:
+                legs = res["scores"]
+                print(f"   vector: {legs['vector']} (#{legs['vector_rank']}) | "
+                      f"text: {legs['text']} (#{legs['text_rank']})")
+                if legs.get("identifier") is not None:
+                    print(f"   identifier: {legs['identifier']} (#{legs['identifier_rank']})")
             print("-" * 60)
             print(res["content"].strip())
             print("-" * 60)
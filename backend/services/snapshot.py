@@ -0,0 +1,388 @@
+# snapshot.py — Encrypted knowledge-base snapshots for fast cold start
+"""
+Export the active index version of every namespace to an encrypted file
+and stream it back into Redis, so a fresh Redis (FLUSHDB, a container
+restart without AOF) is restored in seconds instead of re-embedding every
+repository.
+
+File layout (``<namespace>.pcsnap``)::
+
+    MAGIC | frame | frame | ...
+    frame = type (1 byte) | length (4 bytes, big endian) | Fernet token
+
+    M  manifest: JSON (namespace, source, model, dims, datatype,
+       projection id, uid)
+    P  the projection (utils.projection), right after M if there is one
+    B  block of up to SNAPSHOT_BLOCK_ROWS chunks:
+         row count (uint32) | vectors | zlib(columnar fields)
+    E  end: JSON (rows, blocks), so truncated files are detected
+
+Vectors are one contiguous row-major matrix per block in the index's
+datatype, so a decrypted block is used in place (np.frombuffer /
+memoryview slices) without parsing.  Text fields are stored per column:
+a uint32 length array followed by the concatenated UTF-8 values.  Every
+frame is encrypted on its own with the Fernet key of
+utils.redis_encryption, which keeps memory bounded by the block size on
+export and import.
+
+A restore loads into a new index version (blue-green) that keeps the uid
+and, where this Redis supports it, the vector datatype of the exported
+one (otherwise vectors are converted to storage_datatype()), so the
+repositories' indexing metadata still matches and the next run only
+indexes what changed since the snapshot.
+"""
+
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from services.pipeline import Stage, run_pipeline
+from utils.redis_utils import (
+    activate_index_version,
+    create_index_version,
+    get_active_version,
+    get_redis_client,
+    list_namespaces,
+    register_namespace,
+    retire_index_version,
+    storage_datatype,
+    supported_datatypes,
+)
+from utils.code_tokens import identifier_text, symbol_tags
+from utils.projection import (
+    load_projection,
+    projection_from_json,
+    projection_to_json,
+    save_projection,
+)
+from utils.vector_codec import from_storage, to_storage
+from core.logger import setup_logger
+
+logger = setup_logger()
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+SNAPSHOT_DIR = Path(os.getenv("SNAPSHOT_DIR", str(ROOT_DIR / "snapshots")))
+SNAPSHOT_BLOCK_ROWS = int(os.getenv("SNAPSHOT_BLOCK_ROWS", "4096"))
+SNAPSHOT_RESTORE_WORKERS = int(os.getenv("SNAPSHOT_RESTORE_WORKERS", "4"))
+SNAPSHOT_EXTENSION = ".pcsnap"
+# Restore the newest snapshot when the server starts on an empty Redis
+SNAPSHOT_RESTORE_ON_START = os.getenv("SNAPSHOT_RESTORE_ON_START", "true").lower() == "true"
+
+MAGIC = b"PRIVSNAP\x01"
+_FRAME_HEADER = struct.Struct(">cI")
+
+# Hash fields, in column order; the vector and the repo tag are not columns
+TEXT_COLUMNS = ("key", "content", "metadata", "file_path", "language")
+INT_COLUMNS = ("start_line", "end_line")
+
+
+class SnapshotError(Exception):
+    """The snapshot file is corrupt, truncated or does not fit this index."""
+
+
+def _cipher():
+    # Imported lazily: the module refuses to load without REDIS_ENCRYPTION_KEY
+    from utils.redis_encryption import fernet
+    return fernet
+
+
+# -----------------------------------------------------------------------------
+# Frames and columns
+# -----------------------------------------------------------------------------
+
+def _write_frame(f, cipher, kind: bytes, payload: bytes):
+    token = cipher.encrypt(payload)
+    f.write(_FRAME_HEADER.pack(kind, len(token)))
+    f.write(token)
+
+
+def _read_frames(f):
+    """Yield (type, encrypted token) until end of file."""
+    while True:
+        header = f.read(_FRAME_HEADER.size)
+        if not header:
+            return
+        if len(header) < _FRAME_HEADER.size:
+            raise SnapshotError("Truncated frame header")
+        kind, length = _FRAME_HEADER.unpack(header)
+        token = f.read(length)
+        if len(token) < length:
+            raise SnapshotError("Truncated frame")
+        yield kind, token
+
+
+def _encode_columns(rows: list) -> bytes:
+    parts = []
+    for i, _ in enumerate(TEXT_COLUMNS):
+        values = [row[i] or b"" for row in rows]
+        parts.append(np.fromiter(map(len, values), dtype="<u4", count=len(values)).tobytes())
+        parts.append(b"".join(values))
+    for i, _ in enumerate(INT_COLUMNS, len(TEXT_COLUMNS)):
+        parts.append(np.array(
+            [int(row[i]) if row[i] else -1 for row in rows], dtype="<i4"
+        ).tobytes())
+    return zlib.compress(b"".join(parts), 1)
+
+
+def _decode_columns(data: bytes, n: int) -> dict:
+    data = zlib.decompress(data)
+    view = memoryview(data)
+    columns = {}
+    offset = 0
+    for name in TEXT_COLUMNS:
+        lengths = np.frombuffer(data, dtype="<u4", count=n, offset=offset)
+        offset += 4 * n
+        ends = offset + np.cumsum(lengths, dtype=np.int64)
+        starts = ends - lengths
+        columns[name] = [view[s:e] for s, e in zip(starts.tolist(), ends.tolist())]
+        offset = int(ends[-1]) if n else offset
+    for name in INT_COLUMNS:
+        columns[name] = np.frombuffer(data, dtype="<i4", count=n, offset=offset).tolist()
+        offset += 4 * n
+    return columns
+
+
+# -----------------------------------------------------------------------------
+# Export
+# -----------------------------------------------------------------------------
+
+def _iter_rows(version: dict):
+    """(key suffix, content, ..., vector) of every chunk of *version*."""
+    client = get_redis_client()
+    prefix = version["prefix"].encode()
+    fields = ["content", "metadata", "file_path", "language", "start_line", "end_line", "vector"]
+    keys = []
+
+    def _fetch(batch):
+        pipe = client.pipeline(transaction=False)
+        for key in batch:
+            pipe.hmget(key, fields)
+        for key, values in zip(batch, pipe.execute()):
+            if values[-1] is None:
+                continue   # deleted meanwhile
+            yield (key[len(prefix):], *values)
+
+    for key in client.scan_iter(match=version["prefix"] + "*", count=1000):
+        keys.append(key)
+        if len(keys) >= SNAPSHOT_BLOCK_ROWS:
+            yield from _fetch(keys)
+            keys = []
+    if keys:
+        yield from _fetch(keys)
+
+
+def export_snapshot(path, namespace: str) -> dict:
+    """
+    Write the active version of *namespace* to the encrypted snapshot
+    *path* (atomically).  Returns the manifest plus the row count.
+    """
+    version = get_active_version(namespace, create=False)
+    if version is None:
+        raise ValueError(f"Namespace has no index: {namespace}")
+    cipher = _cipher()
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    manifest = {
+        "namespace": namespace,
+        "source": list_namespaces().get(namespace, ""),
+        "model": version["model"],
+        "dims": version["dims"],
+        "datatype": version["datatype"],
+        "projection": version["projection"],
+        "uid": version["uid"],
+        "created_at": time.time(),
+    }
+    row_bytes = manifest["dims"] * np.dtype(manifest["datatype"]).itemsize
+
+    started = time.perf_counter()
+    rows, blocks = 0, 0
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with tmp.open("wb") as f:
+        f.write(MAGIC)
+        _write_frame(f, cipher, b"M", json.dumps(manifest).encode())
+        if version["projection"]:
+            projection = projection_to_json(load_projection(version["projection"]))
+            _write_frame(f, cipher, b"P", json.dumps(projection).encode())
+
+        def _flush(block):
+            vectors = b"".join(row[-1] for row in block)
+            if len(vectors) != len(block) * row_bytes:
+                raise SnapshotError(f"Vector size mismatch in {namespace}")
+            _write_frame(f, cipher, b"B", b"".join((
+                struct.pack("<I", len(block)), vectors, _encode_columns(block),
+            )))
+
+        block = []
+        for row in _iter_rows(version):
+            block.append(row)
+            if len(block) >= SNAPSHOT_BLOCK_ROWS:
+                _flush(block)
+                rows, blocks = rows + len(block), blocks + 1
+                block = []
+        if block:
+            _flush(block)
+            rows, blocks = rows + len(block), blocks + 1
+        _write_frame(f, cipher, b"E", json.dumps({"rows": rows, "blocks": blocks}).encode())
+    os.replace(tmp, path)
+
+    logger.info(
+        "📦 Snapshot of %s written: %d chunks in %.1fs (%s)",
+        namespace, rows, time.perf_counter() - started, path,
+    )
+    return dict(manifest, rows=rows, path=str(path))
+
+
+def export_all(directory=None) -> list:
+    """Snapshot every namespace into a new timestamped directory."""
+    directory = Path(directory) if directory else SNAPSHOT_DIR / time.strftime("%Y%m%d-%H%M%S")
+    return [
+        export_snapshot(directory / f"{namespace}{SNAPSHOT_EXTENSION}", namespace)
+        for namespace in sorted(list_namespaces())
+        if get_active_version(namespace, create=False) is not None
+    ]
+
+
+def list_snapshots() -> list:
+    """Snapshot directories under SNAPSHOT_DIR, newest first."""
+    if not SNAPSHOT_DIR.is_dir():
+        return []
+    snapshots = []
+    for directory in sorted(SNAPSHOT_DIR.iterdir(), reverse=True):
+        files = sorted(directory.glob(f"*{SNAPSHOT_EXTENSION}")) if directory.is_dir() else []
+        if files:
+            snapshots.append({
+                "name": directory.name,
+                "path": str(directory),
+                "namespaces": [f.stem for f in files],
+                "size_bytes": sum(f.stat().st_size for f in files),
+            })
+    return snapshots
+
+
+# -----------------------------------------------------------------------------
+# Import
+# -----------------------------------------------------------------------------
+
+def import_snapshot(path, namespace: str | None = None, should_stop=None) -> dict:
+    """
+    Stream the snapshot *path* into a new index version of *namespace*
+    (default: the exported one) and make it active.  The version keeps the
+    exported uid.  Returns the manifest plus the row count.
+    """
+    cipher = _cipher()
+    path = Path(path)
+    started = time.perf_counter()
+    with path.open("rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise SnapshotError(f"Not a PrivCode snapshot: {path}")
+        frames = _read_frames(f)
+        kind, token = next(frames, (None, None))
+        if kind != b"M":
+            raise SnapshotError("Snapshot has no manifest")
+        manifest = json.loads(cipher.decrypt(token))
+        projection = None
+        if manifest.get("projection"):
+            kind, token = next(frames, (None, None))
+            if kind != b"P":
+                raise SnapshotError("Snapshot is missing its projection")
+            projection = save_projection(projection_from_json(json.loads(cipher.decrypt(token))))
+        namespace = namespace or manifest["namespace"]
+        dims, source_datatype = manifest["dims"], manifest["datatype"]
+        row_bytes = dims * np.dtype(source_datatype).itemsize
+
+        # Keep the exported datatype unless this Redis cannot index it
+        datatype = (source_datatype if source_datatype in supported_datatypes()
+                    else storage_datatype())
+        version = create_index_version(manifest["model"], namespace, uid=manifest["uid"],
+                                       datatype=datatype, projection=projection)
+        out_bytes = dims * np.dtype(datatype).itemsize
+        if version["dims"] != manifest["dims"]:
+            retire_index_version(version, delay=0)
+            raise SnapshotError(f"Model {manifest['model']} no longer has {manifest['dims']} dims")
+        client = get_redis_client()
+        prefix = version["prefix"].encode()
+        repo_tag = namespace.encode()
+        trailer = {}
+        totals = {"rows": 0, "blocks": 0}
+        totals_lock = threading.Lock()
+
+        def _blocks():
+            for kind, token in frames:
+                if kind == b"B":
+                    yield token
+                elif kind == b"E":
+                    trailer.update(json.loads(cipher.decrypt(token)))
+
+        def _decrypt(token):
+            plain = cipher.decrypt(token)
+            n = struct.unpack_from("<I", plain)[0]
+            vectors = memoryview(plain)[4:4 + n * row_bytes]
+            if datatype != source_datatype:
+                vectors = memoryview(to_storage(
+                    from_storage(vectors, source_datatype, dims), datatype
+                ).tobytes())
+            return [(n, vectors, _decode_columns(plain[4 + n * row_bytes:], n))]
+
+        def _write(block):
+            n, vectors, columns = block
+            pipe = client.pipeline(transaction=False)
+            for i in range(n):
+                mapping = {
+                    name: columns[name][i] for name in TEXT_COLUMNS if name != "key"
+                }
+                mapping["vector"] = vectors[i * out_bytes:(i + 1) * out_bytes]
+                mapping["repo"] = repo_tag
+                # Derived from content and metadata, so not stored in the snapshot
+                mapping["identifiers"] = identifier_text(
+                    bytes(columns["content"][i]).decode("utf-8", errors="ignore")
+                )
+                mapping["symbols"] = symbol_tags(bytes(columns["metadata"][i]))
+                for name in INT_COLUMNS:
+                    if columns[name][i] >= 0:
+                        mapping[name] = columns[name][i]
+                pipe.hset(prefix + bytes(columns["key"][i]), mapping=mapping)
+            pipe.execute()
+            with totals_lock:
+                totals["rows"] += n
+                totals["blocks"] += 1
+
+        try:
+            run_pipeline(_blocks(), [
+                Stage("decrypt", _decrypt, workers=2, queue_size=4),
+                Stage("write", _write, workers=SNAPSHOT_RESTORE_WORKERS,
+                      queue_size=2 * SNAPSHOT_RESTORE_WORKERS),
+            ], should_stop=should_stop)
+            if trailer.get("rows") != totals["rows"]:
+                raise SnapshotError(
+                    f"Snapshot truncated: {totals['rows']} of {trailer.get('rows', '?')} chunks"
+                )
+        except BaseException:
+            retire_index_version(version, delay=0)
+            raise
+
+    register_namespace(namespace, manifest["source"])
+    activate_index_version(version)
+    logger.info(
+        "📦 Snapshot restored into %s: %d chunks in %.1fs",
+        namespace, totals["rows"], time.perf_counter() - started,
+    )
+    return dict(manifest, namespace=namespace, rows=totals["rows"])
+
+
+def restore_snapshot(directory=None) -> list:
+    """Import every namespace of a snapshot directory (default: newest)."""
+    if directory is None:
+        snapshots = list_snapshots()
+        if not snapshots:
+            return []
+        directory = snapshots[0]["path"]
+    return [
+        import_snapshot(path)
+        for path in sorted(Path(directory).glob(f"*{SNAPSHOT_EXTENSION}"))
+    ]
@@ -0,0 +1,259 @@
+# watcher.py — Event-driven repository watcher
+"""
+Keeps the index in sync with a local repository without ever running the
+indexer on the asyncio event loop.
+
+Change detection:
+  * watchdog (inotify / FSEvents / ReadDirectoryChangesW) when installed —
+    source-file edits and ``.git`` ref updates (commit, checkout, pull)
+    arrive as events;
+  * otherwise a cheap poll of ``.git/HEAD``, the checked-out ref and the
+    index file, which catches commits, branch switches and staging without
+    walking the working tree.
+
+Events are debounced: a burst (checkout, rebase, editor save storm) results
+in a single incremental_index() run once the repo has been quiet for
+WATCHER_DEBOUNCE_SECONDS.  The run happens on a dedicated single-thread
+executor, so neither the event loop nor the threads serving /query are
+blocked; events arriving mid-run schedule exactly one follow-up run.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from services.indexer import CODE_EXTENSIONS, SKIP_DIRS, incremental_index
+from core.logger import setup_logger
+
+logger = setup_logger()
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # optional dependency: fall back to polling
+    FileSystemEventHandler = object
+    Observer = None
+
+WATCHER_DEBOUNCE_SECONDS = float(os.getenv("WATCHER_DEBOUNCE_SECONDS", "2.0"))
+WATCHER_POLL_SECONDS = float(os.getenv("WATCHER_POLL_SECONDS", "5.0"))
+
+# .git entries whose change means HEAD, a branch or the staging area moved
+_GIT_TRIGGERS = ("HEAD", "index", "packed-refs", "refs")
+
+
+def _is_relevant(repo_path: Path, path: str) -> bool:
+    """True for indexable source files and git ref / index updates."""
+    try:
+        rel = Path(path).relative_to(repo_path)
+    except ValueError:
+        return False
+    parts = rel.parts
+    if not parts:
+        return False
+    if parts[0] == ".git":
+        return len(parts) > 1 and parts[1] in _GIT_TRIGGERS and not path.endswith(".lock")
+    if any(part in SKIP_DIRS for part in parts[:-1]):
+        return False
+    return rel.suffix.lower() in CODE_EXTENSIONS
+
+
+class _EventHandler(FileSystemEventHandler):
+    """Forwards relevant watchdog events (observer thread) to the watcher."""
+
+    def __init__(self, watcher: "RepoWatcher"):
+        super().__init__()
+        self._watcher = watcher
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        paths = [event.src_path, getattr(event, "dest_path", "") or ""]
+        if any(p and _is_relevant(self._watcher.repo_path, p) for p in paths):
+            self._watcher.notify_threadsafe()
+
+
+class RepoWatcher:
+    """Debounced, off-loop re-indexing of one local repository."""
+
+    def __init__(self, repo_path, debounce: float = WATCHER_DEBOUNCE_SECONDS,
+                 poll_interval: float = WATCHER_POLL_SECONDS, index_fn=incremental_index):
+        self.repo_path = Path(repo_path).resolve()
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self._index_fn = index_fn
+
+        self._loop = None
+        self._wakeup = None
+        self._task = None
+        self._poll_task = None
+        self._observer = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="repo-watcher")
+        self._lock = threading.Lock()
+        self._last_event = 0.0
+
+        self._status = {
+            "repo_path": str(self.repo_path),
+            "mode": None,
+            "state": "stopped",
+            "pending": False,
+            "events": 0,
+            "runs": 0,
+            "last_event_at": None,
+            "last_run_started_at": None,
+            "last_run_finished_at": None,
+            "last_run_seconds": None,
+            "last_error": None,
+        }
+
+    # -------------------------------------------------------------------------
+    # Lifecycle
+    # -------------------------------------------------------------------------
+
+    def start(self, initial_run: bool = True):
+        """Start watching; must be called from the running event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        mode = self._start_observer()
+        if mode is None:
+            mode = "polling"
+            self._poll_task = asyncio.create_task(self._poll_git())
+        self._set(mode=mode, state="idle")
+        self._task = asyncio.create_task(self._run())
+        if initial_run:
+            self.notify(immediate=True)
+        logger.info("Repo watcher started (%s) for %s", mode, self.repo_path)
+
+    async def stop(self):
+        for task in (self._task, self._poll_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        if self._observer is not None:
+            self._observer.stop()
+            await asyncio.to_thread(self._observer.join, 5)
+            self._observer = None
+        # An in-flight run finishes on its own thread; don't wait for it here
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._set(state="stopped", pending=False)
+        logger.info("Repo watcher stopped")
+
+    def _start_observer(self):
+        if Observer is None:
+            return None
+        try:
+            observer = Observer()
+            observer.schedule(_EventHandler(self), str(self.repo_path), recursive=True)
+            observer.daemon = True
+            observer.start()
+        except Exception as exc:  # noqa: BLE001  (e.g. inotify watch limit)
+            logger.warning("Filesystem events unavailable (%s); polling .git instead", exc)
+            return None
+        self._observer = observer
+        return "events"
+
+    # -------------------------------------------------------------------------
+    # Change notification
+    # -------------------------------------------------------------------------
+
+    def notify(self, immediate: bool = False):
+        """Record a change (event loop thread) and wake the debouncer."""
+        now = time.monotonic()
+        self._last_event = now - self.debounce if immediate else now
+        with self._lock:
+            self._status["events"] += 1
+            self._status["last_event_at"] = time.time()
+            self._status["pending"] = True
+            if self._status["state"] == "idle":
+                self._status["state"] = "pending"
+        self._wakeup.set()
+
+    def notify_threadsafe(self):
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self.notify)
+
+    def _git_signature(self):
+        """HEAD target, the commit it points at and the index mtime."""
+        git_dir = self.repo_path / ".git"
+        try:
+            head = (git_dir / "HEAD").read_text(encoding="utf-8").strip()
+        except OSError:
+            return None
+        commit = head
+        if head.startswith("ref:"):
+            ref = head[4:].strip()
+            try:
+                commit = (git_dir / ref).read_text(encoding="utf-8").strip()
+            except OSError:
+                # Packed ref: packed-refs changes whenever it moves
+                commit = _mtime(git_dir / "packed-refs")
+        return head, commit, _mtime(git_dir / "index")
+
+    async def _poll_git(self):
+        last = await asyncio.to_thread(self._git_signature)
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            current = await asyncio.to_thread(self._git_signature)
+            if current != last:
+                last = current
+                self.notify()
+
+    # -------------------------------------------------------------------------
+    # Debounced indexing
+    # -------------------------------------------------------------------------
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            # Quiet period: restart the wait while events keep arriving
+            while True:
+                remaining = self._last_event + self.debounce - time.monotonic()
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(remaining)
+            self._wakeup.clear()
+            self._set(state="indexing", pending=False)
+            await self._loop.run_in_executor(self._executor, self._index_once)
+            with self._lock:
+                self._status["state"] = "pending" if self._status["pending"] else "idle"
+
+    def _index_once(self):
+        started = time.time()
+        self._set(last_run_started_at=started)
+        error = None
+        try:
+            self._index_fn(self.repo_path)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Repo watcher: indexing failed: %s", exc)
+            error = str(exc)
+        finished = time.time()
+        with self._lock:
+            self._status["runs"] += 1
+            self._status["last_run_finished_at"] = finished
+            self._status["last_run_seconds"] = round(finished - started, 3)
+            self._status["last_error"] = error
+
+    # -------------------------------------------------------------------------
+    # Status
+    # -------------------------------------------------------------------------
+
+    def _set(self, **fields):
+        with self._lock:
+            self._status.update(fields)
+
+    def status(self) -> dict:
+        with self._lock:
+            return dict(self._status, debounce_seconds=self.debounce)
+
+
+def _mtime(path: Path):
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
@@ -164,6 +164,31 @@ def test_login_and_get_me():
     assert user["role"] == "admin"
 
 
+# =====================================================
+# INDEXING JOB TESTS
+# =====================================================
+
+def test_index_jobs_without_token():
+    """Test job endpoints require authentication."""
+    assert client.get("/index/jobs").status_code in (401, 403)
+    assert client.delete("/index/jobs/abc123").status_code in (401, 403)
+
+
+def test_unknown_index_job():
+    """Test polling a job id that does not exist."""
+    login_resp = client.post(
+        "/login",
+        json={"username": "admin", "password": "admin123"}
+    )
+    token = login_resp.json()["token"]
+
+    response = client.get(
+        "/index/jobs/does-not-exist",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 404
+
+
 # =====================================================
 # RUN TESTS
 # =====================================================
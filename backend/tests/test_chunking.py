@@ -0,0 +1,103 @@
+# backend/tests/test_chunking.py
+"""
+Syntax-Aware Chunking Tests for PrivCode
+Chunks must cover every byte of a file exactly once, fit the budget, and
+keep definitions together without leaving their headers behind as chunks
+of their own.
+"""
+
+from utils.ast_parser import parse
+from utils.chunking import (
+    CHUNK_SIZE,
+    MIN_CHUNK_FRACTION,
+    ByteMeasure,
+    _window_spans,
+    parse_source,
+    syntax_chunk_spans,
+)
+
+SOURCE = '''import os
+import sys
+
+
+class Store:
+    """Keeps values."""
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def put(self, key, value):
+        self.values[key] = value
+
+
+def main():
+    store = Store()
+    store.put("home", os.getenv("HOME"))
+    print(store.get("home"), sys.argv)
+'''
+
+
+def _spans(source, budget):
+    code = source.encode("utf-8")
+    return code, syntax_chunk_spans(parse(source, "py"), code, ByteMeasure(budget), "py")
+
+
+def _assert_covers(spans, code):
+    """Spans are contiguous, in order and cover [0, len(code))."""
+    assert spans[0][0] == 0 and spans[-1][1] == len(code)
+    assert all(end == start for (_, end), (start, _) in zip(spans, spans[1:]))
+    assert all(start < end for start, end in spans)
+
+
+# =====================================================
+# SPAN TESTS
+# =====================================================
+
+def test_spans_cover_file_exactly():
+    """Every budget gives contiguous spans over the whole file, each within budget."""
+    for budget in (60, 120, 200, CHUNK_SIZE):
+        code, spans = _spans(SOURCE, budget)
+        _assert_covers(spans, code)
+        assert max(end - start for start, end in spans) <= budget
+
+
+def test_definitions_start_chunks():
+    """With room for one method per chunk, each method starts its own span."""
+    code, spans = _spans(SOURCE, 120)
+    starts = {code[start:end].lstrip().split(b"(")[0] for start, end in spans}
+    assert {b"def get", b"def put", b"def main"} <= starts
+
+
+def test_oversize_function_split_within_budget():
+    """An oversize function is split between statements, its header kept with its body."""
+    source = "def big():\n" + "".join(f"    v{n} = compute({n})\n" for n in range(60))
+    code, spans = _spans(source, 200)
+    _assert_covers(spans, code)
+    assert len(spans) > 1
+    assert max(end - start for start, end in spans) <= 200
+    assert spans[0][1] - spans[0][0] >= 200 * MIN_CHUNK_FRACTION
+    # Split between statements, never inside one
+    assert all(code[start:end].strip().startswith(b"v") for start, end in spans[1:])
+
+
+def test_oversize_line_keeps_header():
+    """A body that is one overlong line is cut together with the def header."""
+    source = "def f():\n    x = '" + "a" * 1500 + "'\n"
+    chunks, _ = parse_source(source, "f.py", "py")
+    assert "".join(text for text, *_ in chunks) == source
+    assert chunks[0][0].startswith("def f():\n    x = '")
+    assert len(chunks[0][0].encode()) == CHUNK_SIZE
+    assert all(len(text.encode()) <= CHUNK_SIZE for text, *_ in chunks)
+    assert [(start, end) for _, _, start, end in chunks] == [(1, 2), (2, 2)]
+
+
+def test_window_spans_cut_on_character_boundaries():
+    """Hard cuts of a multi-byte line never split a UTF-8 sequence."""
+    code = ("é" * 500 + "\n").encode("utf-8")
+    spans = _window_spans(code, 0, len(code), ByteMeasure(99))
+    _assert_covers(spans, code)
+    assert max(end - start for start, end in spans) <= 99
+    assert "".join(code[s:e].decode("utf-8") for s, e in spans) == code.decode("utf-8")
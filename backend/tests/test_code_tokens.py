@@ -0,0 +1,78 @@
+# backend/tests/test_code_tokens.py
+"""
+Identifier Tokenization Tests for PrivCode
+Chunks and queries must be split into the same identifier tokens, or
+keyword search on the identifiers field misses.
+"""
+
+import json
+
+from utils.code_tokens import (
+    identifier_tokens,
+    query_identifiers,
+    split_identifier,
+    symbol_query,
+    symbol_tags,
+)
+
+
+# =====================================================
+# SPLITTING TESTS
+# =====================================================
+
+def test_split_identifier_styles():
+    """snake_case, camelCase, CONSTANT_CASE and acronyms split into words."""
+    assert split_identifier("hybrid_retrieve") == ["hybrid", "retrieve"]
+    assert split_identifier("getUserById") == ["get", "user", "by", "id"]
+    assert split_identifier("REDIS_URL") == ["redis", "url"]
+    assert split_identifier("HTTPServer") == ["http", "server"]
+
+
+def test_identifier_tokens_keep_whole_identifiers():
+    """Each identifier is indexed whole and split; dotted parts separately."""
+    tokens = identifier_tokens("from utils.redis_utils import getUserById")
+    assert tokens[:4] == ["from", "utils", "redis_utils", "redis"]
+    assert "getuserbyid" in tokens and "user" in tokens
+    assert len(tokens) == len(set(tokens))
+
+
+# =====================================================
+# QUERY TESTS
+# =====================================================
+
+def test_query_identifiers_only_code_shaped():
+    """Plain English never triggers the identifier fast path."""
+    assert query_identifiers("explain the database connection flow") == []
+    assert query_identifiers("where is getUserById defined?") == ["getuserbyid"]
+    assert query_identifiers("os.path.join usage") == ["os", "path", "join"]
+
+
+# =====================================================
+# SYMBOL INDEX TESTS
+# =====================================================
+
+def test_symbol_query_detects_definition_lookups():
+    """Only "where is X defined"-style queries go to the symbol index."""
+    assert symbol_query("where is getUserById defined?") == "getUserById"
+    assert symbol_query("definition of RedisRetriever.search") == "RedisRetriever.search"
+    assert symbol_query("hybrid_retrieve()") == "hybrid_retrieve"
+    assert symbol_query("find def cache") == "cache"
+    assert symbol_query("explain the database connection flow") is None
+
+
+def test_symbol_query_ignores_bare_words():
+    """A plain word, with or without a lookup verb, is not a definition lookup."""
+    for query in ("authentication", "database", "logging?", "find security",
+                  "show errors", "define caching", "class diagram"):
+        assert symbol_query(query) is None, query
+    assert symbol_query("where is caching defined?") == "caching"
+
+
+def test_symbol_tags_list_definitions():
+    """Names and qualnames of defined symbols, lowercased, no duplicates."""
+    metadata = json.dumps({"definitions": [
+        {"kind": "class", "name": "Cache", "qualname": "Cache", "start_line": 1, "end_line": 9},
+        {"kind": "method", "name": "get", "qualname": "Cache.get", "start_line": 3, "end_line": 5},
+    ]})
+    assert symbol_tags(metadata) == "cache,get,cache.get"
+    assert symbol_tags('{"functions": ["legacy"]}') == ""
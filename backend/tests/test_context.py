@@ -0,0 +1,134 @@
+# backend/tests/test_context.py
+"""
+Context Diversification and Merging Tests for PrivCode
+MMR must trade relevance against redundancy, and merged spans must hold
+every retrieved line exactly once.
+"""
+
+import json
+
+import numpy as np
+
+from services.context import _join, merge_adjacent, mmr
+from utils.chunking import CHUNK_OVERLAP, parse_source
+
+
+def _chunk(start, end, rank=0, file_path="app.py"):
+    """Chunk of lines start..end (no byte offsets, like older indexes)."""
+    return {
+        "key": f"{file_path}:{start}",
+        "repo": "default",
+        "file_path": file_path,
+        "start_line": start,
+        "end_line": end,
+        "content": "\n".join(f"line {n}" for n in range(start, end + 1)),
+        "metadata": {"start_line": start, "end_line": end},
+        "score": 1.0 - rank / 10,
+    }
+
+
+def _parsed(source, language):
+    """Every chunk parse_source makes of *source*, as retrieved contexts."""
+    chunks, _ = parse_source(source, f"file.{language}", language)
+    return [
+        {"key": str(i), "repo": "default", "file_path": f"file.{language}",
+         "start_line": start_line, "end_line": end_line, "content": text,
+         "metadata": json.loads(metadata), "score": 1.0}
+        for i, (text, metadata, start_line, end_line) in enumerate(chunks)
+    ]
+
+
+# =====================================================
+# MMR TESTS
+# =====================================================
+
+def test_mmr_relevance_only():
+    """lambda 1.0 picks purely by relevance."""
+    relevance = np.array([0.2, 0.9, 0.5], dtype=np.float32)
+    similarity = np.eye(3, dtype=np.float32)
+    assert mmr(relevance, similarity, top_k=3, lambda_=1.0) == [1, 2, 0]
+
+
+def test_mmr_skips_near_duplicates():
+    """A near-copy of the first pick loses to a less relevant distinct chunk."""
+    relevance = np.array([1.0, 0.95, 0.6], dtype=np.float32)
+    similarity = np.array([
+        [1.0, 0.99, 0.0],
+        [0.99, 1.0, 0.0],
+        [0.0, 0.0, 1.0],
+    ], dtype=np.float32)
+    assert mmr(relevance, similarity, top_k=2, lambda_=0.5) == [0, 2]
+    assert mmr(relevance, similarity, top_k=5, lambda_=0.5) == [0, 2, 1]
+
+
+# =====================================================
+# JOIN TESTS
+# =====================================================
+
+def test_join_touching_keeps_every_line():
+    """Lines 1-3 followed by 4-5 give 1-5, nothing dropped."""
+    joined = _join(_chunk(1, 3), _chunk(4, 5))
+    assert joined.split("\n") == [f"line {n}" for n in range(1, 6)]
+
+
+def test_join_without_offsets_never_guesses_overlap():
+    """Chunks sharing a line but lacking byte offsets stay apart."""
+    assert _join(_chunk(1, 4), _chunk(3, 6)) is None
+
+
+def test_join_line_split_between_chunks():
+    """A line split across two chunks is joined back whole."""
+    first = {"content": "x = 'aaa", "start_line": 2, "end_line": 2,
+             "metadata": {"start_byte": 10, "end_byte": 18}}
+    second = {"content": "bbb'\ny = 1\n", "start_line": 2, "end_line": 3,
+              "metadata": {"start_byte": 18, "end_byte": 30}}
+    assert _join(first, second) == "x = 'aaabbb'\ny = 1\n"
+
+
+def test_join_drops_exact_byte_overlap():
+    """Only the bytes both chunks hold are dropped."""
+    first = {"content": "abcdef", "start_line": 1, "end_line": 1,
+             "metadata": {"start_byte": 0, "end_byte": 6}}
+    second = {"content": "efgh", "start_line": 1, "end_line": 1,
+              "metadata": {"start_byte": 4, "end_byte": 8}}
+    assert _join(first, second) == "abcdefgh"
+
+
+# =====================================================
+# MERGE TESTS
+# =====================================================
+
+def test_merge_adjacent_joins_overlapping_and_touching():
+    """Chunks of one file merge into one span ranked by their best chunk."""
+    contexts = [_chunk(4, 5, rank=0), _chunk(20, 22, rank=1), _chunk(1, 3, rank=2),
+                _chunk(1, 9, rank=3, file_path="other.py")]
+    merged = merge_adjacent(contexts)
+    assert [(m["file_path"], m["start_line"], m["end_line"]) for m in merged] == [
+        ("app.py", 1, 5), ("app.py", 20, 22), ("other.py", 1, 9)]
+    assert merged[0]["content"].split("\n") == [f"line {n}" for n in range(1, 6)]
+    assert merged[0]["keys"] == ["app.py:1", "app.py:4"]
+
+
+def test_merge_adjacent_restores_split_long_line():
+    """A 2500-character line split over several chunks merges back byte for byte."""
+    source = "x = 1\ny = '" + "a" * 2500 + "'\nz = 3\n"
+    contexts = _parsed(source, "py")
+    assert len(contexts) >= 3
+    assert any(c["start_line"] == c["end_line"] == 2 for c in contexts)
+    merged = merge_adjacent(contexts)
+    assert len(merged) == 1
+    assert merged[0]["content"] == source
+    assert (merged[0]["start_line"], merged[0]["end_line"]) == (1, 3)
+
+
+def test_merge_adjacent_fixed_windows():
+    """Fixed windows overlapping by CHUNK_OVERLAP mid-line merge without loss or repeats."""
+    source = "".join(f"value_{n} = compute({n}, 'é')  # note\n" for n in range(120))
+    contexts = _parsed(source, "txt")
+    assert len(contexts) > 2
+    # Windows overlap mid-line, so line ranges alone would repeat or lose text
+    assert any(c["content"][:CHUNK_OVERLAP] in p["content"]
+               for p, c in zip(contexts, contexts[1:]))
+    assert merge_adjacent(contexts)[0]["content"] == source
+    # Every other window: gaps stay separate spans
+    assert len(merge_adjacent(contexts[::2])) == len(contexts[::2])
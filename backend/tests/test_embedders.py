@@ -0,0 +1,79 @@
+# backend/tests/test_embedders.py
+"""
+Embedder Backend Tests for PrivCode
+The ONNX backend must be a drop-in replacement for the torch one: same
+tokenizer, same encode() shapes, vectors equal within quantization error.
+Skipped when onnxruntime or the model's ONNX export is not available.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+
+from utils.embedders import load_embedder
+
+MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+SENTENCES = [
+    "def authenticate(user, password):\n    return check_hash(user.salt, password)",
+    "class RedisRetriever:\n    def search(self, query, top_k=5): ...",
+    "How is the database connection pool configured?",
+    "for (int i = 0; i < n; ++i) { total += values[i]; }",
+    "x",
+    "long " * 600,   # truncated to max_seq_length
+]
+
+
+@pytest.fixture(scope="module")
+def embedders():
+    try:
+        onnx = load_embedder(MODEL, "onnx")
+    except (OSError, RuntimeError, ValueError) as exc:
+        pytest.skip(f"ONNX export of {MODEL} unavailable: {exc}")
+    return load_embedder(MODEL, "torch"), onnx
+
+
+# =====================================================
+# PARITY TESTS
+# =====================================================
+
+def test_onnx_matches_torch(embedders):
+    """Quantized ONNX vectors point the same way as the torch ones."""
+    torch_embedder, onnx_embedder = embedders
+    expected = torch_embedder.encode(SENTENCES, batch_size=4, convert_to_numpy=True)
+    actual = onnx_embedder.encode(SENTENCES, batch_size=4, convert_to_numpy=True)
+
+    assert actual.shape == expected.shape
+    assert actual.dtype == np.float32
+    cosine = (actual * expected).sum(axis=1) / (
+        np.linalg.norm(actual, axis=1) * np.linalg.norm(expected, axis=1)
+    )
+    assert cosine.min() > 0.99
+
+
+def test_onnx_encode_semantics(embedders):
+    """One string gives a vector, a list a matrix, as SentenceTransformer."""
+    torch_embedder, onnx_embedder = embedders
+    dims = torch_embedder.get_sentence_embedding_dimension()
+
+    assert onnx_embedder.get_sentence_embedding_dimension() == dims
+    assert onnx_embedder.encode(SENTENCES[0]).shape == (dims,)
+    assert onnx_embedder.encode(SENTENCES[:2]).shape == (2, dims)
+    assert onnx_embedder.max_seq_length == torch_embedder.max_seq_length
+
+
+def test_onnx_tokenizer_matches(embedders):
+    """Chunk sizing sees the same tokens with either backend."""
+    torch_embedder, onnx_embedder = embedders
+    assert onnx_embedder.tokenizer.num_special_tokens_to_add(pair=False) == \
+        torch_embedder.tokenizer.num_special_tokens_to_add(pair=False)
+
+    def offsets(tokenizer):
+        return [tuple(o) for o in tokenizer(
+            SENTENCES[0], add_special_tokens=False, return_offsets_mapping=True,
+        )["offset_mapping"]]
+
+    assert offsets(onnx_embedder.tokenizer) == offsets(torch_embedder.tokenizer)
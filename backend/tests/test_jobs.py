@@ -0,0 +1,166 @@
+# backend/tests/test_jobs.py
+"""
+Indexing Job Tests for PrivCode
+Requests for a repository with an active job must join it when it covers
+them and otherwise queue one follow-up, which starts only once the job
+ahead of it has ended, however that job ended.
+"""
+
+import threading
+import time
+
+import pytest
+
+import services.jobs as jobs
+from services.jobs import JobManager
+from services.pipeline import PipelineStopped
+
+REPO = "/srv/repos/app"
+
+
+class _Indexer:
+    """Stands in for incremental_index: every call blocks until released."""
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, source, stats=None, should_stop=None, full=False, ref=None):
+        call = {"source": source, "full": full, "ref": ref, "release": threading.Event(),
+                "error": None}
+        with self._lock:
+            self.calls.append(call)
+        while not call["release"].wait(0.01):
+            if should_stop():
+                raise PipelineStopped()
+        if call["error"]:
+            raise call["error"]
+
+    def release(self, n, error=None):
+        _wait_until(lambda: len(self.calls) > n)
+        self.calls[n]["error"] = error
+        self.calls[n]["release"].set()
+
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def indexer(monkeypatch):
+    indexer = _Indexer()
+    monkeypatch.setattr(jobs, "incremental_index", indexer)
+    return indexer
+
+
+@pytest.fixture
+def manager():
+    manager = JobManager(workers=2)
+    yield manager
+    manager.shutdown()
+
+
+# =====================================================
+# SINGLE-FLIGHT TESTS
+# =====================================================
+
+def test_duplicate_requests_join_the_active_job(indexer, manager):
+    """Requests for a running repository share one run and all callbacks fire."""
+    finished = []
+    first, joined = manager.submit(REPO, requested_by="alice", on_finish=finished.append)
+    assert not joined
+    _wait_until(lambda: first.status == "running")
+    again, joined = manager.submit(REPO, requested_by="bob", on_finish=finished.append)
+    assert joined and again is first
+    assert first.requested_by == ["alice", "bob"]
+
+    indexer.release(0)
+    assert first.wait(5) and first.status == "succeeded"
+    # Callbacks run right after the job is marked done
+    _wait_until(lambda: len(finished) == 2)
+    assert finished == [first, first]
+    assert len(indexer.calls) == 1
+
+
+def test_incremental_request_joins_a_full_job(indexer, manager):
+    """A full run covers an incremental request; the reverse needs a follow-up."""
+    full, _ = manager.submit(REPO, kind="full")
+    incremental, joined = manager.submit(REPO, kind="incremental")
+    assert joined and incremental is full
+    indexer.release(0)
+    assert full.wait(5) and indexer.calls[0]["full"]
+
+    incremental, _ = manager.submit(REPO, kind="incremental")
+    full, joined = manager.submit(REPO, kind="full")
+    assert not joined and full is not incremental and full.status == "queued"
+    indexer.release(1)
+    indexer.release(2)
+    assert full.wait(5) and [c["full"] for c in indexer.calls] == [True, False, True]
+
+
+def test_other_refs_are_never_joined(indexer, manager):
+    """A job for another git ref of the repository runs after, not instead."""
+    head, _ = manager.submit(REPO)
+    tagged, joined = manager.submit(REPO, ref="v1.0")
+    assert not joined and tagged.status == "queued"
+    indexer.release(0)
+    indexer.release(1)
+    assert tagged.wait(5)
+    assert [c["ref"] for c in indexer.calls] == [None, "v1.0"]
+
+
+# =====================================================
+# FOLLOW-UP TESTS
+# =====================================================
+
+def test_follow_up_starts_after_its_predecessor(indexer, manager):
+    """A change noticed mid-run queues one follow-up that waits for the run to end."""
+    first, _ = manager.submit(REPO)
+    _wait_until(lambda: first.status == "running")
+    follow_up, joined = manager.submit(REPO, join_running=False)
+    assert not joined and follow_up is not first
+    # Later requests join the queued follow-up, not the running job
+    again, joined = manager.submit(REPO, join_running=False)
+    assert joined and again is follow_up
+
+    time.sleep(0.1)   # a worker is free, yet the follow-up must wait
+    assert follow_up.status == "queued" and len(indexer.calls) == 1
+
+    indexer.release(0)
+    _wait_until(lambda: follow_up.status == "running")
+    indexer.release(1)
+    assert follow_up.wait(5) and follow_up.status == "succeeded"
+    assert follow_up.started_at >= first.finished_at
+
+
+def test_follow_up_starts_after_a_failure(indexer, manager):
+    """A failed predecessor still hands over to its follow-up."""
+    first, _ = manager.submit(REPO)
+    _wait_until(lambda: first.status == "running")
+    follow_up, _ = manager.submit(REPO, join_running=False)
+    indexer.release(0, error=RuntimeError("clone failed"))
+    assert first.wait(5) and first.status == "failed" and first.error == "clone failed"
+    indexer.release(1)
+    assert follow_up.wait(5) and follow_up.status == "succeeded"
+
+
+def test_cancelled_follow_up_never_runs(indexer, manager):
+    """A cancelled follow-up finishes at once; a running job stops cooperatively."""
+    first, _ = manager.submit(REPO)
+    _wait_until(lambda: first.status == "running")
+    follow_up, _ = manager.submit(REPO, join_running=False)
+    manager.cancel(follow_up.id)
+    assert follow_up.status == "cancelled"
+
+    # A cancelled job is not joined: the next request queues a new follow-up
+    replacement, joined = manager.submit(REPO, join_running=False)
+    assert not joined and replacement is not follow_up
+
+    manager.cancel(first.id)
+    assert first.wait(5) and first.status == "cancelled"
+    indexer.release(1)
+    assert replacement.wait(5) and replacement.status == "succeeded"
+    assert len(indexer.calls) == 2
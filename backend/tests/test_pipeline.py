@@ -0,0 +1,111 @@
+# backend/tests/test_pipeline.py
+"""
+Streaming Pipeline Tests for PrivCode
+Every item must pass every stage, the first error or a stop request must
+end the whole run, and bounded queues must keep the source from running
+ahead of a slow stage.
+"""
+
+import itertools
+import threading
+import time
+
+import pytest
+
+from services.pipeline import PipelineStopped, Stage, run_pipeline
+
+
+def _endless(produced):
+    """An infinite source counting what it has produced."""
+    for n in itertools.count():
+        produced.append(n)
+        yield n
+
+
+def _take(source, n):
+    return itertools.islice(source, n)
+
+
+# =====================================================
+# FLOW TESTS
+# =====================================================
+
+def test_every_item_passes_every_stage():
+    """Items fan out, batch and reach the last stage exactly once."""
+    seen = []
+    lock = threading.Lock()
+
+    def _collect(batch):
+        with lock:
+            seen.extend(batch)
+
+    run_pipeline(range(50), [
+        Stage("double", lambda n: [n, n + 1000], workers=3),
+        Stage("skip", lambda n: None if n == 7 else [n * 2]),
+        Stage("collect", _collect, workers=2, batch_size=8),
+    ])
+    assert sorted(seen) == sorted(2 * n for n in [*range(50), *range(1000, 1050)] if n != 7)
+
+
+def test_bounded_queues_hold_back_the_source():
+    """A slow last stage keeps the source only a few queue slots ahead."""
+    produced, consumed = [], []
+    lead = []
+
+    def _slow(n):
+        time.sleep(0.002)
+        consumed.append(n)
+        lead.append(len(produced) - len(consumed))
+
+    run_pipeline(_take(_endless(produced), 200), [
+        Stage("pass", lambda n: [n], queue_size=2),
+        Stage("slow", _slow, queue_size=2),
+    ])
+    assert len(consumed) == 200
+    # Two queues of 2, one item in each worker, one blocked in the source
+    assert max(lead) <= 8
+
+
+# =====================================================
+# STOP AND ERROR TESTS
+# =====================================================
+
+def test_stage_error_stops_the_run_and_is_raised():
+    """The first worker error ends an endless run and reaches the caller."""
+    produced = []
+
+    def _fail(n):
+        if n == 20:
+            raise ValueError("bad chunk 20")
+        return [n]
+
+    with pytest.raises(ValueError, match="bad chunk 20"):
+        run_pipeline(_endless(produced), [
+            Stage("check", _fail, workers=2, queue_size=4),
+            Stage("sink", lambda n: None, queue_size=4),
+        ])
+    assert len(produced) < 100
+
+
+def test_source_error_is_raised():
+    """An exception raised by the source iterable is re-raised as is."""
+    def _source():
+        yield 1
+        raise OSError("disk gone")
+
+    with pytest.raises(OSError, match="disk gone"):
+        run_pipeline(_source(), [Stage("sink", lambda n: None)])
+
+
+def test_should_stop_cancels_mid_stream():
+    """should_stop turning True ends an endless run with PipelineStopped."""
+    produced, done = [], []
+
+    def _work(n):
+        done.append(n)
+
+    with pytest.raises(PipelineStopped):
+        run_pipeline(_endless(produced), [Stage("work", _work, queue_size=4)],
+                     should_stop=lambda: len(done) >= 30)
+    assert 30 <= len(done) < 100
+    assert len(produced) < 100
@@ -0,0 +1,133 @@
+# backend/tests/test_query_cache.py
+"""
+Query Cache Tests for PrivCode
+Entries must leave the caches in LRU order and on expiry, and a change to
+a file must drop exactly the cached results that hold its chunks.
+"""
+
+import time
+
+import pytest
+
+import utils.query_cache as query_cache
+from utils.query_cache import LRUCache, get_results, put_results, result_key
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(query_cache.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def results(monkeypatch):
+    """An empty level-2 cache and change log."""
+    monkeypatch.setattr(query_cache, "_results", LRUCache(16))
+    monkeypatch.setattr(query_cache, "_changed_files", {})
+    monkeypatch.setattr(query_cache, "_changed_namespaces", {})
+
+
+def _version(namespace):
+    return {"namespace": namespace, "name": f"{namespace}:v1", "uid": f"uid-{namespace}"}
+
+
+def _cache(query, hits, namespaces=("default",)):
+    """Cache *hits* ((repo, file path) pairs) as the results of *query*."""
+    key = result_key(query, 5, None, "rrf", [_version(ns) for ns in namespaces])
+    put_results(key, [{"repo": repo, "file_path": path, "score": 1.0} for repo, path in hits],
+                started=time.monotonic())
+    return key
+
+
+# =====================================================
+# LRU CACHE TESTS
+# =====================================================
+
+def test_lru_evicts_least_recently_used(clock):
+    """A read refreshes an entry, so the oldest unread entry is evicted first."""
+    cache = LRUCache(2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1 and cache.stats()["size"] == 2
+
+
+def test_lru_entries_expire_after_ttl(clock):
+    """Entries are served until their TTL and missed (and dropped) after it."""
+    cache = LRUCache(4, ttl=60)
+    cache.put("a", 1)
+    clock.now += 59
+    assert cache.get("a") == 1
+    clock.now += 1
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+    # Reading does not extend the TTL; writing again does
+    cache.put("a", 2)
+    clock.now += 30
+    cache.put("a", 3)
+    clock.now += 45
+    assert cache.get("a") == 3
+
+
+def test_lru_disabled_with_zero_entries():
+    """max_entries 0 caches nothing."""
+    cache = LRUCache(0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+
+# =====================================================
+# INVALIDATION TESTS
+# =====================================================
+
+def test_invalidate_files_drops_only_holders(results):
+    """Only results holding a chunk of the changed file, in that namespace, are dropped."""
+    app = _cache("where is main", [("default", "app.py"), ("default", "util.py")])
+    util = _cache("helpers", [("default", "util.py")])
+    other = _cache("main elsewhere", [("other", "app.py")], namespaces=("other",))
+    query_cache.invalidate_files("default", ["app.py"])
+    assert get_results(app) is None
+    assert get_results(util) == [{"repo": "default", "file_path": "util.py", "score": 1.0}]
+    assert get_results(other) is not None
+
+
+def test_invalidate_new_files_drops_namespace(results):
+    """A new file may outrank anything, so every result searching its namespace goes."""
+    util = _cache("helpers", [("default", "util.py")])
+    both = _cache("anything", [("other", "x.py")], namespaces=("default", "other"))
+    other = _cache("other only", [("other", "x.py")], namespaces=("other",))
+    query_cache.invalidate_files("default", ["new.py"], new_files=True)
+    assert get_results(util) is None and get_results(both) is None
+    assert get_results(other) is not None
+
+
+def test_results_started_before_a_change_are_not_cached(results, clock):
+    """A retrieval that began before its file changed does not refill the cache."""
+    started = time.monotonic()
+    clock.now += 1
+    query_cache.invalidate_files("default", ["app.py"])
+    key = result_key("q", 5, None, "rrf", [_version("default")])
+    hits = [{"repo": "default", "file_path": "app.py", "score": 1.0}]
+    put_results(key, hits, started=started)
+    assert get_results(key) is None
+    put_results(key, hits, started=time.monotonic())
+    assert get_results(key) == hits
+
+
+def test_get_results_returns_a_copy(results):
+    """Editing returned results leaves the cached entry intact."""
+    key = _cache("q", [("default", "app.py")])
+    get_results(key)[0]["score"] = 0.0
+    assert get_results(key)[0]["score"] == 1.0
@@ -0,0 +1,100 @@
+# backend/tests/test_retriever.py
+"""
+Hybrid Fusion Tests for PrivCode
+The vector and full-text legs must combine into one ranking whatever
+subset of them found a chunk, and full-text scores of different indexes
+must not outweigh each other.
+"""
+
+import pytest
+
+from services.retriever import RRF_K, _fuse, check_fusion, hybrid_retrieve
+
+
+def _hit(key, score, repo="default"):
+    return {"key": key, "score": score, "repo": repo}
+
+
+def _by_key(results):
+    return {r["key"]: r for r in results}
+
+
+# =====================================================
+# RRF TESTS
+# =====================================================
+
+def test_rrf_adds_reciprocal_ranks(monkeypatch):
+    """A chunk both legs found outranks chunks found by one leg only."""
+    monkeypatch.setattr("services.retriever.HYBRID_VECTOR_WEIGHT", 1.0)
+    monkeypatch.setattr("services.retriever.HYBRID_TEXT_WEIGHT", 1.0)
+    results = _fuse([_hit("a", 0.1), _hit("b", 0.3)], [_hit("b", 9.0), _hit("c", 4.0)],
+                    top_k=10, fusion="rrf")
+    assert [r["key"] for r in results] == ["b", "a", "c"]
+    fused = _by_key(results)
+    assert fused["b"]["score"] == pytest.approx(1 / (RRF_K + 2) + 1 / (RRF_K + 1))
+    assert fused["b"]["scores"]["vector_rank"] == 2
+    assert fused["b"]["scores"]["text_rank"] == 1
+
+
+def test_single_leg_keys_keep_missing_leg_empty():
+    """Keys only one leg found carry None for the other leg."""
+    fused = _by_key(_fuse([_hit("a", 0.1)], [_hit("c", 4.0)], top_k=10, fusion="rrf"))
+    assert fused["a"]["scores"]["text"] is None and fused["a"]["scores"]["text_rank"] is None
+    assert fused["c"]["scores"]["vector"] is None and fused["c"]["scores"]["vector_rank"] is None
+    assert fused["c"]["scores"]["text"] == 4.0
+    assert _fuse([], [], top_k=10, fusion="rrf") == []
+
+
+# =====================================================
+# WEIGHTED TESTS
+# =====================================================
+
+def test_weighted_normalizes_both_legs(monkeypatch):
+    """Cosine distance becomes similarity, full-text scores a share of the best."""
+    monkeypatch.setattr("services.retriever.HYBRID_VECTOR_WEIGHT", 1.0)
+    monkeypatch.setattr("services.retriever.HYBRID_TEXT_WEIGHT", 1.0)
+    fused = _by_key(_fuse([_hit("a", 0.5)], [_hit("a", 8.0), _hit("b", 2.0)],
+                          top_k=10, fusion="weighted"))
+    assert fused["a"]["score"] == pytest.approx(0.75 + 1.0)
+    assert fused["b"]["score"] == pytest.approx(0.25)
+
+
+def test_weighted_zero_text_scores(monkeypatch):
+    """A best full-text score of 0 contributes nothing instead of dividing by zero."""
+    monkeypatch.setattr("services.retriever.HYBRID_TEXT_WEIGHT", 1.0)
+    fused = _by_key(_fuse([], [_hit("a", 0.0), _hit("b", 0.0)], top_k=10, fusion="weighted"))
+    assert fused["a"]["score"] == 0.0 and fused["b"]["score"] == 0.0
+
+
+def test_weighted_normalizes_text_per_version(monkeypatch):
+    """The best hit of each index scores 1.0, however large its raw BM25."""
+    monkeypatch.setattr("services.retriever.HYBRID_TEXT_WEIGHT", 1.0)
+    fused = _by_key(_fuse([], [_hit("a", 40.0, "big"), _hit("b", 20.0, "big"),
+                               _hit("c", 2.0, "small"), _hit("d", 1.0, "small")],
+                          top_k=10, fusion="weighted"))
+    assert fused["a"]["score"] == pytest.approx(1.0)
+    assert fused["c"]["score"] == pytest.approx(1.0)
+    assert fused["b"]["score"] == pytest.approx(0.5)
+    assert fused["d"]["score"] == pytest.approx(0.5)
+
+
+# =====================================================
+# FUSION MODE TESTS
+# =====================================================
+
+def test_check_fusion_accepts_known_modes():
+    """Known modes pass in any case."""
+    assert check_fusion("RRF") == "rrf"
+    assert check_fusion("Weighted") == "weighted"
+    assert check_fusion("vector") == "vector"
+
+
+def test_unknown_fusion_is_rejected():
+    """A misspelled mode raises instead of silently fusing by weights."""
+    with pytest.raises(ValueError, match="Unsupported fusion 'bm25'"):
+        check_fusion("bm25")
+    with pytest.raises(ValueError, match="Unsupported fusion"):
+        hybrid_retrieve("where is main", fusion="wieghted")
+    for fusion in ("vector", "rfr"):
+        with pytest.raises(ValueError, match="Cannot fuse"):
+            _fuse([_hit("a", 0.1)], [_hit("a", 1.0)], top_k=10, fusion=fusion)
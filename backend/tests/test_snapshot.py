@@ -0,0 +1,246 @@
+# backend/tests/test_snapshot.py
+"""
+Snapshot Tests for PrivCode
+Exported chunks must come back field for field, vectors in the datatype
+the target Redis can index, and a damaged file must never activate a
+half-restored index.
+"""
+
+import io
+
+import numpy as np
+import pytest
+from cryptography.fernet import Fernet, InvalidToken
+
+import services.snapshot as snapshot
+from services.snapshot import (
+    MAGIC,
+    _FRAME_HEADER,
+    SnapshotError,
+    _decode_columns,
+    _encode_columns,
+    _read_frames,
+    _write_frame,
+)
+from utils.vector_codec import from_storage, to_storage
+
+DIMS = 4
+
+
+class _MemoryRedis:
+    """The hash commands snapshot.py uses, kept in a dict."""
+
+    def __init__(self):
+        self.hashes = {}
+
+    def scan_iter(self, match, count=None):
+        prefix = match.rstrip("*").encode()
+        return [key for key in list(self.hashes) if key.startswith(prefix)]
+
+    def pipeline(self, transaction=True):
+        return _MemoryPipeline(self)
+
+
+def _encoded(value):
+    return bytes(value) if isinstance(value, (bytes, memoryview)) else str(value).encode()
+
+
+class _MemoryPipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def hmget(self, key, fields):
+        stored = self.client.hashes.get(_encoded(key), {})
+        self.commands.append(lambda: [stored.get(_encoded(f)) for f in fields])
+
+    def hset(self, key, mapping):
+        def _hset():
+            stored = self.client.hashes.setdefault(_encoded(key), {})
+            for field, value in mapping.items():
+                stored[_encoded(field)] = _encoded(value)
+        self.commands.append(_hset)
+
+    def execute(self):
+        return [command() for command in self.commands]
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    """In-memory Redis, index versions and cipher behind services.snapshot."""
+    client = _MemoryRedis()
+    state = {"active": {}, "retired": [], "supported": ["float32", "float16", "int8"]}
+
+    def _version(model, namespace, uid=None, datatype="float32", projection=None):
+        return {"model": model, "namespace": namespace, "uid": uid or "uid-1",
+                "dims": DIMS, "datatype": datatype, "projection": projection,
+                "prefix": f"privcode:{namespace}:{datatype}:"}
+
+    def _activate(version):
+        state["active"][version["namespace"]] = version
+
+    cipher = Fernet(Fernet.generate_key())
+    monkeypatch.setattr(snapshot, "_cipher", lambda: cipher)
+    monkeypatch.setattr(snapshot, "get_redis_client", lambda: client)
+    monkeypatch.setattr(snapshot, "get_active_version",
+                        lambda namespace, create=True: state["active"].get(namespace))
+    monkeypatch.setattr(snapshot, "list_namespaces", lambda: {"repo": "/src/repo"})
+    monkeypatch.setattr(snapshot, "create_index_version", _version)
+    monkeypatch.setattr(snapshot, "activate_index_version", _activate)
+    monkeypatch.setattr(snapshot, "register_namespace", lambda namespace, source: None)
+    monkeypatch.setattr(snapshot, "retire_index_version",
+                        lambda version, delay=None: state["retired"].append(version))
+    monkeypatch.setattr(snapshot, "supported_datatypes", lambda: state["supported"])
+    monkeypatch.setattr(snapshot, "storage_datatype", lambda: "float32")
+    monkeypatch.setattr(snapshot, "SNAPSHOT_BLOCK_ROWS", 2)
+    state["client"] = client
+    return state
+
+
+def _seed(state, datatype, rows=5):
+    """Index *rows* chunks in namespace "repo"; the last one has empty fields."""
+    version = snapshot.create_index_version("model", "repo", datatype=datatype)
+    state["active"]["repo"] = version
+    vectors = to_storage(np.arange(rows * DIMS, dtype=np.float32).reshape(rows, DIMS) - 7,
+                         datatype)
+    for i in range(rows):
+        fields = {b"content": f"def f{i}():\n    return 'é{i}'\n".encode(),
+                  b"metadata": b'{"symbol": "f%d"}' % i,
+                  b"file_path": b"pkg/mod.py", b"language": b"py",
+                  b"start_line": str(i * 3 + 1).encode(), b"end_line": str(i * 3 + 2).encode(),
+                  b"vector": vectors[i].tobytes()}
+        if i == rows - 1:
+            fields.update({b"content": b"", b"language": b""})
+            del fields[b"metadata"], fields[b"start_line"], fields[b"end_line"]
+        state["client"].hashes[f"{version['prefix']}file:{i}".encode()] = fields
+    return version
+
+
+def _restored(state, namespace="copy"):
+    """Hashes of the restored version, by key suffix."""
+    prefix = state["active"][namespace]["prefix"].encode()
+    return {key[len(prefix):]: fields for key, fields in state["client"].hashes.items()
+            if key.startswith(prefix)}
+
+
+# =====================================================
+# FRAME AND COLUMN TESTS
+# =====================================================
+
+def test_columns_round_trip_empty_fields():
+    """Text columns come back byte for byte, empty ints as -1."""
+    rows = [(b"k1", "é".encode(), b"{}", b"a.py", b"py", b"3", b"9"),
+            (b"k2", b"", None, b"b.txt", None, None, b"")]
+    columns = _decode_columns(_encode_columns(rows), len(rows))
+    assert [bytes(v) for v in columns["content"]] == ["é".encode(), b""]
+    assert [bytes(v) for v in columns["metadata"]] == [b"{}", b""]
+    assert [bytes(v) for v in columns["language"]] == [b"py", b""]
+    assert columns["start_line"] == [3, -1] and columns["end_line"] == [9, -1]
+    assert _decode_columns(_encode_columns([]), 0)["key"] == []
+
+
+def test_frames_round_trip_and_truncation():
+    """Frames decrypt in order; a cut header or token raises SnapshotError."""
+    cipher = Fernet(Fernet.generate_key())
+    f = io.BytesIO()
+    _write_frame(f, cipher, b"M", b"manifest")
+    _write_frame(f, cipher, b"B", b"")
+    data = f.getvalue()
+    frames = list(_read_frames(io.BytesIO(data)))
+    assert [(kind, cipher.decrypt(token)) for kind, token in frames] == [
+        (b"M", b"manifest"), (b"B", b"")]
+    with pytest.raises(SnapshotError, match="Truncated frame"):
+        list(_read_frames(io.BytesIO(data[:-1])))
+    with pytest.raises(SnapshotError, match="Truncated frame header"):
+        list(_read_frames(io.BytesIO(data + data[:3])))
+
+
+# =====================================================
+# EXPORT / IMPORT TESTS
+# =====================================================
+
+@pytest.mark.parametrize("datatype", ["float16", "int8"])
+def test_snapshot_round_trip(redis, tmp_path, datatype):
+    """Every chunk, empty fields included, is restored into a new active version."""
+    original = _seed(redis, datatype)
+    path = tmp_path / "repo.pcsnap"
+    exported = snapshot.export_snapshot(path, "repo")
+    assert exported["rows"] == 5 and exported["datatype"] == datatype
+    assert path.read_bytes().startswith(MAGIC)
+
+    result = snapshot.import_snapshot(path, namespace="copy")
+    assert result["rows"] == 5 and redis["retired"] == []
+    assert redis["active"]["copy"]["datatype"] == datatype
+    prefix = original["prefix"].encode()
+    source = {key[len(prefix):]: fields for key, fields in redis["client"].hashes.items()
+              if key.startswith(prefix)}
+    restored = _restored(redis)
+    assert restored.keys() == source.keys()
+    for key, fields in source.items():
+        for name in (b"content", b"file_path", b"language", b"vector",
+                     b"start_line", b"end_line"):
+            assert restored[key].get(name) == fields.get(name), (key, name)
+        assert restored[key][b"metadata"] == fields.get(b"metadata", b"")
+        assert restored[key][b"repo"] == b"copy"
+    # The empty chunk stores no line numbers rather than -1
+    assert b"start_line" not in restored[b"file:4"]
+
+
+def test_snapshot_converts_unsupported_datatype(redis, tmp_path):
+    """A float16 snapshot restored where float16 cannot be indexed is stored as float32."""
+    _seed(redis, "float16")
+    path = tmp_path / "repo.pcsnap"
+    snapshot.export_snapshot(path, "repo")
+    redis["supported"] = ["float32"]
+    snapshot.import_snapshot(path, namespace="copy")
+    assert redis["active"]["copy"]["datatype"] == "float32"
+    restored = _restored(redis)
+    source = redis["client"].hashes
+    for key, fields in restored.items():
+        original = source[f"privcode:repo:float16:{key.decode()}".encode()][b"vector"]
+        np.testing.assert_array_equal(from_storage(fields[b"vector"], "float32"),
+                                      from_storage(original, "float16"))
+
+
+def test_snapshot_corrupted_block(redis, tmp_path):
+    """A tampered block fails decryption and the new version is retired, not activated."""
+    _seed(redis, "float16")
+    path = tmp_path / "repo.pcsnap"
+    snapshot.export_snapshot(path, "repo")
+    data = bytearray(path.read_bytes())
+    data[-200] ^= 0x01   # inside the last block, before the end frame
+    path.write_bytes(bytes(data))
+    with pytest.raises(InvalidToken):
+        snapshot.import_snapshot(path, namespace="copy")
+    assert "copy" not in redis["active"]
+    assert [v["namespace"] for v in redis["retired"]] == ["copy"]
+
+
+def test_snapshot_truncated_frame(redis, tmp_path):
+    """A file cut short mid-frame is rejected and the new version retired."""
+    _seed(redis, "int8")
+    path = tmp_path / "repo.pcsnap"
+    snapshot.export_snapshot(path, "repo")
+    path.write_bytes(path.read_bytes()[:-1])
+    with pytest.raises(SnapshotError, match="Truncated frame"):
+        snapshot.import_snapshot(path, namespace="copy")
+    assert "copy" not in redis["active"]
+    assert [v["namespace"] for v in redis["retired"]] == ["copy"]
+
+
+def test_snapshot_missing_blocks(redis, tmp_path):
+    """Whole frames missing before the end frame are caught by its row count."""
+    _seed(redis, "int8")
+    path = tmp_path / "repo.pcsnap"
+    snapshot.export_snapshot(path, "repo")
+    with path.open("rb") as f:
+        f.read(len(MAGIC))
+        frames = list(_read_frames(f))
+    assert [kind for kind, _ in frames] == [b"M", b"B", b"B", b"B", b"E"]
+    del frames[2]
+    path.write_bytes(MAGIC + b"".join(
+        _FRAME_HEADER.pack(kind, len(token)) + token for kind, token in frames))
+    with pytest.raises(SnapshotError, match="Snapshot truncated: 3 of 5"):
+        snapshot.import_snapshot(path, namespace="copy")
+    assert "copy" not in redis["active"]
+    assert [v["namespace"] for v in redis["retired"]] == ["copy"]
@@ -1,13 +1,353 @@
+import importlib
 import json
+import threading
 from tree_sitter import Parser, Language
-import tree_sitter_python as tspython
 
-# Convert PyCapsule -> Language
-PY_LANGUAGE = Language(tspython.language())
+from core.logger import setup_logger
 
-# Create parser and assign language (tree-sitter >= 0.25 API)
-parser = Parser()
-parser.language = PY_LANGUAGE
+logger = setup_logger()
+
+
+# -----------------------------------------------------------------------------
+# Grammar registry
+# -----------------------------------------------------------------------------
+#
+# One entry per tree-sitter grammar.  Grammar packages are imported on first
+# use, so a worker only pays for the languages its repository contains.
+#
+#   module / entry  grammar package and its Language-capsule function
+#   classes         nodes reported as kind "class" (open a class scope)
+#   functions       nodes reported as "function", or "method" inside a class
+#   methods         nodes that are always "method"
+#   assignments     declarators that define a function when their value is
+#                   one of `function_values` (``const f = () => ...``)
+#   scopes          containers that prefix qualnames but are not symbols
+#   boundaries      node types that start a new chunk
+
+_JS_CLASSES = {"class_declaration", "class"}
+_JS_FUNCTIONS = {"function_declaration", "generator_function_declaration"}
+_JS_BOUNDARIES = _JS_CLASSES | _JS_FUNCTIONS | {
+    "method_definition", "export_statement", "lexical_declaration",
+}
+_JS_FUNCTION_VALUES = {"arrow_function", "function_expression", "function",
+                       "generator_function"}
+
+_TS_CLASSES = _JS_CLASSES | {
+    "abstract_class_declaration", "interface_declaration", "enum_declaration",
+}
+_TS_BOUNDARIES = _JS_BOUNDARIES | _TS_CLASSES | {"type_alias_declaration"}
+
+_C_FUNCTIONS = {"function_definition"}
+_C_CLASSES = {"struct_specifier", "union_specifier", "enum_specifier"}
+
+GRAMMARS = {
+    "python": {
+        "module": "tree_sitter_python",
+        "entry": "language",
+        "classes": {"class_definition"},
+        "functions": {"function_definition"},
+        "boundaries": {"function_definition", "class_definition", "decorated_definition"},
+    },
+    "javascript": {
+        "module": "tree_sitter_javascript",
+        "entry": "language",
+        "classes": _JS_CLASSES,
+        "functions": _JS_FUNCTIONS,
+        "methods": {"method_definition"},
+        "assignments": {"variable_declarator"},
+        "function_values": _JS_FUNCTION_VALUES,
+        "boundaries": _JS_BOUNDARIES,
+    },
+    "typescript": {
+        "module": "tree_sitter_typescript",
+        "entry": "language_typescript",
+        "classes": _TS_CLASSES,
+        "functions": _JS_FUNCTIONS | {"function_signature"},
+        "methods": {"method_definition", "abstract_method_signature"},
+        "assignments": {"variable_declarator"},
+        "function_values": _JS_FUNCTION_VALUES,
+        "scopes": {"internal_module"},
+        "boundaries": _TS_BOUNDARIES,
+    },
+    "tsx": {
+        "module": "tree_sitter_typescript",
+        "entry": "language_tsx",
+        "classes": _TS_CLASSES,
+        "functions": _JS_FUNCTIONS | {"function_signature"},
+        "methods": {"method_definition", "abstract_method_signature"},
+        "assignments": {"variable_declarator"},
+        "function_values": _JS_FUNCTION_VALUES,
+        "scopes": {"internal_module"},
+        "boundaries": _TS_BOUNDARIES,
+    },
+    "java": {
+        "module": "tree_sitter_java",
+        "entry": "language",
+        "classes": {"class_declaration", "interface_declaration", "enum_declaration",
+                    "record_declaration", "annotation_type_declaration"},
+        "methods": {"method_declaration", "constructor_declaration"},
+        "boundaries": {"class_declaration", "interface_declaration", "enum_declaration",
+                       "record_declaration", "method_declaration",
+                       "constructor_declaration"},
+    },
+    "go": {
+        "module": "tree_sitter_go",
+        "entry": "language",
+        "classes": {"type_spec"},
+        "functions": {"function_declaration"},
+        "methods": {"method_declaration"},
+        "boundaries": {"function_declaration", "method_declaration", "type_declaration"},
+    },
+    "c": {
+        "module": "tree_sitter_c",
+        "entry": "language",
+        "classes": _C_CLASSES,
+        "functions": _C_FUNCTIONS,
+        "boundaries": _C_FUNCTIONS | _C_CLASSES | {"type_definition"},
+    },
+    "cpp": {
+        "module": "tree_sitter_cpp",
+        "entry": "language",
+        "classes": _C_CLASSES | {"class_specifier"},
+        "functions": _C_FUNCTIONS,
+        "scopes": {"namespace_definition"},
+        "boundaries": _C_FUNCTIONS | _C_CLASSES | {
+            "class_specifier", "type_definition", "namespace_definition",
+            "template_declaration",
+        },
+    },
+}
+
+# File extension (without the dot, as stored in chunk records) -> grammar
+EXTENSIONS = {
+    "py": "python",
+    "js": "javascript",
+    "jsx": "javascript",
+    "mjs": "javascript",
+    "ts": "typescript",
+    "tsx": "tsx",
+    "java": "java",
+    "go": "go",
+    "c": "c",
+    "h": "c",
+    "cpp": "cpp",
+    "cc": "cpp",
+    "cxx": "cpp",
+    "hpp": "cpp",
+}
+
+# Python node types that form natural chunk boundaries (kept for callers
+# that predate the registry; see definition_types())
+DEFINITION_TYPES = GRAMMARS["python"]["boundaries"]
+
+_languages = {}          # grammar name -> Language, or None if unavailable
+_languages_lock = threading.Lock()
+
+# tree-sitter Parser objects are not thread-safe: each indexing worker
+# thread gets its own, per grammar (tree-sitter >= 0.25 API)
+_local = threading.local()
+
+
+def grammar_for(language: str):
+    """Grammar name for a file extension such as "py" or "tsx", or None."""
+    return EXTENSIONS.get((language or "").lower())
+
+
+def get_language(grammar: str):
+    """Load (once per process) and return the Language for *grammar*."""
+    if grammar in _languages:
+        return _languages[grammar]
+    with _languages_lock:
+        if grammar not in _languages:
+            spec = GRAMMARS[grammar]
+            try:
+                module = importlib.import_module(spec["module"])
+                # Convert PyCapsule -> Language
+                _languages[grammar] = Language(getattr(module, spec["entry"])())
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("tree-sitter grammar %s unavailable: %s", grammar, exc)
+                _languages[grammar] = None
+    return _languages[grammar]
+
+
+def get_parser(language: str = "py"):
+    """
+    This thread's Parser for the file extension *language*, or None when
+    the language has no grammar (or its package is not installed).
+    """
+    grammar = grammar_for(language)
+    if grammar is None:
+        return None
+    parsers = getattr(_local, "parsers", None)
+    if parsers is None:
+        parsers = _local.parsers = {}
+    if grammar not in parsers:
+        lang = get_language(grammar)
+        parsers[grammar] = Parser(lang) if lang is not None else None
+    return parsers[grammar]
+
+
+def definition_types(language: str = "py") -> set:
+    """Node types that start a new chunk for the file extension *language*."""
+    grammar = grammar_for(language)
+    return GRAMMARS[grammar]["boundaries"] if grammar else set()
+
+
+def parse(code: str, language: str = "py"):
+    """Parse *code* and return the tree-sitter Tree (None without a grammar)."""
+    parser = get_parser(language)
+    if parser is None:
+        return None
+    return parser.parse(code.encode("utf-8"))
+
+
+# -----------------------------------------------------------------------------
+# Symbol extraction
+# -----------------------------------------------------------------------------
+
+# Node types that hold a declared name in C-family declarator chains
+_NAME_TYPES = {
+    "identifier", "field_identifier", "type_identifier", "property_identifier",
+    "qualified_identifier", "destructor_name", "operator_name",
+    "private_property_identifier",
+}
+
+
+def _node_name(node):
+    """Declared name of *node*: its "name" field, or the innermost name of
+    a C/C++ declarator chain (``int *foo(...)``, ``Foo::bar(...)``)."""
+    name_node = node.child_by_field_name("name")
+    if name_node is not None:
+        return name_node.text.decode("utf-8")
+    declarator = node.child_by_field_name("declarator")
+    while declarator is not None:
+        if declarator.type in _NAME_TYPES:
+            return declarator.text.decode("utf-8")
+        declarator = declarator.child_by_field_name("declarator")
+    return None
+
+
+def _receiver_type(node):
+    """Type name of a Go method receiver, e.g. ``Server`` for ``(s *Server)``."""
+    receiver = node.child_by_field_name("receiver")
+    stack = [receiver] if receiver is not None else []
+    while stack:
+        current = stack.pop()
+        if current.type == "type_identifier":
+            return current.text.decode("utf-8")
+        stack.extend(reversed(current.children))
+    return None
+
+
+def extract_symbols(code: str, tree=None, language: str = "py") -> list:
+    """
+    Parse *code* once (or reuse *tree*) and return its symbol table:
+    [{"kind", "name", "qualname", "start_byte", "end_byte",
+      "start_line", "end_line"}, ...] in source order (lines are 1-based).
+    Languages without a grammar have no symbols.
+    """
+    grammar = grammar_for(language)
+    if grammar is None:
+        return []
+    if tree is None:
+        tree = parse(code, language)
+        if tree is None:
+            return []
+
+    spec = GRAMMARS[grammar]
+    classes = spec.get("classes", set())
+    functions = spec.get("functions", set())
+    methods = spec.get("methods", set())
+    assignments = spec.get("assignments", set())
+    function_values = spec.get("function_values", set())
+    scopes = spec.get("scopes", set())
+    symbols = []
+
+    def walk(node, scope, in_class):
+        kind = None
+        if node.type in classes:
+            # C/C++ specifiers are only definitions when they have a body
+            if grammar not in ("c", "cpp") or node.child_by_field_name("body") is not None:
+                kind = "class"
+        elif node.type in methods:
+            kind = "method"
+        elif node.type in functions:
+            kind = "method" if in_class else "function"
+        elif node.type in assignments:
+            value = node.child_by_field_name("value")
+            if value is not None and value.type in function_values:
+                kind = "method" if in_class else "function"
+
+        name = _node_name(node) if kind or node.type in scopes else None
+        if name:
+            # C++ out-of-line definitions (Foo::bar) and Go receivers carry
+            # their class in the name rather than in the tree
+            owner = _receiver_type(node) if grammar == "go" and kind == "method" else None
+            if "::" in name:
+                owner, _, name = name.rpartition("::")
+                kind = "method" if kind == "function" else kind
+            parts = [p for p in (scope, owner.replace("::", ".") if owner else None, name) if p]
+            qualname = ".".join(parts)
+            if kind:
+                symbols.append({
+                    "kind": kind,
+                    "name": name,
+                    "qualname": qualname,
+                    "start_byte": node.start_byte,
+                    "end_byte": node.end_byte,
+                    "start_line": node.start_point[0] + 1,
+                    "end_line": node.end_point[0] + 1,
+                })
+            for child in node.children:
+                walk(child, qualname, kind == "class")
+            return
+
+        for child in node.children:
+            walk(child, scope, in_class)
+
+    walk(tree.root_node, "", False)
+    return symbols
+
+
+def span_metadata(symbols: list, file_path: str, start_byte: int, end_byte: int,
+                  start_line: int, end_line: int) -> str:
+    """
+    Metadata for the byte span [start_byte, end_byte) of a parsed file,
+    derived from the file's symbol table by interval overlap.  "scope" is the
+    innermost symbol enclosing the start of the span, so a chunk that begins
+    mid-function still names that function.  "definitions" are the symbols
+    whose definition starts in the span, with their own line ranges (what
+    the symbol index serves).  start_byte / end_byte locate the chunk in
+    the file exactly (chunks that share a line split it between them).
+    """
+    metadata = {
+        "file": file_path,
+        "functions": [],
+        "classes": [],
+        "scope": None,
+        "definitions": [],
+        "start_line": start_line,
+        "end_line": end_line,
+        "start_byte": start_byte,
+        "end_byte": end_byte,
+    }
+
+    for sym in symbols:
+        if sym["start_byte"] >= end_byte or sym["end_byte"] <= start_byte:
+            continue
+        if sym["kind"] == "class":
+            metadata["classes"].append(sym["name"])
+        else:
+            metadata["functions"].append(sym["name"])
+        # Symbols are in source order, so the last encloser is the innermost
+        if sym["start_byte"] <= start_byte < sym["end_byte"]:
+            metadata["scope"] = sym["qualname"]
+        if start_byte <= sym["start_byte"] < end_byte:
+            metadata["definitions"].append({
+                key: sym[key] for key in ("kind", "name", "qualname", "start_line", "end_line")
+            })
+
+    return json.dumps(metadata)
 
 
 def extract_ast_metadata(code: str, file_path: str) -> str:
@@ -22,29 +362,12 @@ def extract_ast_metadata(code: str, file_path: str) -> str:
     }
 
     try:
-        tree = parser.parse(code.encode("utf-8"))
-
-        def walk(node):
-            if node.type == "function_definition":
-                name_node = node.child_by_field_name("name")
-                if name_node:
-                    metadata["functions"].append(
-                        name_node.text.decode("utf-8")
-                    )
-
-            elif node.type == "class_definition":
-                name_node = node.child_by_field_name("name")
-                if name_node:
-                    metadata["classes"].append(
-                        name_node.text.decode("utf-8")
-                    )
-
-            for child in node.children:
-                walk(child)
-
-        walk(tree.root_node)
-
+        for sym in extract_symbols(code):
+            if sym["kind"] == "class":
+                metadata["classes"].append(sym["name"])
+            else:
+                metadata["functions"].append(sym["name"])
     except Exception as e:
         metadata["error"] = str(e)
 
-    return json.dumps(metadata)
\ No newline at end of file
+    return json.dumps(metadata)
@@ -0,0 +1,362 @@
+# chunking.py — Read, chunk and AST-parse source files
+"""
+The CPU-bound part of indexing, kept free of Redis, torch and GitPython
+imports so it can run inside lightweight process-pool workers.  Each worker
+process holds its own tree-sitter Parsers, loaded per language on first use
+(see utils.ast_parser.get_parser), and returns compact tuples to the parent
+instead of full chunk records.
+"""
+
+import bisect
+import copy
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from utils.ast_parser import (
+    EXTENSIONS,
+    definition_types,
+    extract_symbols,
+    parse,
+    span_metadata,
+)
+from core.logger import setup_logger
+
+logger = setup_logger()
+
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 100
+
+
+def chunk_spans(text: str):
+    """(start, end) character offsets of the fixed-size overlapping windows."""
+    spans = []
+    start = 0
+    while start < len(text):
+        end = start + CHUNK_SIZE
+        spans.append((start, min(end, len(text))))
+        start = end - CHUNK_OVERLAP
+    return spans
+
+
+def chunk_code(text: str):
+    return [text[start:end] for start, end in chunk_spans(text)]
+
+
+def read_source(file_path: Path):
+    """Return the text of *file_path*, or None if it cannot be read."""
+    try:
+        return file_path.read_text(encoding="utf-8", errors="ignore")
+    except Exception as exc:
+        logger.warning("Failed to read %s: %s", file_path, exc)
+        return None
+
+
+# -----------------------------------------------------------------------------
+# Syntax-aware chunking
+# -----------------------------------------------------------------------------
+
+# Extensions with a tree-sitter grammar (see utils.ast_parser.GRAMMARS);
+# everything else is split into windows
+SYNTAX_LANGUAGES = frozenset(EXTENSIONS)
+
+# Sibling pieces smaller than this share a chunk even across definitions
+MIN_CHUNK_FRACTION = 0.5
+
+
+# -----------------------------------------------------------------------------
+# Chunk size measures
+# -----------------------------------------------------------------------------
+
+class ByteMeasure:
+    """Chunk size in UTF-8 bytes (used when no tokenizer is configured)."""
+
+    def __init__(self, budget: int = CHUNK_SIZE):
+        self.budget = budget
+
+    def count(self, start: int, end: int) -> int:
+        return end - start
+
+    def cut(self, start: int, end: int) -> int:
+        """Furthest byte offset <= end such that [start, cut) fits the budget."""
+        return min(end, start + self.budget)
+
+
+class TokenMeasure:
+    """
+    Chunk size in embedder word pieces.
+
+    The whole file is tokenized once (offsets only); the token count of any
+    byte span is then two ``np.searchsorted`` lookups, so sizing thousands
+    of candidate spans costs no extra tokenizer calls.
+    """
+
+    def __init__(self, content: str, code: bytes, tokenizer, budget: int):
+        self.budget = budget
+        offsets = tokenizer(
+            content,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+            verbose=False,
+        )["offset_mapping"]
+        char_starts = np.fromiter((s for s, _ in offsets), dtype=np.int64, count=len(offsets))
+
+        if len(code) == len(content):
+            self.starts = char_starts
+        else:
+            # char offset -> byte offset via the UTF-8 width of every code point
+            cps = np.frombuffer(content.encode("utf-32-le"), dtype=np.uint32)
+            widths = 1 + (cps >= 0x80) + (cps >= 0x800) + (cps >= 0x10000)
+            char_to_byte = np.concatenate(([0], np.cumsum(widths)))
+            self.starts = char_to_byte[char_starts]
+
+    def count(self, start: int, end: int) -> int:
+        lo, hi = np.searchsorted(self.starts, (start, end))
+        return int(hi - lo)
+
+    def cut(self, start: int, end: int) -> int:
+        first = int(np.searchsorted(self.starts, start))
+        last = first + self.budget
+        if last >= len(self.starts):
+            return end
+        return max(start + 1, min(end, int(self.starts[last])))
+
+
+# Embedder tokenizer + model window, set by configure_tokenizer() in the
+# parent process and passed to process-pool workers through init_worker()
+_tokenizer = None
+_token_budget = None
+_local = threading.local()
+
+
+def configure_tokenizer(tokenizer, max_seq_length: int):
+    """Size chunks with *tokenizer* so each fits *max_seq_length* tokens."""
+    global _tokenizer, _token_budget
+    _tokenizer = tokenizer
+    _token_budget = max_seq_length - tokenizer.num_special_tokens_to_add(pair=False)
+
+
+def _thread_tokenizer():
+    # Fast tokenizers mutate their truncation state on every call, which
+    # fails under concurrent use: each worker thread gets its own copy
+    if getattr(_local, "source", None) is not _tokenizer:
+        _local.tokenizer = copy.deepcopy(_tokenizer)
+        _local.source = _tokenizer
+    return _local.tokenizer
+
+
+def make_measure(content: str, code: bytes):
+    if _tokenizer is None:
+        return ByteMeasure()
+    return TokenMeasure(content, code, _thread_tokenizer(), _token_budget)
+
+
+# -----------------------------------------------------------------------------
+# Span splitting
+# -----------------------------------------------------------------------------
+
+def _window_spans(code: bytes, start: int, end: int, measure):
+    """Split [start, end) at line boundaries into pieces that fit the
+    budget; a single overlong line is cut hard (a small piece before it,
+    e.g. a function header, is cut together with it)."""
+    spans = []
+    min_size = measure.budget * MIN_CHUNK_FRACTION
+    piece_start = start
+    cursor = start
+    while cursor < end:
+        newline = code.find(b"\n", cursor, end)
+        line_end = end if newline == -1 else newline + 1
+        if measure.count(piece_start, line_end) > measure.budget and cursor > piece_start:
+            if (measure.count(piece_start, cursor) >= min_size
+                    or measure.count(cursor, line_end) <= measure.budget):
+                spans.append((piece_start, cursor))
+                piece_start = cursor
+        while measure.count(piece_start, line_end) > measure.budget:
+            cut = measure.cut(piece_start, line_end)
+            # Never inside a UTF-8 sequence: chunks must decode to exactly their bytes
+            while cut > piece_start + 1 and code[cut] & 0xC0 == 0x80:
+                cut -= 1
+            spans.append((piece_start, cut))
+            piece_start = cut
+        cursor = line_end
+    if piece_start < end:
+        spans.append((piece_start, end))
+    return spans
+
+
+def _split_node(node, start: int, code: bytes, measure, spans: list, boundaries):
+    """
+    Cover [start, node.end_byte) with spans that fit the budget:
+    one span per definition, small siblings merged, oversize children split
+    recursively (the pending prefix, e.g. a class header, is carried into
+    the first piece of the child).
+    """
+    children = node.children
+    if not children:
+        spans.extend(_window_spans(code, start, node.end_byte, measure))
+        return
+
+    budget = measure.budget
+    min_size = budget * MIN_CHUNK_FRACTION
+    group_start = start
+    cursor = start
+    prev_is_def = False
+
+    for child in children:
+        is_def = child.type in boundaries
+        size = measure.count(cursor, child.end_byte)
+        merged = measure.count(group_start, child.end_byte)
+
+        if merged > budget and size > budget:
+            # Oversize child: flush what precedes it unless it is a small
+            # prefix that belongs with the child, then recurse
+            if measure.count(group_start, cursor) >= min_size:
+                spans.append((group_start, cursor))
+                group_start = cursor
+            _split_node(child, group_start, code, measure, spans, boundaries)
+            # Keep the child's last piece open so closing tokens and small
+            # trailing siblings join it instead of becoming chunks of their own
+            group_start, _ = spans.pop()
+            cursor = child.end_byte
+            prev_is_def = is_def
+            continue
+
+        if cursor > group_start:
+            group_size = measure.count(group_start, cursor)
+            tiny_pair = group_size < min_size and size < min_size
+            boundary = (
+                merged > budget
+                # a small lead-in (comments, imports) stays with the def
+                or (is_def and group_size >= min_size and not tiny_pair)
+                or (prev_is_def and not tiny_pair)
+            )
+            if boundary:
+                spans.append((group_start, cursor))
+                group_start = cursor
+
+        cursor = child.end_byte
+        prev_is_def = is_def
+
+    if node.end_byte > group_start:
+        spans.append((group_start, node.end_byte))
+
+
+def syntax_chunk_spans(tree, code: bytes, measure=None, language: str = "py"):
+    """Byte spans of syntax-aware chunks covering the whole file."""
+    measure = measure or ByteMeasure()
+    spans = []
+    root = tree.root_node
+    _split_node(root, 0, code, measure, spans, definition_types(language))
+    if root.end_byte < len(code):
+        spans.append((root.end_byte, len(code)))
+    return spans
+
+
+def _fixed_byte_spans(content: str):
+    """Fixed-window spans (character based) converted to byte offsets."""
+    spans = []
+    byte_pos, char_pos = 0, 0
+    for start, end in chunk_spans(content):
+        # Chunks are in order: advance the char -> byte mapping incrementally
+        byte_pos += len(content[char_pos:start].encode("utf-8"))
+        char_pos = start
+        spans.append((byte_pos, byte_pos + len(content[start:end].encode("utf-8"))))
+    return spans
+
+
+def parse_source(content: str, rel_path: str, language: str = "py"):
+    """
+    Chunk *content* and return (chunks, legacy_truncated) where chunks is
+    [(chunk_text, ast_metadata_json, start_line, end_line), ...].
+
+    Supported languages are parsed once: chunks follow function / class
+    boundaries and each chunk's metadata comes from the file's symbol table
+    by byte-range overlap.  When the embedder's tokenizer is configured,
+    every chunk fits the model window and other languages are split at line
+    boundaries to the same token budget; otherwise they fall back to fixed
+    overlapping windows.  legacy_truncated counts the fixed 800-character
+    windows of this file that would have exceeded the model window.
+    """
+    code = content.encode("utf-8")
+    measure = make_measure(content, code)
+    symbols = []
+    spans = None
+
+    if language.lower() in SYNTAX_LANGUAGES:
+        try:
+            tree = parse(content, language)
+            if tree is not None:
+                symbols = extract_symbols(content, tree, language)
+                spans = syntax_chunk_spans(tree, code, measure, language)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("AST parse failed for %s: %s", rel_path, exc)
+            symbols = []
+
+    legacy_truncated = 0
+    if isinstance(measure, TokenMeasure):
+        legacy_truncated = sum(
+            1 for start, end in _fixed_byte_spans(content)
+            if measure.count(start, end) > measure.budget
+        )
+        if spans is None:
+            spans = _window_spans(code, 0, len(code), measure)
+
+    if spans is None:
+        spans = _fixed_byte_spans(content)
+
+    newlines = [m.start() for m in re.finditer(b"\n", code)]
+
+    results = []
+    for start, end in spans:
+        text = code[start:end].decode("utf-8", errors="ignore")
+        if not text.strip():
+            continue
+        # Leading blank lines belong to the gap, not to the chunk
+        lead = len(text) - len(text.lstrip("\r\n"))
+        if lead:
+            start += lead
+            text = text[lead:]
+        start_line = bisect.bisect_left(newlines, start) + 1
+        end_line = bisect.bisect_left(newlines, max(start, end - 1)) + 1
+        results.append((
+            text,
+            span_metadata(symbols, rel_path, start, end, start_line, end_line),
+            start_line,
+            end_line,
+        ))
+    return results, legacy_truncated
+
+
+# -----------------------------------------------------------------------------
+# Process-pool entry points (must stay top-level / picklable)
+# -----------------------------------------------------------------------------
+
+def init_worker(tokenizer=None, max_seq_length: int | None = None):
+    """Set up this worker's token measure; grammars load on first use."""
+    if tokenizer is not None:
+        configure_tokenizer(tokenizer, max_seq_length)
+
+
+def parse_text(content: str, rel_path: str, language: str):
+    """
+    Chunk and AST-parse already-read source (e.g. a git blob).
+    Same return shape as parse_file().
+    """
+    chunks, legacy_truncated = parse_source(content, rel_path, language)
+    return rel_path, language, chunks, legacy_truncated
+
+
+def parse_file(file_path: str, repo_root: str):
+    """
+    Read, chunk and AST-parse one file.
+    Returns (rel_path, language, [(chunk_text, metadata_json, start_line,
+    end_line), ...], legacy_truncated) or None.
+    """
+    path = Path(file_path)
+    content = read_source(path)
+    if content is None:
+        return None
+    return parse_text(content, str(path.relative_to(repo_root)), path.suffix.lstrip("."))
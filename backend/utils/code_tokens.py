@@ -0,0 +1,149 @@
+# code_tokens.py — Identifier-aware tokens for the full-text index
+"""
+RediSearch's default text analysis keeps ``hybrid_retrieve`` as one token
+but ``getUserById`` as one lowercase word and splits ``utils.redis_utils``
+on the dot, so a keyword query only matches identifiers spelled exactly
+as in the code.  The indexer therefore stores, per chunk, an extra
+``identifiers`` field holding every identifier of the chunk both whole
+(lowercased) and split into its words:
+
+    getUserById       -> getuserbyid get user by id
+    REDIS_URL         -> redis_url redis url
+    os.path.join      -> os path join   (each dotted part is an identifier)
+    HTTPServer2       -> httpserver2 http server
+
+Queries are tokenized the same way (query_tokens), so ``get user``,
+``getUserById`` and ``get_user_by_id`` all reach the same chunks, and a
+whole identifier (rare, hence high BM25 weight) ranks its definition and
+call sites first.
+
+The ``symbols`` TAG field lists the symbols a chunk *defines* (from the
+"definitions" of its AST metadata), so "where is X defined" is one exact
+or prefix tag lookup (symbol_tags, symbol_query).
+"""
+
+import json
+import re
+
+# A dotted path of identifiers (the dots are split off below)
+_IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*")
+# Words inside one identifier: "HTTPServer2" -> HTTP, Server, 2
+_WORD_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+_SPLIT_RE = re.compile(r"[_.]+")
+# "where is X defined", "find the class X", "X()", ... (see symbol_query)
+_SYMBOL_QUERY_RE = re.compile(
+    r"(?:(?P<verb>where\s+(?:is|are)|where's|find|show(?:\s+me)?|go\s+to|locate)\s+)?"
+    r"(?:(?P<of>definition|declaration)\s+of\s+)?"
+    r"(?:the\s+)?(?:(?P<kind>function|method|class|def|symbol)\s+)?"
+    r"`?(?P<symbol>[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*)(?P<call>\(\))?`?"
+    r"(?:\s+(?:function|method|class))?"
+    r"(?:\s+(?:is\s+|are\s+)?(?P<defined>defined|declared|implemented))?\s*\??",
+    re.IGNORECASE,
+)
+
+# Identifiers shorter than this are loop variables and noise
+MIN_TOKEN_LENGTH = 2
+
+
+def split_identifier(identifier: str) -> list:
+    """Lowercase words of one identifier (snake_case, camelCase, dotted)."""
+    return [
+        word.lower()
+        for part in _SPLIT_RE.split(identifier) if part
+        for word in _WORD_RE.findall(part)
+    ]
+
+
+def is_code_identifier(token: str) -> bool:
+    """
+    True for tokens only code spells like this: snake_case, camelCase,
+    CONSTANT_CASE, dotted paths or names with digits — not plain words.
+    """
+    if len(token) < MIN_TOKEN_LENGTH or not _IDENTIFIER_RE.fullmatch(token):
+        return False
+    return ("_" in token.strip("_") or "." in token
+            or any(c.isdigit() for c in token)
+            or any(c.isupper() for c in token[1:]))
+
+
+def identifier_tokens(text: str) -> list:
+    """
+    Distinct tokens of every identifier in *text*, in order of first
+    appearance: each identifier whole (lowercased) followed by its words.
+    """
+    tokens = {}
+    for match in _IDENTIFIER_RE.finditer(text):
+        for identifier in match.group().split("."):
+            whole = identifier.strip("_").lower()
+            for token in (whole, *split_identifier(identifier)):
+                if len(token) >= MIN_TOKEN_LENGTH:
+                    tokens.setdefault(token, None)
+    return list(tokens)
+
+
+def identifier_text(text: str) -> str:
+    """Value of a chunk's ``identifiers`` search field."""
+    return " ".join(identifier_tokens(text))
+
+
+def query_tokens(query: str) -> list:
+    """*query* tokenized like the ``identifiers`` field."""
+    return identifier_tokens(query)
+
+
+def query_identifiers(query: str) -> list:
+    """The code identifiers of *query*, lowercased, as stored whole."""
+    return list(dict.fromkeys(
+        identifier.strip("_").lower()
+        for match in _IDENTIFIER_RE.finditer(query)
+        if is_code_identifier(match.group())
+        for identifier in match.group().split(".")
+        if len(identifier.strip("_")) >= MIN_TOKEN_LENGTH
+    ))
+
+
+# -----------------------------------------------------------------------------
+# Symbol tags
+# -----------------------------------------------------------------------------
+
+SYMBOL_SEPARATOR = ","
+
+
+def definitions(metadata: str | dict) -> list:
+    """The symbols defined in a chunk, from its AST metadata (JSON)."""
+    if isinstance(metadata, (str, bytes)):
+        try:
+            metadata = json.loads(metadata)
+        except ValueError:
+            return []
+    return metadata.get("definitions") or []
+
+
+def symbol_tags(metadata: str | dict) -> str:
+    """
+    Value of a chunk's ``symbols`` TAG field: the name and qualified name
+    of every symbol defined in it, lowercased.
+    """
+    return SYMBOL_SEPARATOR.join(dict.fromkeys(
+        name.lower()
+        for definition in definitions(metadata)
+        for name in (definition["name"], definition["qualname"])
+        if name and SYMBOL_SEPARATOR not in name
+    ))
+
+
+def symbol_query(query: str) -> str | None:
+    """
+    The symbol a definition lookup asks for, or None for any other query.
+    The query must say it is a lookup ("where is X defined", "definition
+    of X", "find def X", "X()") or name an identifier only code spells
+    like that ("getUserById", "where is redis_utils"); a bare word such
+    as "logging" or "find security" is a question, not a lookup.
+    """
+    match = _SYMBOL_QUERY_RE.fullmatch(query.strip())
+    if not match:
+        return None
+    explicit = (match.group("of") or match.group("call") or match.group("defined")
+                or (match.group("verb") and match.group("kind")))
+    symbol = match.group("symbol")
+    return symbol if explicit or is_code_identifier(symbol) else None
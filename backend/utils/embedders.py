@@ -0,0 +1,234 @@
+# embedders.py — Embedding model backends
+"""
+Every embedder offers the subset of the SentenceTransformer interface the
+rest of PrivCode relies on: ``encode()`` (same arguments and return shapes:
+a 1-D vector for one string, a (n, dims) matrix for a list), ``tokenizer``,
+``max_seq_length`` and ``get_sentence_embedding_dimension()``.
+
+EMBEDDING_BACKEND picks the implementation:
+
+  torch  SentenceTransformer on PyTorch (default)
+  onnx   the model's ONNX export, int8-quantized, on ONNX Runtime and
+         the ``tokenizers`` library; no torch import at all, faster on
+         CPU.  Uses the same tokenizer, pooling and normalization as the
+         model's sentence-transformers config, and matches the torch
+         vectors to within quantization error (cosine > 0.99), so both
+         backends share index versions and the embedding cache.
+
+The ONNX file is EMBEDDING_ONNX_FILE inside the model's Hugging Face
+repository (most sentence-transformers models ship quantized exports), or
+inside EMBEDDING_ONNX_DIR for a local export made with
+
+    python -m utils.embedders export all-MiniLM-L6-v2 models/minilm-onnx
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from core.logger import setup_logger
+
+logger = setup_logger()
+
+EMBEDDING_BACKENDS = ("torch", "onnx")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+if EMBEDDING_BACKEND not in EMBEDDING_BACKENDS:
+    raise ValueError(f"EMBEDDING_BACKEND must be one of {EMBEDDING_BACKENDS}")
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR")
+# ONNX Runtime intra-op threads (0: one per physical core)
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+
+
+def load_embedder(model_name: str, backend: str = EMBEDDING_BACKEND):
+    """A new embedder for *model_name* on *backend*."""
+    if backend == "onnx":
+        return OnnxEmbedder(model_name)
+    # Imported here so the onnx backend never loads torch
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+def _model_dir(model_name: str) -> Path:
+    if EMBEDDING_ONNX_DIR:
+        return Path(EMBEDDING_ONNX_DIR)
+    if Path(model_name).is_dir():
+        return Path(model_name)
+    from huggingface_hub import snapshot_download
+    # Bare names are sentence-transformers models, as in SentenceTransformer()
+    repo_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+    return Path(snapshot_download(repo_id, allow_patterns=[
+        "*.json", "*.txt", "*.model", EMBEDDING_ONNX_FILE,
+    ]))
+
+
+def _read_json(path: Path) -> dict:
+    if not path.is_file():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+class FastTokenizer:
+    """
+    The model's tokenizer.json on the ``tokenizers`` library (importing
+    transformers would import torch).  Calling it accepts the arguments
+    utils.chunking passes to a transformers tokenizer; batch() pads and
+    truncates for the model.
+    """
+
+    def __init__(self, path: Path, max_length: int):
+        from tokenizers import Tokenizer
+
+        config = _read_json(path / "tokenizer_config.json")
+        self.model_max_length = int(min(config.get("model_max_length") or max_length, 1 << 30))
+        self._plain = Tokenizer.from_file(str(path / "tokenizer.json"))
+        self._plain.no_truncation()
+        self._plain.no_padding()
+
+        pad_token = config.get("pad_token") or "[PAD]"
+        pad_token = pad_token["content"] if isinstance(pad_token, dict) else pad_token
+        self._batch = Tokenizer.from_file(str(path / "tokenizer.json"))
+        self._batch.enable_truncation(min(max_length, self.model_max_length))
+        self._batch.enable_padding(pad_id=self._batch.token_to_id(pad_token) or 0,
+                                   pad_token=pad_token)
+
+    def num_special_tokens_to_add(self, pair: bool = False) -> int:
+        processor = self._plain.post_processor
+        return processor.num_special_tokens_to_add(pair) if processor else 0
+
+    def __call__(self, text: str, add_special_tokens: bool = True,
+                 return_offsets_mapping: bool = False, **kwargs) -> dict:
+        encoding = self._plain.encode(text, add_special_tokens=add_special_tokens)
+        result = {"input_ids": encoding.ids}
+        if return_offsets_mapping:
+            result["offset_mapping"] = encoding.offsets
+        return result
+
+    def batch(self, texts: list) -> dict:
+        """{input_ids, attention_mask, token_type_ids} int64 matrices."""
+        encodings = self._batch.encode_batch(texts)
+        return {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+
+
+class OnnxEmbedder:
+    """A sentence-transformers model run by ONNX Runtime."""
+
+    def __init__(self, model_name: str):
+        try:
+            import onnxruntime as ort
+        except ImportError as exc:
+            raise RuntimeError("EMBEDDING_BACKEND=onnx needs onnxruntime "
+                               "(pip install onnxruntime)") from exc
+
+        path = _model_dir(model_name)
+        onnx_file = path / EMBEDDING_ONNX_FILE
+        if not onnx_file.is_file():
+            raise FileNotFoundError(
+                f"{onnx_file} not found - set EMBEDDING_ONNX_FILE, or export the model "
+                f"with: python -m utils.embedders export {model_name} DIR"
+            )
+
+        self.model_name = model_name
+        self._pooling, self._normalize = self._read_modules(path)
+        st_config = _read_json(path / "sentence_bert_config.json")
+        self.tokenizer = FastTokenizer(path, st_config.get("max_seq_length") or 512)
+        self.max_seq_length = min(st_config.get("max_seq_length") or 512,
+                                  self.tokenizer.model_max_length)
+        self._lowercase = st_config.get("do_lower_case", False)
+        self._dims = self._pooling["word_embedding_dimension"]
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = EMBEDDING_THREADS
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self._session = ort.InferenceSession(str(onnx_file), options,
+                                             providers=["CPUExecutionProvider"])
+        self._inputs = [i.name for i in self._session.get_inputs()]
+
+    @staticmethod
+    def _read_modules(path: Path):
+        """(pooling config, normalize?) from the sentence-transformers modules."""
+        pooling, normalize = None, False
+        for module in _read_json(path / "modules.json") or []:
+            kind = module["type"].rsplit(".", 1)[-1]
+            if kind == "Pooling":
+                pooling = _read_json(path / module["path"] / "config.json")
+            elif kind == "Normalize":
+                normalize = True
+            elif kind != "Transformer":
+                raise ValueError(f"ONNX backend does not support {kind} modules ({path})")
+        if pooling is None:
+            raise ValueError(f"No pooling config in {path}")
+        return pooling, normalize
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._dims
+
+    def _pool(self, hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        mask = mask[..., None].astype(np.float32)
+        if self._pooling.get("pooling_mode_cls_token"):
+            return hidden[:, 0]
+        if self._pooling.get("pooling_mode_max_tokens"):
+            return np.where(mask > 0, hidden, -1e9).max(axis=1)
+        return (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar=None,
+               convert_to_numpy: bool = True, normalize_embeddings: bool = False,
+               **kwargs):
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        if self._lowercase:
+            sentences = [s.lower() for s in sentences]
+
+        vectors = np.empty((len(sentences), self._dims), dtype=np.float32)
+        # Longest first, as SentenceTransformer does: batches pad less
+        order = np.argsort([-len(s) for s in sentences], kind="stable")
+        for start in range(0, len(sentences), batch_size):
+            rows = order[start:start + batch_size]
+            batch = self.tokenizer.batch([sentences[i] for i in rows])
+            feeds = {name: batch[name] for name in self._inputs}
+            hidden = self._session.run(None, feeds)[0]
+            vectors[rows] = self._pool(hidden, batch["attention_mask"])
+
+        if self._normalize or normalize_embeddings:
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors[0] if single else vectors
+
+
+def export_onnx(model_name: str, output_dir: str, config: str = "avx2"):
+    """
+    Export *model_name* to ONNX and quantize it to int8 for CPUs with
+    *config* (arm64, avx2, avx512, avx512_vnni) into *output_dir*.  Needs
+    torch and optimum, once; serving then only needs onnxruntime.
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    model = SentenceTransformer(model_name, backend="onnx")
+    model.save(output_dir)
+    export_dynamic_quantized_onnx_model(model, config, output_dir)
+    # Named after the weight type: model_quint8_avx2.onnx, model_qint8_avx512.onnx, ...
+    exported = next(Path(output_dir).glob(f"onnx/model_*int8_{config}.onnx"))
+    logger.info("Exported %s - set EMBEDDING_ONNX_DIR=%s EMBEDDING_ONNX_FILE=%s",
+                model_name, output_dir, exported.relative_to(output_dir).as_posix())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export an embedding model to quantized ONNX")
+    parser.add_argument("command", choices=("export",))
+    parser.add_argument("model")
+    parser.add_argument("output_dir")
+    parser.add_argument("--config", default="avx2",
+                        choices=("arm64", "avx2", "avx512", "avx512_vnni"))
+    args = parser.parse_args(argv)
+    export_onnx(args.model, args.output_dir, args.config)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# embedding_cache.py — Content-addressed embedding cache (Redis)
+"""
+Chunk embeddings are cached under sha256(model name + chunk text), so any
+chunk whose exact text has been embedded before — after a branch switch, a
+revert, a re-clone into REPOS_DIR, or an edit that only shifted other chunks —
+is served from Redis instead of the model.
+
+Layout (outside the ``code:`` prefix, so RediSearch never indexes it):
+  embcache:<model>        HASH   content hash -> float32 vector bytes
+  embcache:<model>:lru    ZSET   content hash -> last-used timestamp
+
+The LRU set bounds the cache to EMBEDDING_CACHE_MAX_ENTRIES vectors; the
+least recently used entries are evicted after every insert.
+"""
+
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+
+from utils.embedding_service import BULK, get_embedding_service
+from utils.redis_utils import (
+    EMBEDDING_MODEL,
+    get_redis_client,
+    get_vector_dims,
+)
+from core.logger import setup_logger
+
+logger = setup_logger()
+
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def _cache_keys(model: str):
+    return f"embcache:{model}", f"embcache:{model}:lru"
+
+
+def content_hash(text: str, model: str = EMBEDDING_MODEL) -> str:
+    """sha256 of the embedding model name and the exact chunk text."""
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+def encode_with_cache(texts: list, model: str | None = None) -> np.ndarray:
+    """
+    Return a (len(texts), dims) float32 matrix of *model*'s embeddings for
+    *texts* (default EMBEDDING_MODEL).  Only cache misses are sent to the
+    embedding service, at indexing priority.
+    """
+    model = model or EMBEDDING_MODEL
+    dims = get_vector_dims(model)
+    vectors = np.empty((len(texts), dims), dtype=np.float32)
+    if not texts:
+        return vectors
+
+    data_key, lru_key = _cache_keys(model)
+    client = get_redis_client()
+    hashes = [content_hash(t, model) for t in texts]
+
+    missing = {}  # content hash -> row indices needing it
+    for i, (h, raw) in enumerate(zip(hashes, client.hmget(data_key, hashes))):
+        if raw is not None and len(raw) == dims * 4:
+            vectors[i] = np.frombuffer(raw, dtype=np.float32)
+        else:
+            missing.setdefault(h, []).append(i)
+
+    new_entries = {}
+    if missing:
+        fresh = get_embedding_service(model).encode(
+            [texts[rows[0]] for rows in missing.values()], priority=BULK,
+        )
+        for (h, rows), vec in zip(missing.items(), fresh):
+            vectors[rows] = vec
+            new_entries[h] = vec.tobytes()
+
+    pipe = client.pipeline(transaction=False)
+    if new_entries:
+        pipe.hset(data_key, mapping=new_entries)
+    pipe.zadd(lru_key, dict.fromkeys(hashes, time.time()))
+    pipe.execute()
+
+    if new_entries:
+        _evict(client, data_key, lru_key)
+
+    misses = sum(len(rows) for rows in missing.values())
+    with _stats_lock:
+        _stats["hits"] += len(texts) - misses
+        _stats["misses"] += misses
+
+    return vectors
+
+
+def _evict(client, data_key: str, lru_key: str):
+    """Drop least recently used vectors beyond EMBEDDING_CACHE_MAX_ENTRIES."""
+    excess = client.zcard(lru_key) - EMBEDDING_CACHE_MAX_ENTRIES
+    if excess <= 0:
+        return
+    evicted = [member for member, _ in client.zpopmin(lru_key, excess)]
+    if evicted:
+        client.hdel(data_key, *evicted)
+        logger.info("Embedding cache: evicted %d LRU entries", len(evicted))
+
+
+def cache_stats() -> dict:
+    """Hit / miss counters since process start."""
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 4) if total else 0.0,
+    }
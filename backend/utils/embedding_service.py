@@ -0,0 +1,179 @@
+# embedding_service.py — Micro-batching embedding worker
+"""
+All embedding goes through one worker thread per model instead of each
+caller running the model itself.  The worker takes the most urgent
+request from a priority queue and, for queries, keeps collecting queries
+for EMBED_SERVICE_WINDOW_MS, so concurrent /query requests share one
+forward pass instead of each paying the per-call overhead and fighting
+over the torch / ONNX Runtime threads.
+
+Interactive queries (INTERACTIVE) always go before indexing (BULK).
+Indexing requests are split into EMBED_SERVICE_MAX_BATCH-text parts, so
+a query waits for at most one such part, never for a whole file's worth
+of chunks.  Queries and chunks are never batched together: a short query
+would be padded to chunk length and would wait for the chunk batch.
+"""
+
+import itertools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from utils.redis_utils import EMBEDDING_MODEL, get_embedder
+from core.logger import setup_logger
+
+logger = setup_logger()
+
+EMBED_SERVICE_WINDOW_MS = float(os.getenv("EMBED_SERVICE_WINDOW_MS", "5"))
+# Texts per forward pass (EMBED_BATCH_SIZE is the older name of the setting)
+EMBED_SERVICE_MAX_BATCH = int(os.getenv("EMBED_SERVICE_MAX_BATCH",
+                                        os.getenv("EMBED_BATCH_SIZE", "64")))
+
+# Priorities: lower runs first
+INTERACTIVE = 0
+BULK = 1
+
+_LATENCY_SAMPLES = 1024
+
+
+class _Request:
+    __slots__ = ("texts", "future", "submitted")
+
+    def __init__(self, texts: list):
+        self.texts = texts
+        self.future = Future()
+        self.submitted = time.perf_counter()
+
+
+class EmbeddingService:
+    """Priority queue plus batching worker thread for one model."""
+
+    def __init__(self, model: str, window_ms: float = EMBED_SERVICE_WINDOW_MS,
+                 max_batch: int = EMBED_SERVICE_MAX_BATCH):
+        self.model = model
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()   # FIFO within a priority
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "texts": 0, "batches": 0}
+        self._latencies = {INTERACTIVE: [], BULK: []}
+        self._worker = threading.Thread(target=self._run, name=f"embed-{model}", daemon=True)
+        self._worker.start()
+
+    def submit(self, texts: list, priority: int = BULK) -> Future:
+        """Queue *texts*; the future resolves to their (n, dims) float32 matrix."""
+        request = _Request(list(texts))
+        self._queue.put((priority, next(self._seq), request))
+        return request.future
+
+    def encode(self, texts, priority: int = BULK) -> np.ndarray:
+        """
+        Embed *texts* and wait for the result.  Like encode() of the
+        embedders: one string gives a vector, a list a (n, dims) matrix.
+        """
+        if isinstance(texts, str):
+            return self.submit([texts], priority).result()[0]
+        parts = [
+            self.submit(texts[i:i + self.max_batch], priority)
+            for i in range(0, len(texts), self.max_batch)
+        ]
+        if not parts:
+            return np.empty((0, get_embedder(self.model).get_sentence_embedding_dimension()),
+                            dtype=np.float32)
+        return np.vstack([part.result() for part in parts])
+
+    # -------------------------------------------------------------------------
+
+    def _collect(self):
+        """Block for the most urgent request, then gather more of the same
+        priority into one batch."""
+        priority, _, first = self._queue.get()
+        batch, size = [first], len(first.texts)
+        deadline = time.perf_counter() + (self.window if priority == INTERACTIVE else 0.0)
+        while size < self.max_batch:
+            try:
+                remaining = deadline - time.perf_counter()
+                item = self._queue.get(timeout=remaining) if remaining > 0 \
+                    else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item[0] != priority or size + len(item[2].texts) > self.max_batch:
+                self._queue.put(item)   # keeps its place (same sequence number)
+                break
+            batch.append(item[2])
+            size += len(item[2].texts)
+        return priority, batch
+
+    def _run(self):
+        while True:
+            priority, batch = self._collect()
+            texts = [text for request in batch for text in request.texts]
+            try:
+                vectors = np.asarray(
+                    get_embedder(self.model).encode(
+                        texts, batch_size=len(texts), convert_to_numpy=True,
+                        show_progress_bar=False,
+                    ),
+                    dtype=np.float32,
+                )
+            except Exception as exc:  # noqa: BLE001
+                for request in batch:
+                    request.future.set_exception(exc)
+                continue
+
+            now = time.perf_counter()
+            offset = 0
+            for request in batch:
+                n = len(request.texts)
+                request.future.set_result(vectors[offset:offset + n])
+                offset += n
+            with self._lock:
+                self._stats["requests"] += len(batch)
+                self._stats["texts"] += len(texts)
+                self._stats["batches"] += 1
+                latencies = self._latencies[priority]
+                latencies.extend(now - request.submitted for request in batch)
+                del latencies[:-_LATENCY_SAMPLES]
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            latencies = {p: np.array(v) for p, v in self._latencies.items()}
+        stats["queued"] = self._queue.qsize()
+        stats["avg_batch_size"] = round(stats["texts"] / stats["batches"], 2) if stats["batches"] else 0.0
+        for name, priority in (("interactive", INTERACTIVE), ("bulk", BULK)):
+            values = latencies[priority]
+            stats[f"{name}_p50_ms"] = round(1000 * float(np.percentile(values, 50)), 2) if len(values) else None
+            stats[f"{name}_p95_ms"] = round(1000 * float(np.percentile(values, 95)), 2) if len(values) else None
+        return stats
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_embedding_service(model: str | None = None) -> EmbeddingService:
+    """The embedding service of *model* (default EMBEDDING_MODEL), started on first use."""
+    model = model or EMBEDDING_MODEL
+    service = _services.get(model)
+    if service is None:
+        with _services_lock:
+            service = _services.get(model)
+            if service is None:
+                service = _services[model] = EmbeddingService(model)
+    return service
+
+
+def embed_query(query: str, model: str | None = None) -> np.ndarray:
+    """Float32 embedding of one interactive query."""
+    return get_embedding_service(model).encode(query, priority=INTERACTIVE)
+
+
+def service_stats() -> dict:
+    """Per-model batching and latency counters since process start."""
+    return {model: service.stats() for model, service in list(_services.items())}
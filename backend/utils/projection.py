@@ -0,0 +1,188 @@
+# projection.py — Optional dimensionality reduction of embeddings
+"""
+EMBEDDING_PROJECTION shrinks vectors before they are stored, which cuts
+Redis memory and HNSW search cost roughly in proportion to the dims:
+
+  none      store the model's vectors as they are (default)
+  pca       PCA to PROJECTION_DIMS, fitted on the repository's own chunk
+            embeddings
+  truncate  keep the first PROJECTION_DIMS components; only meaningful
+            for Matryoshka-trained models (e.g. nomic-embed-text-v1.5)
+
+A projection is stored once under ``privcode:projection:<id>`` and
+referenced by id from every index version that uses it (its ``dims`` are
+the projected dims), so the matrix an index was built with is the one
+its queries are projected with.  storage_vectors() is the single path
+from float32 embeddings to stored vector bytes, for chunks and queries.
+"""
+
+import base64
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+from utils.redis_utils import get_redis_client, get_vector_dims, projection_key
+from utils.vector_codec import to_storage
+from core.logger import setup_logger
+
+logger = setup_logger()
+
+PROJECTION_METHODS = ("none", "pca", "truncate")
+EMBEDDING_PROJECTION = os.getenv("EMBEDDING_PROJECTION", "none").lower()
+if EMBEDDING_PROJECTION not in PROJECTION_METHODS:
+    raise ValueError(f"EMBEDDING_PROJECTION must be one of {PROJECTION_METHODS}")
+PROJECTION_DIMS = int(os.getenv("PROJECTION_DIMS", "128"))
+# Chunks sampled to fit PCA, and the fewest worth fitting on
+PROJECTION_FIT_SAMPLES = int(os.getenv("PROJECTION_FIT_SAMPLES", "20000"))
+PROJECTION_MIN_SAMPLES = int(os.getenv("PROJECTION_MIN_SAMPLES", "1000"))
+
+_ARRAYS = ("mean", "components")
+
+_projections = {}   # id -> projection, immutable once stored
+_lock = threading.Lock()
+
+
+def _with_id(projection: dict) -> dict:
+    digest = hashlib.sha1(f"{projection['method']}\0{projection['model']}\0"
+                          f"{projection['dims']}".encode())
+    for name in _ARRAYS:
+        if projection.get(name) is not None:
+            digest.update(projection[name].tobytes())
+    return dict(projection, id=digest.hexdigest()[:12])
+
+
+def fit_pca(vectors, dims: int, model: str) -> dict:
+    """PCA of the rows of *vectors* down to *dims* components."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    dims = min(dims, *vectors.shape)
+    mean = vectors.mean(axis=0)
+    _, singular, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+    explained = float((singular[:dims] ** 2).sum() / max((singular ** 2).sum(), 1e-12))
+    logger.info("PCA fitted on %d vectors: %d -> %d dims (%.1f%% variance kept)",
+                len(vectors), vectors.shape[1], dims, 100 * explained)
+    return _with_id({
+        "method": "pca",
+        "model": model,
+        "dims": dims,
+        "source_dims": vectors.shape[1],
+        "mean": mean.astype(np.float32),
+        "components": np.ascontiguousarray(vt[:dims], dtype=np.float32),
+    })
+
+
+def truncation(model: str, dims: int = PROJECTION_DIMS) -> dict:
+    """Matryoshka-style projection: the first *dims* components."""
+    source_dims = get_vector_dims(model)
+    return _with_id({
+        "method": "truncate",
+        "model": model,
+        "dims": min(dims, source_dims),
+        "source_dims": source_dims,
+    })
+
+
+def save_projection(projection: dict) -> dict:
+    """Store *projection* in Redis (idempotent); returns it."""
+    mapping = {k: projection[k] for k in ("method", "model", "dims", "source_dims")}
+    for name in _ARRAYS:
+        if projection.get(name) is not None:
+            mapping[name] = projection[name].tobytes()
+    get_redis_client().hset(projection_key(projection["id"]), mapping=mapping)
+    with _lock:
+        _projections[projection["id"]] = projection
+    return projection
+
+
+def load_projection(projection_id: str | None):
+    """Projection *projection_id*, or None for no projection."""
+    if not projection_id:
+        return None
+    projection = _projections.get(projection_id)
+    if projection is None:
+        raw = get_redis_client().hgetall(projection_key(projection_id))
+        if not raw:
+            raise RuntimeError(f"Projection {projection_id} is missing from Redis")
+        raw = {k.decode(): v for k, v in raw.items()}
+        projection = {
+            "id": projection_id,
+            "method": raw["method"].decode(),
+            "model": raw["model"].decode(),
+            "dims": int(raw["dims"]),
+            "source_dims": int(raw["source_dims"]),
+        }
+        for name in _ARRAYS:
+            if name in raw:
+                projection[name] = np.frombuffer(raw[name], dtype=np.float32)
+        if "components" in projection:
+            projection["components"] = projection["components"].reshape(projection["dims"], -1)
+        with _lock:
+            _projections[projection_id] = projection
+    return projection
+
+
+def project(vectors, projection: dict | None) -> np.ndarray:
+    """Apply *projection* to float32 vectors (one per row, or a single one)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if projection is None:
+        return vectors
+    if projection["method"] == "truncate":
+        return np.ascontiguousarray(vectors[..., :projection["dims"]])
+    return (vectors - projection["mean"]) @ projection["components"].T
+
+
+def storage_vectors(vectors, version: dict) -> np.ndarray:
+    """Float32 embeddings as stored in index *version*: projected, then
+    encoded in its datatype."""
+    projection = load_projection(version.get("projection"))
+    return to_storage(project(vectors, projection), version["datatype"])
+
+
+def is_current(version: dict) -> bool:
+    """Whether *version*'s projection is what EMBEDDING_PROJECTION asks for."""
+    projection = load_projection(version.get("projection"))
+    if EMBEDDING_PROJECTION == "none":
+        return projection is None
+    return (
+        projection is not None
+        and projection["method"] == EMBEDDING_PROJECTION
+        and projection["model"] == version["model"]
+        and projection["dims"] == min(PROJECTION_DIMS, projection["source_dims"])
+    )
+
+
+def new_version_projection(model: str, current: dict | None = None):
+    """
+    Projection for a new index version of *model*: a truncation, the
+    PCA of *current* (an existing version) while it still fits the
+    configuration, or None (PCA then needs fitting once there is data).
+    """
+    if EMBEDDING_PROJECTION == "truncate":
+        return save_projection(truncation(model))
+    if EMBEDDING_PROJECTION == "pca" and current is not None and current["model"] == model \
+            and is_current(current):
+        return load_projection(current["projection"])
+    return None
+
+
+# -----------------------------------------------------------------------------
+# Snapshot transport
+# -----------------------------------------------------------------------------
+
+def projection_to_json(projection: dict) -> dict:
+    data = {k: v for k, v in projection.items() if k not in _ARRAYS}
+    for name in _ARRAYS:
+        if projection.get(name) is not None:
+            data[name] = base64.b64encode(projection[name].tobytes()).decode()
+    return data
+
+
+def projection_from_json(data: dict) -> dict:
+    projection = {k: v for k, v in data.items() if k not in _ARRAYS}
+    for name in _ARRAYS:
+        if name in data:
+            projection[name] = np.frombuffer(base64.b64decode(data[name]), dtype=np.float32)
+    if "components" in projection:
+        projection["components"] = projection["components"].reshape(projection["dims"], -1)
+    return projection
@@ -0,0 +1,201 @@
+# query_cache.py — In-process query caches for retrieval
+"""
+Developers ask the same questions over and over; two LRU + TTL caches let
+a repeated question skip the work of hybrid_retrieve:
+
+  level 1  (model, query text) -> query embedding
+           Saves the embedding-service round trip.  Embeddings of a model
+           never go stale, so only LRU and QUERY_CACHE_TTL_SECONDS evict.
+  level 2  (query text, top_k, filters, fusion, index versions, re-rank)
+           -> results
+           Saves the whole retrieval.  The key names every index version
+           searched, by uid as well as number (numbers restart after a
+           FLUSHDB, uids never repeat), so activating a new version (full rebuild, model or
+           datatype change, re-projection, snapshot restore) makes the old
+           entries unreachable.  Incremental updates write into the active
+           version instead: the indexer calls invalidate_files() and only
+           entries holding chunks of the changed files are dropped (a new
+           file drops its repository's entries, since it may outrank
+           anything).  Content that starts matching a query without being
+           in its results is picked up after at most the TTL.
+
+Query text is normalized by collapsing whitespace; case is kept, since it
+matters to cased models and to identifier lookups.  Both caches are per
+process, like the indexer jobs and watcher that invalidate them.
+"""
+
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils.embedding_service import embed_query
+from core.logger import setup_logger
+
+logger = setup_logger()
+
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "3600"))
+
+
+class LRUCache:
+    """Thread-safe LRU map whose entries also expire after *ttl* seconds."""
+
+    def __init__(self, max_entries: int, ttl: float = QUERY_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (expires at, value)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key):
+        """The cached value of *key*, or None."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def discard_where(self, predicate) -> int:
+        """Drop every entry whose value satisfies *predicate*."""
+        with self._lock:
+            doomed = [key for key, (_, value) in self._entries.items() if predicate(value)]
+            for key in doomed:
+                del self._entries[key]
+            self._stats["invalidations"] += len(doomed)
+        return len(doomed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries), max_entries=self.max_entries)
+        total = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / total, 4) if total else 0.0
+        return stats
+
+
+_embeddings = LRUCache(QUERY_EMBEDDING_CACHE_SIZE)
+_results = LRUCache(RESULT_CACHE_SIZE)
+
+# (namespace, file path) / namespace -> when it last changed (monotonic),
+# kept long enough to outlast any retrieval still running
+_CHANGE_HORIZON_SECONDS = 300.0
+_changed_files = {}
+_changed_namespaces = {}
+_changed_lock = threading.Lock()
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split())
+
+
+# -----------------------------------------------------------------------------
+# Level 1: query embeddings
+# -----------------------------------------------------------------------------
+
+def cached_query_embedding(query: str, model: str):
+    """embed_query() through the level-1 cache (read-only array)."""
+    key = (model, normalize_query(query))
+    vector = _embeddings.get(key)
+    if vector is None:
+        vector = embed_query(query, model)
+        vector.setflags(write=False)   # shared by every later hit
+        _embeddings.put(key, vector)
+    return vector
+
+
+# -----------------------------------------------------------------------------
+# Level 2: retrieval results
+# -----------------------------------------------------------------------------
+
+def result_key(query: str, top_k: int, language_filter, fusion: str, versions: list,
+               rerank: bool = False) -> tuple:
+    return (
+        normalize_query(query), top_k, language_filter, fusion,
+        tuple(sorted((v["namespace"], v["name"], v["uid"]) for v in versions)), rerank,
+    )
+
+
+def get_results(key: tuple):
+    """A copy of the cached results of *key* (callers may edit them), or None."""
+    entry = _results.get(key)
+    return None if entry is None else copy.deepcopy(entry["results"])
+
+
+def put_results(key: tuple, results: list, started: float):
+    """
+    Cache *results* of a retrieval that began at *started*
+    (time.monotonic()), unless a file they hold, or their repository,
+    changed since: they may predate that change.
+    """
+    files = {(r["repo"], r["file_path"]) for r in results}
+    namespaces = {version[0] for version in key[4]}
+    with _changed_lock:
+        stale = (
+            any(_changed_files.get(f, 0.0) > started for f in files)
+            or any(_changed_namespaces.get(ns, 0.0) > started for ns in namespaces)
+        )
+    if not stale:
+        _results.put(key, {"results": copy.deepcopy(results), "files": files,
+                           "namespaces": namespaces})
+
+
+def _stamp(namespace: str, paths=(), whole: bool = False):
+    now = time.monotonic()
+    with _changed_lock:
+        for stamps in (_changed_files, _changed_namespaces):
+            for key in [k for k, at in stamps.items() if at < now - _CHANGE_HORIZON_SECONDS]:
+                del stamps[key]
+        for path in paths:
+            _changed_files[namespace, path] = now
+        if whole:
+            _changed_namespaces[namespace] = now
+
+
+def invalidate_files(namespace: str, paths, new_files: bool = False):
+    """
+    Drop cached results holding chunks of *paths* in *namespace*, or every
+    result searching *namespace* when *new_files* were added to it.
+    """
+    paths = set(paths)
+    if not paths:
+        return
+    if new_files:
+        invalidate_namespace(namespace)
+        return
+    _stamp(namespace, paths)
+    changed = {(namespace, path) for path in paths}
+    dropped = _results.discard_where(lambda entry: not changed.isdisjoint(entry["files"]))
+    if dropped:
+        logger.info("Result cache: invalidated %d entries (%s, %d files)",
+                    dropped, namespace, len(paths))
+
+
+def invalidate_namespace(namespace: str):
+    """Drop every cached result searching *namespace*."""
+    _stamp(namespace, whole=True)
+    dropped = _results.discard_where(lambda entry: namespace in entry["namespaces"])
+    if dropped:
+        logger.info("Result cache: invalidated %d entries (%s)", dropped, namespace)
+
+
+def query_cache_stats() -> dict:
+    """Hit rates and sizes of both levels since process start."""
+    return {"embeddings": _embeddings.stats(), "results": _results.stats()}
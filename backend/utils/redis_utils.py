@@ -3,16 +3,68 @@
 All heavy resources (Redis connection, embedding model, search index) are
 created on first use, NOT at import time.  This lets a single orchestrator
 (main.py / FastAPI lifespan) control initialization order.
+
+Blue-green index versions
+-------------------------
+Chunks live in versioned RediSearch indexes (``privcode_index_v<N>`` over
+keys ``code_v<N>:*``).  A Redis pointer names the active version, and the
+FT alias ``privcode`` follows it.  A full rebuild fills a new version while
+queries keep hitting the active one; activate_index_version() then swaps
+the pointer, the alias and this process's cached index in one step, and the
+old version is dropped in the background once in-flight queries are done.
+Other processes notice the swap within ACTIVE_VERSION_TTL_SECONDS, when
+they next compare their cached version with the pointer.  Versions a
+process retired but exited before dropping, and builds it abandoned, are
+swept by sweep_index_versions() (run at server start); command-line runs
+call wait_for_index_gc() before exiting instead.
+Every version records the embedding model it was built with, so switching
+EMBEDDING_MODEL is just a rebuild: queries keep using the old model until
+the new version is live.
+
+An index created before versioning (``privcode_index`` over ``code:*``) is
+adopted as version 0.
+
+Vector datatype
+---------------
+VECTOR_DATATYPE (float32, float16 or int8; see utils.vector_codec) sets
+how new index versions store vectors, when the Redis server supports it
+(float16 needs RediSearch 2.10, int8 Redis 8.0); otherwise float32 is
+used.  Every version records its datatype, and the indexer converts an
+active version whose datatype differs into a new one.
+
+Projection
+----------
+A version may store projected vectors (see utils.projection).  Its meta
+names the projection by id and its ``dims`` are the projected dims; the
+projection itself lives under ``privcode:projection:<id>`` and is
+dropped with the last version that uses it.
+
+Repository namespaces
+---------------------
+Each indexed repository gets its own namespace with its own chain of
+versions (``privcode_index_<ns>_v<N>`` over ``code_<ns>_v<N>:*``, alias
+``privcode_<ns>``), so equal relative paths in two repositories never
+share a key and a query scoped to one repository only searches that
+repository's HNSW graph.  The ``default`` namespace keeps the layout
+above; it holds what was indexed before namespaces existed.  Version
+numbers are allocated globally, and every namespace with an active
+version is listed in the ``privcode:repos`` registry.
 """
 
 import os
+import threading
+import time
+import uuid
 
 from dotenv import load_dotenv
 from redis import Redis
+from redis.commands.search.field import VectorField as RedisVectorField
+from redis.commands.search.indexDefinition import IndexDefinition, IndexType
 from redisvl.index import SearchIndex
 from redisvl.schema import IndexSchema
-from sentence_transformers import SentenceTransformer
 
+from utils.embedders import EMBEDDING_BACKEND, load_embedder
+from utils.vector_codec import check_datatype
 from core.logger import setup_logger
 
 load_dotenv()
@@ -23,11 +75,38 @@ logger = setup_logger()
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
 
+INDEX_BASE_NAME = "privcode_index"
+INDEX_ALIAS = "privcode"
+LEGACY_PREFIX = "code:"
+LEGACY_UID = "legacy"
+DEFAULT_NAMESPACE = "default"
+VECTOR_DATATYPE = check_datatype(os.getenv("VECTOR_DATATYPE", "float32"))
+# Grace period before a retired version is dropped (in-flight queries)
+INDEX_GC_DELAY_SECONDS = float(os.getenv("INDEX_GC_DELAY_SECONDS", "30"))
+# How long a cached active version is trusted before it is compared with
+# the Redis pointer (another process may have swapped it); 0 checks on
+# every lookup
+ACTIVE_VERSION_TTL_SECONDS = float(os.getenv("ACTIVE_VERSION_TTL_SECONDS", "2"))
+# A version still "building" after this long was abandoned by a process
+# that died mid-build
+INDEX_STALE_BUILD_SECONDS = float(os.getenv("INDEX_STALE_BUILD_SECONDS", "86400"))
+
+_ACTIVE_KEY = "privcode:index:active"
+_NEXT_VERSION_KEY = "privcode:index:next_version"
+_REPOS_KEY = "privcode:repos"            # namespace -> repository source
+
 # ── Lazy singletons ─────────────────────────────────────────────────
 _redis_client = None
-_embedder = None
-_vector_dims = None
-_index = None
+_embedders = {}          # model name -> embedder (utils.embedders)
+_vector_dims = {}        # model name -> embedding dimensions
+_indexes = {}            # index name -> SearchIndex
+_active = {}             # namespace -> meta of its active index version
+_active_checked = {}     # namespace -> when _active was last checked (monotonic)
+_gc_threads = []         # background drops of retired versions
+_storage_datatype = None # VECTOR_DATATYPE, or float32 if Redis lacks it
+
+# Indexing pipeline workers may race to initialise the singletons
+_init_lock = threading.RLock()
 
 
 def get_redis_client():
@@ -41,32 +120,40 @@ def get_redis_client():
     return _redis_client
 
 
-def get_embedder():
-    """Lazily load the SentenceTransformer embedding model (singleton)."""
-    global _embedder, _vector_dims
-    if _embedder is None:
-        logger.info("🧠 Loading embedding model: %s ...", EMBEDDING_MODEL)
-        _embedder = SentenceTransformer(EMBEDDING_MODEL)
-        _vector_dims = _embedder.get_sentence_embedding_dimension()
-        logger.info("✅ Embedding model loaded (dims=%d)", _vector_dims)
-    return _embedder
+def get_embedder(model_name: str | None = None):
+    """Lazily load an embedding model on EMBEDDING_BACKEND (one instance
+    per model)."""
+    model_name = model_name or EMBEDDING_MODEL
+    embedder = _embedders.get(model_name)
+    if embedder is None:
+        with _init_lock:
+            embedder = _embedders.get(model_name)
+            if embedder is None:
+                logger.info("🧠 Loading embedding model: %s (%s) ...",
+                            model_name, EMBEDDING_BACKEND)
+                embedder = load_embedder(model_name)
+                _vector_dims[model_name] = embedder.get_sentence_embedding_dimension()
+                _embedders[model_name] = embedder
+                logger.info("✅ Embedding model loaded (dims=%d)", _vector_dims[model_name])
+    return embedder
 
 
-def get_vector_dims():
+def get_vector_dims(model_name: str | None = None):
     """Return embedding vector dimensions (loads model if needed)."""
-    global _vector_dims
-    if _vector_dims is None:
-        get_embedder()
-    return _vector_dims
+    model_name = model_name or EMBEDDING_MODEL
+    if model_name not in _vector_dims:
+        get_embedder(model_name)
+    return _vector_dims[model_name]
 
 
-def _build_schema():
-    """Build the RediSearch index schema using current vector dims."""
-    dims = get_vector_dims()
+def _build_schema(name: str = INDEX_BASE_NAME, prefix: str = LEGACY_PREFIX,
+                  dims: int | None = None):
+    """Build the RediSearch index schema for one index version."""
+    dims = dims or get_vector_dims()
     return IndexSchema.from_dict({
         "index": {
-            "name": "privcode_index",
-            "prefix": "code:",
+            "name": name,
+            "prefix": prefix,
             "storage_type": "hash",
         },
         "fields": [
@@ -78,29 +165,519 @@ def _build_schema():
                     "dims": dims,
                     "algorithm": "hnsw",
                     "distance_metric": "cosine",
+                    # redisvl only knows float vectors: other datatypes
+                    # are created by _create_index() directly
                     "datatype": "float32",
                 },
             },
             {"name": "metadata", "type": "text"},
+            # Split and whole code identifiers (utils.code_tokens), matched
+            # exactly: stemming would merge distinct identifiers
+            {"name": "identifiers", "type": "text",
+             "attrs": {"weight": 2.0, "no_stem": True}},
+            # Names and qualnames of the symbols defined in the chunk
+            {"name": "symbols", "type": "tag", "attrs": {"separator": ","}},
             {"name": "file_path", "type": "tag"},
+            {"name": "repo", "type": "tag"},
             {"name": "language", "type": "tag"},
+            {"name": "start_line", "type": "numeric"},
+            {"name": "end_line", "type": "numeric"},
         ],
     })
 
 
-def get_index():
-    """Lazily create / connect to the RediSearch index (singleton)."""
-    global _index
-    if _index is None:
-        client = get_redis_client()
-        schema = _build_schema()
-        _index = SearchIndex(schema, client, validate=False)
-        if not _index.exists():
-            _index.create()
-            logger.info("✅ Created Redis index: privcode_index")
+def _indexed_attributes(index) -> set:
+    """Names of the attributes an existing RediSearch index was created with."""
+    info = index.client.ft(index.name).info()
+    names = set()
+    for attr in info.get("attributes", info.get(b"attributes", [])):
+        items = [a.decode() if isinstance(a, bytes) else a for a in attr]
+        for key, value in zip(items[::2], items[1::2]):
+            if key == "attribute":
+                names.add(value)
+    return names
+
+
+def _ensure_schema_fields(index):
+    """
+    Add fields introduced after the index was created (FT.ALTER).
+    Redis re-scans the existing hashes, so no re-embedding is needed.
+    """
+    indexed = _indexed_attributes(index)
+    missing = [
+        field for name, field in index.schema.fields.items()
+        if name not in indexed and field.type != "vector"
+    ]
+    if missing:
+        index.client.ft(index.name).alter_schema_add(
+            [field.as_redis_field() for field in missing]
+        )
+        logger.info(
+            "✅ Added fields to %s: %s",
+            index.name, ", ".join(f.name for f in missing),
+        )
+
+
+# ── Index versions ───────────────────────────────────────────────────
+
+def _version_key(version: int) -> str:
+    return f"privcode:index:v{version}"
+
+
+def projection_key(projection_id: str) -> str:
+    return f"privcode:projection:{projection_id}"
+
+
+def _active_key(namespace: str) -> str:
+    if namespace == DEFAULT_NAMESPACE:
+        return _ACTIVE_KEY
+    return f"privcode:ns:{namespace}:active"
+
+
+def _index_alias(namespace: str) -> str:
+    if namespace == DEFAULT_NAMESPACE:
+        return INDEX_ALIAS
+    return f"{INDEX_ALIAS}_{namespace}"
+
+
+def _decode_hash(raw: dict) -> dict:
+    meta = {k.decode(): v.decode() for k, v in raw.items()}
+    meta["version"] = int(meta["version"])
+    meta["dims"] = int(meta["dims"])
+    # Versions created before namespaces all belong to the default one
+    meta.setdefault("namespace", DEFAULT_NAMESPACE)
+    meta.setdefault("datatype", "float32")
+    meta.setdefault("projection", "")
+    return meta
+
+
+def get_version_meta(version: int):
+    """Stored meta of index *version* ({version, uid, namespace, name,
+    prefix, model, dims, datatype, projection, state, created_at}), or
+    None if it does not exist."""
+    raw = get_redis_client().hgetall(_version_key(version))
+    return _decode_hash(raw) if raw else None
+
+
+def list_index_versions() -> list:
+    """Meta of every known index version, oldest first."""
+    client = get_redis_client()
+    versions = []
+    for key in client.scan_iter(match="privcode:index:v*", count=100):
+        raw = client.hgetall(key)
+        if raw:
+            versions.append(_decode_hash(raw))
+    return sorted(versions, key=lambda m: m["version"])
+
+
+def _save_version_meta(meta: dict):
+    get_redis_client().hset(
+        _version_key(meta["version"]),
+        mapping={k: str(v) for k, v in meta.items()},
+    )
+
+
+def _set_alias(client, meta: dict):
+    # ALIASUPDATE adds the alias or atomically moves it to the index
+    client.execute_command("FT.ALIASUPDATE", _index_alias(meta["namespace"]), meta["name"])
+
+
+# Minimum RediSearch module version per vector datatype
+_DATATYPE_MIN_SEARCH_VERSION = {"float32": 0, "float16": 21000, "int8": 80000}
+
+
+def _search_module_version(client) -> int:
+    for module in client.module_list():
+        module = {
+            (k.decode() if isinstance(k, bytes) else k): v for k, v in module.items()
+        }
+        name = module.get("name")
+        name = name.decode() if isinstance(name, bytes) else name
+        if name in ("search", "searchlight"):
+            return int(module.get("ver", 0))
+    return 0
+
+
+def supported_datatypes() -> list:
+    """Vector datatypes the connected RediSearch can index."""
+    version = _search_module_version(get_redis_client())
+    return [dt for dt, minimum in _DATATYPE_MIN_SEARCH_VERSION.items() if version >= minimum]
+
+
+def storage_datatype() -> str:
+    """VECTOR_DATATYPE if this Redis can index it, else float32."""
+    global _storage_datatype
+    if _storage_datatype is None:
+        datatype = VECTOR_DATATYPE
+        try:
+            version = _search_module_version(get_redis_client())
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Could not read the RediSearch version: %s", exc)
+            version = 0
+        if version < _DATATYPE_MIN_SEARCH_VERSION[datatype]:
+            logger.warning(
+                "RediSearch %s cannot index %s vectors - storing float32",
+                version or "(unknown)", datatype,
+            )
+            datatype = "float32"
+        _storage_datatype = datatype
+    return _storage_datatype
+
+
+def _create_index(index, meta: dict):
+    if meta.get("datatype", "float32") == "float32":
+        index.create()
+        return
+    fields = [
+        field.as_redis_field() for name, field in index.schema.fields.items()
+        if field.type != "vector"
+    ]
+    fields.append(RedisVectorField("vector", "HNSW", {
+        "TYPE": meta["datatype"].upper(),
+        "DIM": meta["dims"],
+        "DISTANCE_METRIC": "COSINE",
+    }))
+    index.client.ft(meta["name"]).create_index(
+        fields,
+        definition=IndexDefinition(prefix=[meta["prefix"]], index_type=IndexType.HASH),
+    )
+
+
+def _open_index(meta: dict, create: bool = False):
+    """SearchIndex for a version meta (cached per index name)."""
+    index = _indexes.get(meta["name"])
+    if index is None:
+        schema = _build_schema(meta["name"], meta["prefix"], meta["dims"])
+        index = SearchIndex(schema, get_redis_client(), validate=False)
+        if not index.exists():
+            if not create:
+                raise RuntimeError(f"Redis index {meta['name']} does not exist")
+            _create_index(index, meta)
+            logger.info("✅ Created Redis index: %s (%s vectors)",
+                        meta["name"], meta.get("datatype", "float32"))
+        else:
+            _ensure_schema_fields(index)
+        _indexes[meta["name"]] = index
+    return index
+
+
+# ── Namespaces ───────────────────────────────────────────────────────
+
+def register_namespace(namespace: str, source: str):
+    """Record which repository *namespace* holds (path or URL)."""
+    get_redis_client().hset(_REPOS_KEY, namespace, source)
+
+
+def list_namespaces() -> dict:
+    """{namespace: repository source} of every indexed namespace."""
+    raw = get_redis_client().hgetall(_REPOS_KEY)
+    return {k.decode(): v.decode() for k, v in raw.items()}
+
+
+def drop_namespace(namespace: str):
+    """Forget *namespace*: unregister it and drop its active version in
+    the background (after the usual grace period)."""
+    client = get_redis_client()
+    meta = get_active_version(namespace, create=False)
+    with _init_lock:
+        client.delete(_active_key(namespace))
+        client.hdel(_REPOS_KEY, namespace)
+        _active.pop(namespace, None)
+    if meta is not None:
+        try:
+            client.execute_command("FT.ALIASDEL", _index_alias(namespace))
+        except Exception:  # noqa: BLE001  (alias already gone)
+            pass
+        retire_index_version(meta)
+    logger.info("🗑️ Namespace %s dropped", namespace)
+
+
+def drop_all_namespaces() -> list:
+    """
+    Clear the knowledge base: drop every namespace (pointer, alias,
+    registry entry) and every index version with its chunk keys, in the
+    background after the usual grace period.  The embedding cache stays.
+    Returns the dropped namespaces.
+    """
+    namespaces = sorted(list_namespaces())
+    for namespace in namespaces:
+        drop_namespace(namespace)
+    # Versions no namespace points at: builds in progress, earlier retirees
+    for meta in list_index_versions():
+        if meta["state"] != "retired":
+            retire_index_version(meta)
+    return namespaces
+
+
+# ── Version lifecycle ────────────────────────────────────────────────
+
+def create_index_version(model_name: str | None = None,
+                         namespace: str = DEFAULT_NAMESPACE,
+                         uid: str | None = None,
+                         datatype: str | None = None,
+                         projection: dict | None = None) -> dict:
+    """
+    Allocate and create an empty index version of *namespace* for
+    *model_name* (default EMBEDDING_MODEL) storing *datatype* vectors
+    (default storage_datatype()), projected with the stored *projection*
+    if given.  It stays invisible to queries until activated.  *uid* is
+    only passed when the version will hold exactly the chunks of an
+    existing one (snapshot restore, datatype conversion, re-projection).
+    """
+    model_name = model_name or EMBEDDING_MODEL
+    client = get_redis_client()
+    version = int(client.incr(_NEXT_VERSION_KEY))
+    if namespace == DEFAULT_NAMESPACE:
+        name, prefix = f"{INDEX_BASE_NAME}_v{version}", f"code_v{version}:"
+    else:
+        name, prefix = f"{INDEX_BASE_NAME}_{namespace}_v{version}", f"code_{namespace}_v{version}:"
+    meta = {
+        "version": version,
+        "namespace": namespace,
+        "name": name,
+        "prefix": prefix,
+        "model": model_name,
+        "dims": projection["dims"] if projection else get_vector_dims(model_name),
+        "datatype": check_datatype(datatype) if datatype else storage_datatype(),
+        "projection": projection["id"] if projection else "",
+        "state": "building",
+        "created_at": time.time(),
+        # Version numbers restart after FLUSHDB; the uid never repeats
+        "uid": uid or uuid.uuid4().hex[:12],
+    }
+    _save_version_meta(meta)
+    _open_index(meta, create=True)
+    logger.info("🆕 Index version %d created (%s, model=%s, %s, %d dims)",
+                version, namespace, model_name, meta["datatype"], meta["dims"])
+    return meta
+
+
+def _bootstrap_active(namespace: str, create: bool):
+    """Find the active version of *namespace*, adopting a pre-versioning
+    index as v0 of the default namespace or creating a first version
+    (None when there is none and *create* is False)."""
+    client = get_redis_client()
+    active_key = _active_key(namespace)
+    pointer = client.get(active_key)
+    if pointer is not None:
+        meta = get_version_meta(int(pointer))
+        if meta is not None:
+            return meta
+        logger.warning("Active index version %s has no meta; recreating", pointer.decode())
+        client.delete(active_key)
+
+    legacy = None
+    if namespace == DEFAULT_NAMESPACE:
+        legacy = SearchIndex(_build_schema(), client, validate=False)
+    if legacy is not None and legacy.exists():
+        meta = {
+            "version": 0,
+            "namespace": DEFAULT_NAMESPACE,
+            "name": INDEX_BASE_NAME,
+            "prefix": LEGACY_PREFIX,
+            "model": EMBEDDING_MODEL,
+            "dims": get_vector_dims(),
+            "datatype": "float32",
+            "projection": "",
+            "state": "active",
+            "created_at": time.time(),
+            "uid": LEGACY_UID,
+        }
+        _save_version_meta(meta)
+        logger.info("✅ Adopted existing %s as index version 0", INDEX_BASE_NAME)
+    elif not create:
+        return None
+    else:
+        meta = create_index_version(namespace=namespace)
+        meta["state"] = "active"
+        _save_version_meta(meta)
+
+    if not client.set(active_key, meta["version"], nx=True):
+        # Another process bootstrapped first: use its version, drop ours
+        if meta["version"] != 0:
+            _drop_index_version(meta)
+        return get_version_meta(int(client.get(active_key)))
+    _set_alias(client, meta)
+    return meta
+
+
+def _refresh_active(namespace: str, meta: dict):
+    """
+    *meta* if the Redis pointer of *namespace* still names it, else the
+    version it names now (None if it names none: bootstrap again).  One
+    round trip; the uid tells a version from a namesake after FLUSHDB.
+    """
+    pipe = get_redis_client().pipeline(transaction=False)
+    pipe.get(_active_key(namespace))
+    pipe.hget(_version_key(meta["version"]), "uid")
+    pointer, uid = pipe.execute()
+    if pointer is not None and int(pointer) == meta["version"] and uid == meta["uid"].encode():
+        return meta
+    _active.pop(namespace, None)
+    current = get_version_meta(int(pointer)) if pointer is not None else None
+    if current is None:
+        return None
+    _open_index(current)
+    logger.info("🔀 Index version %d is now active for %s (was %d, swapped elsewhere)",
+                current["version"], namespace, meta["version"])
+    _active[namespace] = current
+    return current
+
+
+def get_active_version(namespace: str = DEFAULT_NAMESPACE, create: bool = True):
+    """
+    Meta of the index version *namespace* is served from.  A namespace
+    without one gets an empty first version, or None with *create* False.
+    """
+    meta = _active.get(namespace)
+    if meta is not None and (time.monotonic() - _active_checked.get(namespace, 0.0)
+                             < ACTIVE_VERSION_TTL_SECONDS):
+        return meta
+    with _init_lock:
+        meta = _active.get(namespace)
+        if meta is not None:
+            meta = _refresh_active(namespace, meta)
+        if meta is None:
+            meta = _bootstrap_active(namespace, create)
+            if meta is None:
+                return None
+            _open_index(meta, create=True)
+            # Repository namespaces register with their source first;
+            # this covers the default one
+            get_redis_client().hsetnx(_REPOS_KEY, namespace, "")
+            logger.info(
+                "✅ Connected to Redis index: %s (version %d, model=%s)",
+                meta["name"], meta["version"], meta["model"],
+            )
+            _active[namespace] = meta
+        _active_checked[namespace] = time.monotonic()
+    return meta
+
+
+def get_index(version: dict):
+    """SearchIndex of *version* (meta dict, see get_active_version)."""
+    return _open_index(version)
+
+
+def activate_index_version(meta: dict, retire_previous: bool = True):
+    """
+    Make *meta* the version its namespace is served from.  The Redis
+    pointer, the FT alias and this process's cached active index switch
+    together; the previous version is dropped in the background unless
+    *retire_previous* is False.  Returns the previous version's meta.
+    """
+    client = get_redis_client()
+    namespace = meta["namespace"]
+    with _init_lock:
+        previous = get_active_version(namespace)
+        meta = dict(meta, state="active")
+        _save_version_meta(meta)
+
+        _open_index(meta)
+        client.set(_active_key(namespace), meta["version"])
+        _set_alias(client, meta)
+        _active[namespace] = meta
+        _active_checked[namespace] = time.monotonic()
+
+    logger.info(
+        "🔀 Index version %d is now active for %s (was %d)",
+        meta["version"], namespace, previous["version"],
+    )
+    if retire_previous and previous["version"] != meta["version"]:
+        retire_index_version(previous)
+    return previous
+
+
+def retire_index_version(meta: dict, delay: float | None = None):
+    """Drop *meta*'s index and keys in a background thread after *delay*."""
+    delay = INDEX_GC_DELAY_SECONDS if delay is None else delay
+    _save_version_meta(dict(meta, state="retired", retired_at=time.time()))
+    thread = threading.Thread(
+        target=_drop_index_version, args=(meta, delay),
+        name=f"index-gc-v{meta['version']}", daemon=True,
+    )
+    with _init_lock:
+        _gc_threads[:] = [t for t in _gc_threads if t.is_alive()]
+        _gc_threads.append(thread)
+    thread.start()
+
+
+def wait_for_index_gc(timeout: float | None = None):
+    """Block until every version this process retired has been dropped
+    (command-line runs, whose daemon GC threads would die with them)."""
+    with _init_lock:
+        threads = [t for t in _gc_threads if t.is_alive()]
+    if threads:
+        logger.info("⏳ Waiting for %d retired index versions to be dropped...", len(threads))
+    for thread in threads:
+        thread.join(timeout)
+
+
+def sweep_index_versions() -> int:
+    """
+    Drop versions left behind by processes that exited early: retired
+    ones past INDEX_GC_DELAY_SECONDS and builds untouched for
+    INDEX_STALE_BUILD_SECONDS.  Active versions are never touched.
+    Returns how many were dropped.
+    """
+    client = get_redis_client()
+    now = time.time()
+    dropped = 0
+    for meta in list_index_versions():
+        if meta["state"] == "retired":
+            since, limit = float(meta.get("retired_at") or meta["created_at"]), INDEX_GC_DELAY_SECONDS
+        elif meta["state"] == "building":
+            since, limit = float(meta["created_at"]), INDEX_STALE_BUILD_SECONDS
         else:
-            logger.info("✅ Connected to existing Redis index: privcode_index")
-    return _index
+            continue
+        if now - since < limit:
+            continue
+        pointer = client.get(_active_key(meta["namespace"]))
+        if pointer is not None and int(pointer) == meta["version"]:
+            continue
+        logger.info("🧹 Sweeping %s index version %d (%s)",
+                    meta["state"], meta["version"], meta["namespace"])
+        _drop_index_version(meta)
+        dropped += 1
+    return dropped
+
+
+def _drop_index_version(meta: dict, delay: float = 0.0):
+    if delay:
+        time.sleep(delay)
+    client = get_redis_client()
+    try:
+        client.ft(meta["name"]).dropindex(delete_documents=False)
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("Dropping index %s failed: %s", meta["name"], exc)
+    _indexes.pop(meta["name"], None)
+
+    # Every version has its own key prefix ("code:" for v0, "code_v<N>:" or
+    # "code_<ns>_v<N>:" otherwise), so a prefix scan only matches this
+    # version's chunks
+    deleted = 0
+    batch = []
+    for key in client.scan_iter(match=meta["prefix"] + "*", count=1000):
+        batch.append(key)
+        if len(batch) >= 1000:
+            deleted += client.unlink(*batch)
+            batch = []
+    if batch:
+        deleted += client.unlink(*batch)
+    client.delete(_version_key(meta["version"]))
+    projection = meta.get("projection")
+    if projection and not any(m["projection"] == projection for m in list_index_versions()):
+        client.delete(projection_key(projection))
+    logger.info("🗑️ Dropped index version %d (%d keys)", meta["version"], deleted)
+
+
+def reset_index_cache():
+    """Forget cached indexes (e.g. after FLUSHDB); the next
+    get_active_version() bootstraps again from whatever is in Redis."""
+    with _init_lock:
+        _indexes.clear()
+        _active.clear()
+        _active_checked.clear()
 
 
 # ── Convenience ──────────────────────────────────────────────────────
@@ -110,7 +687,7 @@ def test_redis():
     client = get_redis_client()
     assert client.ping()
     print("✅ Redis ping OK")
-    idx = get_index()
+    idx = get_index(get_active_version())
     print(idx.info())
 
 
@@ -0,0 +1,59 @@
+# vector_codec.py — Storage encoding of embedding vectors
+"""
+One place that turns float32 embeddings into the bytes stored in (and
+queried against) a RediSearch vector field, so chunks written by the
+indexer and query vectors built by the retriever always agree.
+
+  float32  4 bytes / dim, exact
+  float16  2 bytes / dim (RediSearch >= 2.10)
+  int8     1 byte / dim, scalar-quantized (Redis >= 8.0)
+
+int8 scales every vector by its own max |component| to [-127, 127].  The
+indexes use cosine distance, which ignores vector length, so no scale
+factor has to be stored and a query quantized the same way compares
+directly against the stored vectors.
+"""
+
+import numpy as np
+
+DATATYPES = ("float32", "float16", "int8")
+
+# Bits per component: converting down keeps data, converting up does not
+# bring lost precision back (that needs re-embedding)
+DATATYPE_BITS = {"float32": 32, "float16": 16, "int8": 8}
+
+
+def check_datatype(datatype: str) -> str:
+    datatype = datatype.lower()
+    if datatype not in DATATYPES:
+        raise ValueError(f"Unsupported vector datatype {datatype!r} (use one of {DATATYPES})")
+    return datatype
+
+
+def to_storage(vectors, datatype: str) -> np.ndarray:
+    """Encode float vectors (one per row, or a single vector) as *datatype*."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if datatype == "float32":
+        return vectors
+    if datatype == "float16":
+        return vectors.astype(np.float16)
+    if datatype == "int8":
+        scale = np.max(np.abs(vectors), axis=-1, keepdims=True)
+        scale[scale == 0] = 1.0
+        return np.rint(vectors * (127.0 / scale)).astype(np.int8)
+    raise ValueError(f"Unsupported vector datatype: {datatype}")
+
+
+def vector_bytes(vector, datatype: str) -> bytes:
+    """Bytes of one vector as stored in a *datatype* vector field."""
+    return to_storage(vector, datatype).tobytes()
+
+
+def from_storage(raw, datatype: str, dims: int | None = None) -> np.ndarray:
+    """
+    Decode stored vector bytes to float32 (int8 comes back scaled to
+    [-127, 127], which is fine for cosine).  With *dims*, *raw* holds
+    several vectors and a (n, dims) matrix is returned.
+    """
+    vectors = np.frombuffer(raw, dtype=datatype).astype(np.float32)
+    return vectors.reshape(-1, dims) if dims else vectors
@@ -15,6 +15,8 @@ import {
   getRedisStats,
   flushRedis,
   reindexRedis,
+  rebuildAllRedis,
+  waitForIndexJob,
   getSecurityPolicies,
   updateSecurityPolicies,
   getAuditLogs,
@@ -101,6 +103,7 @@ export default function AdminPage() {
   const [redisLoading, setRedisLoading] = useState(false);
   const [flushing, setFlushing] = useState(false);
   const [reindexing, setReindexing] = useState(false);
+  const [rebuilding, setRebuilding] = useState(false);
   const [flushConfirm, setFlushConfirm] = useState(false);
 
   // ── Security Policies state ──
@@ -289,10 +292,14 @@ export default function AdminPage() {
     setCrawlResult(null);
     try {
       const res = await triggerCrawler(crawlRepoPath.trim());
-      setCrawlResult({ status: "success", message: res.data?.message || "Crawler completed" });
+      const job = await waitForIndexJob(res.data.job_id);
+      if (job.status !== "succeeded") {
+        throw new Error(job.error || `Crawler ${job.status}`);
+      }
+      setCrawlResult({ status: "success", message: `Crawler completed for: ${crawlRepoPath.trim()}` });
       fetchCrawler();
     } catch (err) {
-      setCrawlResult({ status: "error", message: err?.response?.data?.detail || "Crawler failed" });
+      setCrawlResult({ status: "error", message: err?.response?.data?.detail || err?.message || "Crawler failed" });
     } finally { setCrawling(false); }
   };
 
@@ -310,13 +317,32 @@ export default function AdminPage() {
   const handleReindexRedis = async () => {
     setReindexing(true);
     try {
-      await reindexRedis();
+      const res = await reindexRedis();
+      const job = await waitForIndexJob(res.data.job_id);
+      if (job.status !== "succeeded") {
+        throw new Error(job.error || `Re-index ${job.status}`);
+      }
       fetchRedis();
     } catch (err) {
-      alert(err?.response?.data?.detail || "Re-index failed");
+      alert(err?.response?.data?.detail || err?.message || "Re-index failed");
     } finally { setReindexing(false); }
   };
 
+  const handleRebuildAllRedis = async () => {
+    setRebuilding(true);
+    try {
+      const res = await rebuildAllRedis();
+      const jobs = await Promise.all((res.data.job_ids || []).map(waitForIndexJob));
+      const failed = jobs.filter((job) => job.status !== "succeeded");
+      if (failed.length) {
+        throw new Error(failed[0].error || `Rebuild ${failed[0].status}`);
+      }
+      fetchRedis();
+    } catch (err) {
+      alert(err?.response?.data?.detail || err?.message || "Rebuild failed");
+    } finally { setRebuilding(false); }
+  };
+
   const handleSavePolicies = async () => {
     if (!policyDraft) return;
     setSavingPolicies(true);
@@ -782,14 +808,19 @@ export default function AdminPage() {
                 <div className="grid grid-cols-2 gap-4">
                   <div className="bg-pc-surface border border-pc-border rounded-lg p-4">
                     <h3 className="text-sm font-semibold text-pc-text mb-2 flex items-center gap-2"><RefreshCw size={14} className="text-pc-accent" />Re-index</h3>
-                    <p className="text-[11px] text-pc-muted mb-3">Rebuild the entire knowledge base from the current repository.</p>
-                    <button onClick={handleReindexRedis} disabled={reindexing} className="px-4 py-1.5 bg-pc-accent text-[#0d1117] text-xs font-medium rounded hover:bg-pc-accent-hover transition disabled:opacity-50 flex items-center gap-1.5">
-                      {reindexing ? <><RefreshCw size={12} className="animate-spin" />Re-indexing...</> : "Force Re-index"}
-                    </button>
+                    <p className="text-[11px] text-pc-muted mb-3">Rebuild the current repository, or every indexed repository. Search keeps working until each rebuild is swapped in.</p>
+                    <div className="flex items-center gap-2">
+                      <button onClick={handleReindexRedis} disabled={reindexing} className="px-4 py-1.5 bg-pc-accent text-[#0d1117] text-xs font-medium rounded hover:bg-pc-accent-hover transition disabled:opacity-50 flex items-center gap-1.5">
+                        {reindexing ? <><RefreshCw size={12} className="animate-spin" />Re-indexing...</> : "Force Re-index"}
+                      </button>
+                      <button onClick={handleRebuildAllRedis} disabled={rebuilding} className="px-4 py-1.5 bg-pc-elevated text-pc-secondary text-xs font-medium rounded hover:text-pc-text transition border border-pc-border disabled:opacity-50 flex items-center gap-1.5">
+                        {rebuilding ? <><RefreshCw size={12} className="animate-spin" />Rebuilding...</> : "Rebuild All Repositories"}
+                      </button>
+                    </div>
                   </div>
                   <div className="bg-pc-surface border border-pc-danger/30 rounded-lg p-4">
                     <h3 className="text-sm font-semibold text-pc-text mb-2 flex items-center gap-2"><AlertTriangle size={14} className="text-pc-danger" />Flush Database</h3>
-                    <p className="text-[11px] text-pc-muted mb-3">Clear all data from the knowledge base. This action is irreversible.</p>
+                    <p className="text-[11px] text-pc-muted mb-3">Drop every repository's index from the knowledge base. Repositories must be re-indexed before they can be searched again. This action is irreversible.</p>
                     {flushConfirm ? (
                       <div className="flex items-center gap-2">
                         <button onClick={handleFlushRedis} disabled={flushing} className="px-4 py-1.5 bg-pc-danger text-white text-xs font-medium rounded hover:bg-pc-danger/80 transition disabled:opacity-50">
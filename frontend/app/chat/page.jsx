@@ -2,7 +2,7 @@
 
 import { useState, useEffect, useRef, useCallback } from "react";
 import { useRouter } from "next/navigation";
-import { queryCode, indexRepo, logoutSession } from "@/lib/api";
+import { queryCode, indexRepo, waitForIndexJob, logoutSession } from "@/lib/api";
 import { auth } from "@/lib/auth";
 import {
   Send,
@@ -309,11 +309,15 @@ export default function ChatPage() {
   const handleIndex = async () => {
     setIndexing(true);
     try {
-      await indexRepo(repoPath, indexPath);
+      const res = await indexRepo(repoPath, indexPath);
+      const job = await waitForIndexJob(res.data.job_id);
+      if (job.status !== "succeeded") {
+        throw new Error(job.error || `Indexing ${job.status}`);
+      }
       alert("Repository indexed successfully!");
       setShowIndexPanel(false);
     } catch (err) {
-      alert(err?.response?.data?.detail || "Indexing failed");
+      alert(err?.response?.data?.detail || err?.message || "Indexing failed");
     } finally {
       setIndexing(false);
     }
@@ -121,13 +121,37 @@ export const queryCode = async (question, repoPath, mode = "auto") => {
 // =====================================================
 // 📦 INDEX API
 // =====================================================
-export const indexRepo = async (repoPath, indexPath) => {
+// ref: optional branch / tag / commit, indexed from git objects without a checkout
+export const indexRepo = async (repoPath, indexPath, ref = null) => {
   return api.post("/index", {
     repo_path: repoPath,
     index_path: indexPath,
+    ref,
   });
 };
 
+export const getIndexJobs = async () => {
+  return api.get("/index/jobs");
+};
+
+export const getIndexJob = async (jobId) => {
+  return api.get(`/index/jobs/${jobId}`);
+};
+
+export const cancelIndexJob = async (jobId) => {
+  return api.delete(`/index/jobs/${jobId}`);
+};
+
+// Poll an indexing job until it finishes; onProgress receives each snapshot
+export const waitForIndexJob = async (jobId, onProgress, intervalMs = 1500) => {
+  for (;;) {
+    const { data } = await getIndexJob(jobId);
+    onProgress?.(data);
+    if (!["queued", "running"].includes(data.status)) return data;
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+};
+
 // =====================================================
 // 🚪 LOGOUT API
 // =====================================================
@@ -195,6 +219,10 @@ export const reindexRedis = async () => {
   return api.post("/admin/redis/reindex");
 };
 
+export const rebuildAllRedis = async () => {
+  return api.post("/admin/redis/rebuild");
+};
+
 // =====================================================
 // 🛡️ ADMIN: Security Policies
 // =====================================================